@@ -0,0 +1,77 @@
+from numpy import (
+    zeros,
+    add,
+    minimum,
+    iinfo,
+    uint16,
+    int_,
+)
+
+
+class MarginalAccumulator():
+    def __init__(self, shape, burn_in=0, thinning=1, dtype=uint16):
+        """Streaming counter of unit labels in labelings of Gibbs sampler
+
+        Parameters
+        ----------
+        shape: tuple of unsigned integers
+            Labeling shape
+        burn_in: unsigned integer
+            Number of first iterations whose labelings are not saved
+        thinning: unsigned integer
+            Only labelings of iterations divisible by it are saved
+        dtype: numpy unsigned integer type
+            Type of counters, uint16 allows up to 65535 saved labelings
+        """
+        self.burn_in = burn_in
+        self.thinning = thinning
+        self.iterations = 0
+        self.samples = 0
+        self.max_samples = iinfo(dtype).max
+        self.sums_of_unit_labels = zeros(shape, dtype=dtype)
+
+    def update(self, labeling):
+        """Counts labeling after an iteration of Gibbs sampler
+        if it is neither burn-in nor thinned out
+
+        Parameters
+        ----------
+        labeling: array of binary values
+            Labeling after the iteration
+
+        Returns
+        -------
+        True or False
+            Whether the labeling was saved
+        """
+        self.iterations += 1
+        if self.iterations <= self.burn_in or \
+                self.iterations % self.thinning != 0:
+            return False
+        if self.samples == self.max_samples:
+            raise OverflowError("Too many labelings for counters of type {}"
+                                .format(self.sums_of_unit_labels.dtype))
+        add(self.sums_of_unit_labels, labeling,
+            out=self.sums_of_unit_labels, casting="unsafe")
+        self.samples += 1
+        return True
+
+    def marginals(self):
+        """Returns probability of unit label in each pixel
+        estimated from the saved labelings
+        """
+        return self.sums_of_unit_labels / self.samples
+
+    def labeling(self):
+        """Returns the most common colors of the saved labelings,
+        ties are resolved in favor of unit label
+        """
+        # ones >= zeros is the same as ones >= ceil(samples / 2)
+        return int_(self.sums_of_unit_labels >= (self.samples + 1) // 2)
+
+    def uncertainty(self):
+        """Returns probability of the other color than the most common one
+        in each pixel, from 0 for certain pixels up to 0.5
+        """
+        marginals = self.marginals()
+        return minimum(marginals, 1 - marginals)
@@ -0,0 +1,191 @@
+from numpy import (
+    random,
+    sqrt,
+)
+
+from checkerboard import checkerboard_iteration
+from energy import (
+    count_mismatches,
+    energy_breakdown,
+)
+
+
+class GeometricSchedule():
+    def __init__(self, initial_temperature, final_temperature, cooling_rate):
+        """Temperature is multiplied by cooling_rate after each iteration
+        until it reaches final_temperature
+        """
+        self.temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.cooling_rate = cooling_rate
+
+    def update(self, acceptance_rate):
+        """Updates temperature after an iteration
+
+        Parameters
+        ----------
+        acceptance_rate: number from [0, 1]
+            Part of pixels that changed their labels during the iteration
+        """
+        self.temperature = max(self.temperature * self.cooling_rate,
+                               self.final_temperature)
+
+
+class LinearSchedule():
+    def __init__(self, initial_temperature, final_temperature, iterations):
+        """Temperature decreases by the same value after each iteration
+        and reaches final_temperature after the given number of iterations
+        """
+        self.temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.step = (initial_temperature - final_temperature) / iterations
+
+    def update(self, acceptance_rate):
+        """Updates temperature after an iteration
+
+        Parameters
+        ----------
+        acceptance_rate: number from [0, 1]
+            Part of pixels that changed their labels during the iteration
+        """
+        self.temperature = max(self.temperature - self.step,
+                               self.final_temperature)
+
+
+class AdaptiveSchedule():
+    def __init__(self, initial_temperature, final_temperature, cooling_rate,
+                 target_acceptance):
+        """Temperature is multiplied by cooling_rate while more than
+        target_acceptance part of pixels change their labels, and cools
+        slower (by square root of cooling_rate) when less pixels change
+        """
+        self.temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.cooling_rate = cooling_rate
+        self.target_acceptance = target_acceptance
+
+    def update(self, acceptance_rate):
+        """Updates temperature after an iteration
+
+        Parameters
+        ----------
+        acceptance_rate: number from [0, 1]
+            Part of pixels that changed their labels during the iteration
+        """
+        if acceptance_rate > self.target_acceptance:
+            rate = self.cooling_rate
+        else:
+            rate = sqrt(self.cooling_rate)
+        self.temperature = max(self.temperature * rate,
+                               self.final_temperature)
+
+
+def make_schedule(name, initial_temperature, final_temperature,
+                  cooling_rate, iterations, target_acceptance):
+    """Creates temperature schedule by its name
+
+    Parameters
+    ----------
+    name: string
+        "geometric", "linear" or "adaptive"
+    initial_temperature: positive number
+        Temperature of the first iteration
+    final_temperature: positive number
+        The lowest temperature
+    cooling_rate: number from (0, 1)
+        Temperature multiplier of geometric and adaptive schedules
+    iterations: unsigned integer
+        Number of iterations of linear schedule
+    target_acceptance: number from [0, 1]
+        Part of changed pixels that adaptive schedule keeps cooling fast
+
+    Returns
+    -------
+    schedule object
+        Object with temperature and final_temperature attributes
+        and update(acceptance_rate) method
+    """
+    if name == "geometric":
+        return GeometricSchedule(
+            initial_temperature, final_temperature, cooling_rate)
+    elif name == "linear":
+        return LinearSchedule(
+            initial_temperature, final_temperature, iterations)
+    elif name == "adaptive":
+        return AdaptiveSchedule(
+            initial_temperature, final_temperature, cooling_rate,
+            target_acceptance)
+    else:
+        raise ValueError("Unknown schedule")
+
+
+def simulated_annealing(noised_image, epsilon, beta, schedule,
+                        initial_labeling=None, window=10, tolerance=1e-4,
+                        max_sweeps=1000, rng=random, verbose=True):
+    """Search for the labeling with minimal energy
+    with checkerboard sweeps of decreasing temperature
+
+    Parameters
+    ----------
+    noised_image: matrix of binary values
+        Generated image after applying noise
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    schedule: schedule object
+        Temperature schedule, see make_schedule
+    initial_labeling: matrix of binary values or None
+        Warm start, for example noised image or maxflow result.
+        If None, random labeling is used
+    window: unsigned integer
+        Number of iterations to measure energy decrease
+    tolerance: number
+        Iterations stop when temperature reaches the final temperature
+        of schedule and the lowest energy decreases over window iterations
+        by less than this part of it
+    max_sweeps: unsigned integer
+        Maximum number of iterations
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+    verbose: True or False
+        If True, start and result of the search are printed
+
+    Returns
+    -------
+    tuple of matrix of binary values and list of numbers
+        Labeling with the lowest energy and energy after each iteration
+    """
+    if verbose:
+        print("Image denoising with simulated annealing...")
+    if initial_labeling is None:
+        labeling = rng.uniform(size=noised_image.shape) < 0.5  # U{0, 1}
+    else:
+        labeling = initial_labeling != 0
+    labeling = labeling.astype(noised_image.dtype)
+    energies = [energy_breakdown(labeling, noised_image, epsilon, beta)["total"]]
+    best_labeling, best_energy = labeling.copy(), energies[0]
+    # The lowest energy after each iteration
+    best_energies = [best_energy]
+    for iteration in range(max_sweeps):
+        labeling_prev = labeling.copy()
+        labeling = checkerboard_iteration(
+            labeling, noised_image, epsilon, beta, rng,
+            temperature=schedule.temperature)
+        schedule.update(count_mismatches(labeling_prev, labeling)
+                        / labeling.size)
+        energies.append(
+            energy_breakdown(labeling, noised_image, epsilon, beta)["total"])
+        if energies[-1] < best_energy:
+            best_labeling, best_energy = labeling.copy(), energies[-1]
+        best_energies.append(best_energy)
+        # Energy grows at high temperature, so convergence is checked
+        # only after cooling
+        cooled = schedule.temperature <= schedule.final_temperature
+        if cooled and len(best_energies) > window and \
+                best_energies[-window - 1] - best_energy < \
+                tolerance * abs(best_energies[-window - 1]):
+            break
+    if verbose:
+        print("Iteration # {}, energy {}".format(iteration + 1, best_energy))
+    return best_labeling, energies
@@ -0,0 +1,104 @@
+from numpy import (
+    random,
+    exp,
+    logaddexp,
+    zeros,
+    where,
+)
+
+from utils import (
+    edge_weight,
+    node_weights,
+    count_neighbors,
+    count_unit_neighbors,
+)
+
+
+# Pixels of a checkerboard color as two sublattices with step 2.
+# Pixels of the same color are not neighbors of each other,
+# so given the other color they are independent
+# and can be sampled simultaneously.
+CHECKERBOARD = (
+    ((slice(0, None, 2), slice(0, None, 2)),
+     (slice(1, None, 2), slice(1, None, 2))),  # black
+    ((slice(0, None, 2), slice(1, None, 2)),
+     (slice(1, None, 2), slice(0, None, 2))),  # white
+)
+
+
+def unit_label_probability(units, neighbors, unary_difference, beta):
+    """Calculates probability of unit label in pixels
+    with fixed labels of their neighbors
+
+    Parameters
+    ----------
+    units: array of integers
+        Number of neighbors labeled 1 of each pixel
+    neighbors: array of integers broadcastable to units
+        Number of neighbors of each pixel
+    unary_difference: array of numbers broadcastable to units
+        Difference between node weights of unit and zero labels
+    beta: number
+        Weight of edge if its labels differ
+
+    Returns
+    -------
+    array of numbers from [0, 1] of units shape
+        Probability of unit label
+    """
+    # Sum of edges weights going from unit label
+    # minus sum of edges weights going from zero label
+    edges_difference = edge_weight(0, 1, beta) * (neighbors - 2 * units)
+    # exp(-a) / (exp(-a) + exp(-b)) without overflow
+    return exp(-logaddexp(0, unary_difference + edges_difference))
+
+
+def checkerboard_iteration(labeling, noised_image, epsilon, beta, rng=random,
+                           fixed=None, temperature=1):
+    """One iteration of Gibbs sampler with checkerboard updates
+
+    At first all black pixels are resampled at once, then all white ones.
+    The stationary distribution is the same as for pixel by pixel sweep.
+
+    Parameters
+    ----------
+    labeling: array of binary values
+        Current labeling or a stack of labelings along the first axis
+    noised_image: array of binary values or None
+        Noised image broadcastable to labeling.
+        If None, only edges weights are used
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+    fixed: matrix of boolean values or None
+        Pixels whose labels are not resampled
+    temperature: positive number
+        Node and edge weights are divided by it
+
+    Returns
+    -------
+    array of binary values
+        Updated labeling
+    """
+    height, width = labeling.shape[-2:]
+    neighbors = count_neighbors(height, width)
+    if noised_image is None:
+        unary_difference = zeros((height, width))
+    else:
+        zero_weights, unit_weights = node_weights(noised_image, epsilon)
+        unary_difference = (unit_weights - zero_weights) / temperature
+    for color in CHECKERBOARD:
+        units = count_unit_neighbors(labeling)
+        for i, j in color:
+            probability = unit_label_probability(
+                units[..., i, j], neighbors[i, j],
+                unary_difference[..., i, j], beta / temperature)
+            sample = rng.uniform(
+                size=probability.shape) < probability  # U[0, 1]
+            if fixed is not None:
+                sample = where(fixed[i, j], labeling[..., i, j], sample)
+            labeling[..., i, j] = sample
+    return labeling
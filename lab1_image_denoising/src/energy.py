@@ -0,0 +1,115 @@
+from packed import PackedLabeling
+from utils import (
+    node_weight,
+    edge_weight,
+)
+
+
+def count_mismatches(labeling1, labeling2):
+    """Counts mismatching pixels of two labelings
+
+    Parameters
+    ----------
+    labeling1: array of binary values or PackedLabeling
+        Labeling or a stack of labelings along the first axis
+    labeling2: array of binary values or PackedLabeling
+        Another labeling or a stack of labelings broadcastable to labeling1
+
+    Returns
+    -------
+    integer or array of integers
+        Number of mismatching pixels of each labeling
+    """
+    if isinstance(labeling1, PackedLabeling):
+        return labeling1.count_mismatches(labeling2)
+    return (labeling1 != labeling2).sum(axis=(-2, -1))
+
+
+def count_discontinuities(labeling):
+    """Counts edges whose nodes have different labels
+
+    Parameters
+    ----------
+    labeling: array of binary values or PackedLabeling
+        Labeling or a stack of labelings along the first axis
+
+    Returns
+    -------
+    integer or array of integers
+        Number of such edges in each labeling, every edge is counted once
+    """
+    if isinstance(labeling, PackedLabeling):
+        return labeling.count_discontinuities()
+    horizontal = labeling[..., :, 1:] != labeling[..., :, :-1]
+    vertical = labeling[..., 1:, :] != labeling[..., :-1, :]
+    return horizontal.sum(axis=(-2, -1)) + vertical.sum(axis=(-2, -1))
+
+
+def unary_energy(labeling, noised_image, epsilon):
+    """Calculates sum of node weights of labeling
+
+    Parameters
+    ----------
+    labeling: array of binary values or PackedLabeling
+        Labeling or a stack of labelings along the first axis
+    noised_image: array of binary values or PackedLabeling
+        Noised image broadcastable to labeling
+    epsilon: number
+        Noise level
+
+    Returns
+    -------
+    number or array of numbers
+        Unary energy of each labeling
+    """
+    height, width = labeling.shape[-2:]
+    mismatches = count_mismatches(labeling, noised_image)
+    return mismatches * node_weight(0, 1, epsilon) + \
+        (height * width - mismatches) * node_weight(0, 0, epsilon)
+
+
+def pairwise_energy(labeling, beta):
+    """Calculates sum of edge weights of labeling
+
+    Parameters
+    ----------
+    labeling: array of binary values or PackedLabeling
+        Labeling or a stack of labelings along the first axis
+    beta: number
+        Weight of edge if its labels differ
+
+    Returns
+    -------
+    number or array of numbers
+        Pairwise energy of each labeling
+    """
+    return count_discontinuities(labeling) * edge_weight(0, 1, beta)
+
+
+def energy_breakdown(labeling, noised_image, epsilon, beta):
+    """Calculates energy of labeling split into unary and pairwise terms
+
+    Parameters
+    ----------
+    labeling: array of binary values or PackedLabeling
+        Labeling or a stack of labelings along the first axis
+    noised_image: array of binary values or PackedLabeling
+        Noised image broadcastable to labeling
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+
+    Returns
+    -------
+    dictionary
+        Unary ("unary"), pairwise ("pairwise") and total ("total") energy,
+        numbers for one labeling or arrays for a stack of labelings
+    """
+    unary = unary_energy(labeling, noised_image, epsilon)
+    pairwise = pairwise_energy(labeling, beta)
+    return {
+        "unary": unary,
+        "pairwise": pairwise,
+        "total": unary + pairwise,
+    }
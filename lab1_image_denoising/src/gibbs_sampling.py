@@ -1,30 +1,50 @@
 import configparser
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
-import matplotlib.gridspec as gridspec
 import maxflow
+from time import perf_counter
 
 from numpy import (
     random,
     exp,
-    zeros,
     int_,
     logical_not,
     asarray,
     reshape,
+    array,
 )
 from image_generation import (
     sample_input_image,
     add_noise,
 )
+from checkerboard import checkerboard_iteration
+from packed import (
+    PackedLabeling,
+    packed_checkerboard_iteration,
+)
+from swendsen_wang import swendsen_wang_iteration
+from multichain import multichain_gibbs_sampling
+from annealing import (
+    make_schedule,
+    simulated_annealing,
+)
+from accumulator import MarginalAccumulator
+from energy import (
+    count_mismatches,
+    energy_breakdown,
+)
 from utils import (
     node_weight,
     edge_weight,
     neighbor_exists,
     get_neighbor_coordinate,
+    node_weights,
 )
 from PIL import Image
 
+# Edges from a pixel to its right and bottom neighbors
+GRID_STRUCTURE = array([[0, 0, 0],
+                        [0, 0, 1],
+                        [0, 1, 0]])
+
 
 def get_labeling(sums_of_zero_labels, sums_of_unit_labels):
     """Returns image of the most common colors occured in the labeling
@@ -46,36 +66,31 @@ def get_labeling(sums_of_zero_labels, sums_of_unit_labels):
         Returns image of the most common colors occured in the labeling
         during Gibbs sampler iterations
     """
-    height, width = sums_of_zero_labels.shape
-    labeling = zeros(shape=(height, width))
-    for i in range(height):
-        for j in range(width):
-            labeling[i, j] = int(
-                sums_of_zero_labels[i, j] <= sums_of_unit_labels[i, j])
-    return labeling
+    return int_(sums_of_zero_labels <= sums_of_unit_labels)
 
 
-def gibbs_iteration(labeling, height, width, epsilon, beta):
+def gibbs_iteration(labeling, noised_image, epsilon, beta, rng=random):
     """One iteration of Gibbs sampler
 
     Parameters
     ----------
     labeling: matrix of image size with binary values
         Current labeling
-    height: unsigned int
-        Image height
-    widht: unsigned int
-        Image width
+    noised_image: matrix of binary values
+        Generated image after applying noise
     epsilon: number
         Noise level
     beta: number
         Weight of edge if its labels differ
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
 
     Returns
     -------
     matrix of image size with binary values
         Updated labeling
     """
+    height, width = labeling.shape
     for i in range(height):
         for j in range(width):
             sum_zero_edges = 0
@@ -84,27 +99,35 @@ def gibbs_iteration(labeling, height, width, epsilon, beta):
                 if neighbor_exists(height, width, i, j, n):
                     i_n, j_n = get_neighbor_coordinate(i, j, n)
                     sum_zero_edges += edge_weight(
-                        0, noised_image[i_n, j_n], beta)
+                        0, labeling[i_n, j_n], beta)
                     sum_unit_edges += edge_weight(
-                        1, noised_image[i_n, j_n], beta)
+                        1, labeling[i_n, j_n], beta)
             zero = exp(-node_weight(
                 0, noised_image[i, j], epsilon) - sum_zero_edges)
             unit = exp(-node_weight(
                 1, noised_image[i, j], epsilon) - sum_unit_edges)
             t = zero / (zero + unit)
-            labeling[i, j] = int(random.uniform() >= t)  # U[0, 1]
+            labeling[i, j] = int(rng.uniform() >= t)  # U[0, 1]
     return labeling
 
 
+SWEEPS = {
+    "raster": gibbs_iteration,
+    "checkerboard": checkerboard_iteration,
+    "packed": packed_checkerboard_iteration,
+    "swendsen-wang": swendsen_wang_iteration,
+}
+
+
 def almost_equal_labelings(labeling1, labeling2, changes_threshold):
     """Returns True if there are not more than
     changes_threshold% of mismatching pixels
 
     Parameters
     ----------
-    labeling1: matrix of binary values of image size
+    labeling1: matrix of binary values of image size or PackedLabeling
         Labeling
-    labeling2: matrix of binary values of image size
+    labeling2: matrix of binary values of image size or PackedLabeling
         Labeling from neighbor iteration of Gibbs sampler
     changes_threshold: number
         Percent of maximum number of mismatching pixels to consider
@@ -117,19 +140,15 @@ def almost_equal_labelings(labeling1, labeling2, changes_threshold):
     """
     height, width = labeling1.shape
     max_errors = height * width * changes_threshold / 100
-    current_errors = 0
-    for i in range(height):
-        for j in range(width):
-            if labeling1[i, j] != labeling2[i, j]:
-                current_errors += 1
-            if current_errors > max_errors:
-                return False
-    return True
+    return count_mismatches(labeling1, labeling2) <= max_errors
 
 
 def gibbs_sampling(initial_image, noised_image,
                    epsilon, beta,
-                   changes_threshold):
+                   changes_threshold, sweep="raster",
+                   burn_in=5, thinning=2,
+                   chains=1, initial_labeling=None, schedule=None,
+                   verbose=True, **options):
     """Gibbs sampling algorithm implementation
 
     Parameters
@@ -145,33 +164,83 @@ def gibbs_sampling(initial_image, noised_image,
     changes_threshold: number
         Percent of maximum number of mismatching pixels to consider
         the givel labelings almost equal
+    sweep: string
+        Order of pixels updates: "raster" visits pixels one by one,
+        "checkerboard" resamples all pixels of the same color at once,
+        "packed" does the same on labeling with 8 pixels in a byte,
+        "swendsen-wang" resamples clusters of pixels
+    burn_in: unsigned integer
+        Number of first iterations whose labelings are not saved
+    thinning: unsigned integer
+        Only labelings of iterations divisible by it are saved
+    chains: unsigned integer
+        Number of independent chains. If more than one, chains run
+        with checkerboard sweep in a process pool until R-hat and
+        effective sample size of all pixels show convergence,
+        and the most common colors of all chains are returned
+    initial_labeling: matrix of binary values or None
+        Warm start, for example noised image or maxflow result.
+        If None, random labeling is used
+    schedule: schedule object or None
+        Temperature schedule, see annealing.make_schedule. If given,
+        simulated annealing searches for the labeling with minimal energy
+        instead of sampling, and the sweep, burn_in, thinning, chains
+        and changes_threshold parameters are not used
+    verbose: True or False
+        If True, progress of iterations is printed
+    options:
+        Other parameters of multichain_gibbs_sampling
+        or of simulated_annealing
 
     Returns
     -------
     matrix of binary values
-        Labeling as a reconstructed image
+        The most common colors of saved labelings as a reconstructed image.
+        If no labeling was saved, the last one is returned.
+        With schedule, the labeling with the lowest energy is returned
     """
-    print("Image denoising with Gibbs sampler...")
+    if schedule is not None:
+        labeling, _ = simulated_annealing(
+            noised_image, epsilon, beta, schedule, initial_labeling,
+            verbose=verbose, **options)
+        return labeling
+    if chains > 1:
+        _, sums_of_unit_labels, samples = multichain_gibbs_sampling(
+            noised_image, epsilon, beta, chains, burn_in, thinning,
+            verbose=verbose, **options)
+        sums_of_unit_labels = sums_of_unit_labels.sum(axis=0)
+        return get_labeling(chains * samples - sums_of_unit_labels,
+                            sums_of_unit_labels)
+    if sweep not in SWEEPS:
+        raise ValueError("Unknown sweep")
+    gibbs_sweep = SWEEPS[sweep]
+    if verbose:
+        print("Image denoising with Gibbs sampler...")
     height, width = initial_image.shape
-    labeling = random.randint(2, size=(height, width))  # U{0, 1}
-    sums_of_zero_labels = zeros(shape=(height, width))
-    sums_of_unit_labels = zeros(shape=(height, width))
+    if initial_labeling is None:
+        labeling = random.randint(2, size=(height, width))  # U{0, 1}
+    else:
+        labeling = int_(initial_labeling != 0)
+    packed = sweep == "packed"
+    if packed:
+        labeling = PackedLabeling.from_array(labeling)
+        noised_image = PackedLabeling.from_array(noised_image)
+    accumulator = MarginalAccumulator((height, width), burn_in, thinning)
     iteration = 0
     while True:
         iteration += 1
         labeling_prev = labeling.copy()
-        labeling = gibbs_iteration(labeling, height, width, epsilon, beta)
-        if iteration > 5 and iteration % 2 == 0:
-            # Save labeling
-            sums_of_zero_labels += labeling ^ 1
-            sums_of_unit_labels += labeling
+        labeling = gibbs_sweep(labeling, noised_image, epsilon, beta)
+        accumulator.update(labeling.to_array() if packed else labeling)
         # Break iterations when not more than 5% of pixels have changed
         if almost_equal_labelings(
                 labeling_prev, labeling, changes_threshold):
             break
-        print("Iteration # {}".format(iteration))
-    result = get_labeling(sums_of_zero_labels, sums_of_unit_labels)
-    return labeling
+        if verbose:
+            print("Iteration # {}".format(iteration))
+    if accumulator.samples == 0:
+        return labeling.to_array() if packed else labeling
+    return accumulator.labeling()
 
 
 def count_errors(image, labeling):
@@ -189,29 +258,33 @@ def count_errors(image, labeling):
     integer
         Number of incorrectly recognized pixels
     """
-    errors = 0
-    for i in range(image.shape[0]):
-        for j in range(image.shape[1]):
-            if image[i, j] != labeling[i, j]:
-                errors += 1
+    errors = count_mismatches(image, labeling)
     percent = 100 * errors / (image.shape[0] * image.shape[1])
     print("Number of incorrectly recognized pixels: {}, it is {}% of image"
           .format(errors, percent))
+    return errors
 
 
-def calculate_energy(labeling, noised_image, psilon, beta):
-    energy = 0
-    height, width = labeling.shape
-    for i in range(height):
-        for j in range(width):
-            energy += node_weight(labeling[i, j], noised_image[i, j], epsilon)
-            for n in range(4):
-                if neighbor_exists(height, width, i, j, n):
-                    i_n, j_n = get_neighbor_coordinate(i, j, n)
-                    energy += edge_weight(
-                        labeling[i, j], labeling[i_n, j_n], beta
-                    )
-    return energy
+def calculate_energy(labeling, noised_image, epsilon, beta):
+    """Calculates energy of labeling, every edge is counted once
+
+    Parameters
+    ----------
+    labeling: matrix of binary values
+        Labeling
+    noised_image: matrix of binary values
+        Generated image after noising
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+
+    Returns
+    -------
+    number
+        Sum of node and edge weights
+    """
+    return energy_breakdown(labeling, noised_image, epsilon, beta)["total"]
 
 
 def maxflow_image_restoration(noised_image, beta, epsilon):
@@ -221,44 +294,52 @@ def maxflow_image_restoration(noised_image, beta, epsilon):
     ----------
     noised_image: matrix of binary values
         Generated image after noising
+    beta: number
+        Weight of edge if its labels differ
+    epsilon: number
+        Noise level
 
     Returns
     -------
-    matrix of binary values
-        Restored image
+    tuple of matrix of binary values and dictionary
+        Restored image and time in seconds spent on
+        graph construction ("build"), maxflow ("solve")
+        and getting the labeling ("extract")
     """
-    # Create the graph
-    g = maxflow.Graph[float]()
-    # Add the nodes. nodeids has the identifiers of the nodes in the grid
+    start = perf_counter()
     height, width = noised_image.shape
-    nodeids = g.add_grid_nodes((height, width))
-    for i in range(height):
-        for j in range(width):
-            for n in range(4):
-                if neighbor_exists(height, width, i, j, n):
-                    i_n, j_n = get_neighbor_coordinate(i, j, n)
-                    weight = edge_weight(
-                        noised_image[i, j], noised_image[i_n, j_n], beta
-                    )
-                    # Add non-terminal edges
-                    g.add_edge(
-                        nodeids[i, j], nodeids[i_n, j_n],
-                        weight, weight
-                    )
-            # Add terminal edges
-            g.add_tedge(nodeids[i, j],
-                        node_weight(0, noised_image[i, j], epsilon),
-                        node_weight(1, noised_image[i, j], epsilon))
+    # Create the graph with space for all nodes and edges
+    g = maxflow.Graph[float](height * width, 2 * height * width)
+    # Add the nodes. nodeids has the identifiers of the nodes in the grid
+    nodeids = g.add_grid_nodes(noised_image.shape)
+    # Add non-terminal edges to the right and to the bottom neighbors,
+    # each in both directions
+    g.add_grid_edges(nodeids, weights=edge_weight(0, 1, beta),
+                     structure=GRID_STRUCTURE, symmetric=True)
+    # Add terminal edges
+    zero_weights, unit_weights = node_weights(noised_image, epsilon)
+    g.add_grid_tedges(nodeids, zero_weights, unit_weights)
+    built = perf_counter()
     # Find the maximum flow
     g.maxflow()
+    solved = perf_counter()
     sgm = g.get_grid_segments(nodeids)
     # Get the segments of the nodes in the grid
     # The labels should be 1 where sgm is False and 0 otherwise
     resulting_image = int_(logical_not(sgm))
-    return resulting_image
+    extracted = perf_counter()
+    timings = {
+        "build": built - start,
+        "solve": solved - built,
+        "extract": extracted - solved,
+    }
+    return resulting_image, timings
 
 
 if __name__ == "__main__":
+    # matplotlib is imported only to show the results
+    import matplotlib.pyplot as plt
+
     config = configparser.ConfigParser()
     config.read('config.ini')
     beta_image = float(config['EDGE_WEIGHT']['beta_image'])
@@ -269,22 +350,65 @@ if __name__ == "__main__":
         config['ITERATIONS']['iterations_for_image'])
 
     initial_image = sample_input_image(
-        image_height, image_width, beta_image, iterations_for_image_generation)
+        image_height, image_width, beta_image, iterations_for_image_generation,
+        sweep=config['SAMPLER']['image_sweep'])
     # initial_image = asarray(Image.open("images/zebra_scaled.jpeg").convert('L'))
 
     epsilon = float(config['NOISE_LEVEL']['epsilon'])
     noised_image = add_noise(initial_image, epsilon)
 
     changes_threshold = int(config['ITERATIONS']['changes_threshold'])
+    sweep = config['SAMPLER']['sweep']
+    burn_in = int(config['ITERATIONS']['burn_in'])
+    thinning = int(config['ITERATIONS']['thinning'])
+    chains = int(config['CHAINS']['chains'])
+    multichain_options = {
+        'workers': int(config['CHAINS']['workers']) or None,
+        'sweeps_per_check': int(config['CHAINS']['sweeps_per_check']),
+        'max_rhat': float(config['CHAINS']['max_rhat']),
+        'min_ess': float(config['CHAINS']['min_ess']),
+        'max_sweeps': int(config['CHAINS']['max_sweeps']),
+    }
+
+    maxflow_result, maxflow_timings = maxflow_image_restoration(
+        noised_image, beta_gibbs, epsilon
+    )
+    print("MaxFlow time: build {build:.3f}s, solve {solve:.3f}s, "
+          "extract {extract:.3f}s".format(**maxflow_timings))
+
+    warm_start = config['ANNEALING']['warm_start']
+    if warm_start == "noised":
+        initial_labeling = noised_image
+    elif warm_start == "maxflow":
+        initial_labeling = maxflow_result
+    elif warm_start == "random":
+        initial_labeling = None
+    else:
+        raise ValueError("Unknown warm start")
+    if config['ANNEALING'].getboolean('annealing'):
+        schedule = make_schedule(
+            config['ANNEALING']['schedule'],
+            float(config['ANNEALING']['initial_temperature']),
+            float(config['ANNEALING']['final_temperature']),
+            float(config['ANNEALING']['cooling_rate']),
+            int(config['ANNEALING']['max_sweeps']),
+            float(config['ANNEALING']['target_acceptance']))
+        options = {
+            'window': int(config['ANNEALING']['window']),
+            'tolerance': float(config['ANNEALING']['tolerance']),
+            'max_sweeps': int(config['ANNEALING']['max_sweeps']),
+        }
+    else:
+        schedule = None
+        options = multichain_options
     labeling = gibbs_sampling(initial_image, noised_image,
                               epsilon, beta_gibbs,
-                              changes_threshold)
+                              changes_threshold, sweep,
+                              burn_in, thinning,
+                              chains, initial_labeling, schedule,
+                              **options)
     print("Gibbs energy : ", calculate_energy(labeling, noised_image, epsilon, beta_gibbs))
     count_errors(initial_image, labeling)
-
-    maxflow_result = maxflow_image_restoration(
-        noised_image, beta_gibbs, epsilon
-    )
     print("MaxFlow energy : ", calculate_energy(maxflow_result, noised_image, epsilon, beta_gibbs))
 
     fig = plt.figure()
@@ -1,43 +1,81 @@
 import argparse
 from numpy import (
     random,
-    exp,
+    save,
+    uint8,
 )
-from matplotlib.pyplot import imsave
-from matplotlib.cm import gray
 
-from utils import (
-    neighbor_exists,
-    get_neighbor_coordinate,
-    edge_weight,
-)
+from checkerboard import checkerboard_iteration
+from swendsen_wang import swendsen_wang_iteration
+
+SWEEPS = {
+    "checkerboard": checkerboard_iteration,
+    "swendsen-wang": swendsen_wang_iteration,
+}
 
 
-def add_noise(image, epsilon):
+def add_noise(image, epsilon, seed=None):
     """Adding noise to image by inverting pixels
 
     Parameters
     ----------
-    image: matrix of binary values
-        Initial image
+    image: array of binary values
+        Initial image or a stack of images along the first axis
     epsilon: number from [0, 1]
         Probability of inverting a pixel
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
 
     Returns
     -------
-    matrix of binary values
+    array of binary values
         Noised image
     """
     print("Adding noise with epsilon =", epsilon)
-    noised_image = image.copy()
-    for i in range(image.shape[0]):
-        for j in range(image.shape[1]):
-            if random.uniform() < epsilon:  # U[0, 1]
-                noised_image[i, j] = 1 - image[i, j]
-    return noised_image
+    rng = random.default_rng(seed)
+    return image ^ (rng.uniform(size=image.shape) < epsilon)  # U[0, 1]
+
 
+def sample_input_images(number, height, width, beta, iterations, seed=None,
+                        sweep="checkerboard"):
+    """Generation of a batch of images using Gibbs sampler
 
-def sample_input_image(height, width, beta, iterations):
+    Parameters
+    ----------
+    number: unsigned integer
+        Number of images
+    height: unsigned integer
+        Image height
+    widht: unsigned integer
+        Image width
+    beta: number
+        Weight of edge if its labels differ
+    iterations: unsigned integer
+        Number of iterations of image generation
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    sweep: string
+        "checkerboard" resamples all pixels of the same color at once,
+        "swendsen-wang" resamples clusters of pixels and needs
+        much less iterations for large beta
+
+    Returns
+    -------
+    array of binary values of size (number, height, width)
+        Generated binary images
+    """
+    if sweep not in SWEEPS:
+        raise ValueError("Unknown sweep")
+    print("Generating", number, "input images", height, "x", width)
+    rng = random.default_rng(seed)
+    images = rng.integers(2, size=(number, height, width), dtype=uint8)
+    for iteration in range(iterations):
+        images = SWEEPS[sweep](images, None, None, beta, rng)
+    return images
+
+
+def sample_input_image(height, width, beta, iterations, seed=None,
+                       sweep="checkerboard"):
     """Generation of image using Gibbs sampler
 
     Parameters
@@ -50,27 +88,18 @@ def sample_input_image(height, width, beta, iterations):
         Weight of edge if its labels differ
     iterations: unsigned integer
         Number of iterations of image generation
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    sweep: string
+        "checkerboard" or "swendsen-wang"
 
     Retunrs
     -------
     matrix of binary values of size (height, width)
         Generated binary image
     """
-    print("Generating input image", height, "x", width)
-    image = random.randint(2, size=(height, width))  # U{0, 1}
-    for iteration in range(iterations):
-        for i in range(height):
-            for j in range(width):
-                zero_weight = 0  # sum of edges weights going from zero label
-                unit_weight = 0  # sum of edges weights going from unit label
-                for n in range(4):  # for all neighbors
-                    if neighbor_exists(height, width, i, j, n):
-                        i_n, j_n = get_neighbor_coordinate(i, j, n)
-                        zero_weight += edge_weight(0, image[i_n, j_n], beta)
-                        unit_weight += edge_weight(1, image[i_n, j_n], beta)
-                t = exp(-zero_weight) / (exp(-zero_weight) + exp(-unit_weight))
-                image[i, j] = int(random.uniform() >= t)  # U [0, 1]
-    return image
+    return sample_input_images(
+        1, height, width, beta, iterations, seed, sweep)[0]
 
 
 if __name__ == "__main__":
@@ -83,8 +112,28 @@ if __name__ == "__main__":
                         help="edge weight if nodes labels are different")
     parser.add_argument("epsilon", type=float,
                         help="probability of color change for noising")
+    parser.add_argument("--number", type=int, default=1,
+                        help="number of images to generate")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of random numbers generator")
+    parser.add_argument("--sweep", choices=sorted(SWEEPS),
+                        default="checkerboard",
+                        help="order of pixels updates")
+    parser.add_argument("--iterations", type=int, default=5000,
+                        help="number of iterations")
+    parser.add_argument("--output", default=None,
+                        help="path to .npy file for generated images")
+    parser.add_argument("--noised-output", default=None,
+                        help="path to .npy file for noised images")
     args = parser.parse_args()
 
-    image = sample_input_image(
-        args.image_height, args.image_width, args.edge_weight, 5000)
-    add_noise(image, args.epsilon)
+    rng = random.default_rng(args.seed)
+    images = sample_input_images(
+        args.number, args.image_height, args.image_width, args.edge_weight,
+        args.iterations, rng, args.sweep)
+    noised_images = add_noise(images, args.epsilon, rng)
+    # Stacks of size (number, height, width)
+    if args.output is not None:
+        save(args.output, images)
+    if args.noised_output is not None:
+        save(args.noised_output, noised_images)
@@ -0,0 +1,209 @@
+from multiprocessing import Pool
+
+from numpy import (
+    random,
+    sqrt,
+    where,
+    inf,
+    minimum,
+    errstate,
+    stack,
+)
+
+from accumulator import MarginalAccumulator
+from checkerboard import checkerboard_iteration
+
+# Noised image and model parameters shared by all chains of a process pool
+_model = {}
+
+
+def _init_model(noised_image, epsilon, beta):
+    """Initializes process pool worker with the model parameters"""
+    _model["noised_image"] = noised_image
+    _model["epsilon"] = epsilon
+    _model["beta"] = beta
+
+
+def run_chain(labeling, accumulator, rng, sweeps):
+    """Runs some iterations of one chain of Gibbs sampler
+
+    Parameters
+    ----------
+    labeling: matrix of binary values
+        Current labeling of the chain
+    accumulator: MarginalAccumulator
+        Counter of unit labels in labelings of the chain
+    rng: numpy.random.Generator
+        Random numbers generator of the chain
+    sweeps: unsigned integer
+        Number of iterations
+
+    Returns
+    -------
+    tuple
+        Updated labeling, accumulator and random numbers generator
+    """
+    for _ in range(sweeps):
+        labeling = checkerboard_iteration(
+            labeling, _model["noised_image"],
+            _model["epsilon"], _model["beta"], rng)
+        accumulator.update(labeling)
+    return labeling, accumulator, rng
+
+
+def variance_components(sums_of_unit_labels, samples):
+    """Calculates within-chain and between-chain variances
+    of the unit label marginals
+
+    Parameters
+    ----------
+    sums_of_unit_labels: array of unsigned int values of size
+                         (chains, height, width)
+        How many times each pixel had value 1 in each chain
+    samples: unsigned integer
+        Number of saved labelings in each chain, at least 2
+
+    Returns
+    -------
+    tuple of three matrices of numbers
+        Mean within-chain variance, between-chain variance
+        and pooled estimate of the marginal variance of each pixel
+    """
+    means = sums_of_unit_labels / samples
+    # Sample variance of a binary value is p(1 - p) n / (n - 1)
+    within = (means * (1 - means)).mean(axis=0) * samples / (samples - 1)
+    between = samples * means.var(axis=0, ddof=1)
+    variance = (samples - 1) / samples * within + between / samples
+    return within, between, variance
+
+
+def potential_scale_reduction(sums_of_unit_labels, samples):
+    """Calculates per-pixel R-hat of the unit label marginals
+
+    Parameters
+    ----------
+    sums_of_unit_labels: array of unsigned int values of size
+                         (chains, height, width)
+        How many times each pixel had value 1 in each chain
+    samples: unsigned integer
+        Number of saved labelings in each chain, at least 2
+
+    Returns
+    -------
+    matrix of numbers
+        R-hat of each pixel. Pixels that are constant in all chains have 1,
+        pixels that are constant but different in chains have inf
+    """
+    within, between, variance = variance_components(
+        sums_of_unit_labels, samples)
+    with errstate(divide="ignore", invalid="ignore"):
+        rhat = sqrt(variance / within)
+    return where(within > 0, rhat, where(between > 0, inf, 1))
+
+
+def effective_sample_size(sums_of_unit_labels, samples):
+    """Estimates per-pixel effective sample size of the unit label marginals
+
+    Parameters
+    ----------
+    sums_of_unit_labels: array of unsigned int values of size
+                         (chains, height, width)
+        How many times each pixel had value 1 in each chain
+    samples: unsigned integer
+        Number of saved labelings in each chain, at least 2
+
+    Returns
+    -------
+    matrix of numbers
+        Effective number of independent labelings for each pixel,
+        not more than the total number of saved labelings
+    """
+    chains = sums_of_unit_labels.shape[0]
+    within, between, variance = variance_components(
+        sums_of_unit_labels, samples)
+    with errstate(divide="ignore", invalid="ignore"):
+        ess = chains * samples * variance / between
+    return where(between > 0, minimum(ess, chains * samples),
+                 chains * samples)
+
+
+def multichain_gibbs_sampling(noised_image, epsilon, beta, chains,
+                              burn_in=100, thinning=1, workers=None,
+                              sweeps_per_check=10, max_rhat=1.05,
+                              min_ess=100, max_sweeps=10000, seed=None,
+                              verbose=True):
+    """Gibbs sampling with independent chains running in a process pool
+
+    Parameters
+    ----------
+    noised_image: matrix of binary values
+        Generated image after applying noise
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    chains: unsigned integer
+        Number of chains, at least 2
+    burn_in: unsigned integer
+        Number of first iterations whose labelings are not saved
+    thinning: unsigned integer
+        Only labelings of iterations divisible by it are saved
+    workers: unsigned integer or None
+        Number of processes. If None, the number of CPUs is used
+    sweeps_per_check: unsigned integer
+        Number of iterations between convergence checks
+    max_rhat: number
+        Convergence requires R-hat of every pixel to be below it
+    min_ess: number
+        Convergence requires effective sample size of every pixel
+        to be at least it
+    max_sweeps: unsigned integer
+        Maximum number of iterations
+    seed: None, int or numpy.random.SeedSequence
+        Seed of random numbers generators of chains
+    verbose: True or False
+        If True, progress of iterations is printed
+
+    Returns
+    -------
+    tuple of two arrays of size (chains, height, width) and unsigned integer
+        Last labelings of chains, how many times each pixel had value 1
+        in saved labelings of each chain and number of saved labelings
+        in each chain
+    """
+    if chains < 2:
+        raise ValueError("At least two chains are needed")
+    if verbose:
+        print("Image denoising with", chains, "chains of Gibbs sampler...")
+    height, width = noised_image.shape
+    rngs = [random.default_rng(s)
+            for s in random.SeedSequence(seed).spawn(chains)]
+    labelings = [rng.integers(2, size=(height, width)) for rng in rngs]
+    accumulators = [MarginalAccumulator((height, width), burn_in, thinning)
+                    for _ in range(chains)]
+    iteration = 0
+    with Pool(workers, _init_model, (noised_image, epsilon, beta)) as pool:
+        while iteration < max_sweeps:
+            labelings, accumulators, rngs = zip(*pool.starmap(
+                run_chain,
+                [(labeling, accumulator, rng, sweeps_per_check)
+                 for labeling, accumulator, rng
+                 in zip(labelings, accumulators, rngs)]))
+            iteration += sweeps_per_check
+            samples = accumulators[0].samples
+            if samples < 2:
+                continue
+            sums_of_unit_labels = stack(
+                [accumulator.sums_of_unit_labels
+                 for accumulator in accumulators])
+            rhat = potential_scale_reduction(sums_of_unit_labels, samples)
+            ess = effective_sample_size(sums_of_unit_labels, samples)
+            if verbose:
+                print("Iteration # {}, max R-hat {:.4f}, "
+                      "min ESS {:.1f}".format(iteration, rhat.max(),
+                                              ess.min()))
+            if rhat.max() < max_rhat and ess.min() >= min_ess:
+                break
+    sums_of_unit_labels = stack(
+        [accumulator.sums_of_unit_labels for accumulator in accumulators])
+    return stack(labelings), sums_of_unit_labels, accumulators[0].samples
@@ -0,0 +1,228 @@
+from numpy import (
+    random,
+    arange,
+    zeros_like,
+    packbits,
+    unpackbits,
+    uint8,
+    int64,
+)
+
+from checkerboard import unit_label_probability
+from utils import node_weights
+
+# Number of unit bits in each byte
+POPCOUNT = unpackbits(arange(256, dtype=uint8)[:, None], axis=1).sum(
+    axis=1).astype(uint8)
+
+
+def popcount(words):
+    """Counts unit bits in the last two axes of packed words
+
+    Parameters
+    ----------
+    words: array of uint8 values
+        Packed bits
+
+    Returns
+    -------
+    integer or array of integers
+        Number of unit bits
+    """
+    return POPCOUNT[words].sum(axis=(-2, -1), dtype=int64)
+
+
+class PackedLabeling():
+    def __init__(self, words, width):
+        """Binary labeling with 8 pixels in a byte
+
+        Parameters
+        ----------
+        words: array of uint8 values of size (..., height, ceil(width / 8))
+            Rows of labeling packed with numpy.packbits,
+            bits after the last pixel of a row are zero
+        width: unsigned integer
+            Labeling width
+        """
+        self.words = words
+        self.width = width
+
+    @classmethod
+    def from_array(cls, labeling):
+        """Packs labeling or a stack of labelings of binary values"""
+        return cls(packbits(labeling != 0, axis=-1), labeling.shape[-1])
+
+    def to_array(self):
+        """Unpacks labeling into an array of uint8 values"""
+        return unpackbits(self.words, axis=-1, count=self.width)
+
+    @property
+    def shape(self):
+        return self.words.shape[:-1] + (self.width,)
+
+    def copy(self):
+        return PackedLabeling(self.words.copy(), self.width)
+
+    def right_neighbors(self):
+        """Returns packed labels of right neighbors, zero if there is none"""
+        words = self.words << 1
+        words[..., :-1] |= self.words[..., 1:] >> 7
+        return words & packbits(arange(self.width) < self.width - 1)
+
+    def left_neighbors(self):
+        """Returns packed labels of left neighbors, zero if there is none"""
+        words = self.words >> 1
+        words[..., 1:] |= self.words[..., :-1] << 7
+        return words & packbits(arange(self.width) > 0)
+
+    def top_neighbors(self):
+        """Returns packed labels of top neighbors, zero if there is none"""
+        words = zeros_like(self.words)
+        words[..., 1:, :] = self.words[..., :-1, :]
+        return words
+
+    def bottom_neighbors(self):
+        """Returns packed labels of bottom neighbors, zero if there is none"""
+        words = zeros_like(self.words)
+        words[..., :-1, :] = self.words[..., 1:, :]
+        return words
+
+    def count_mismatches(self, other):
+        """Counts pixels whose labels differ from the other packed labeling"""
+        return popcount(self.words ^ other.words)
+
+    def count_discontinuities(self):
+        """Counts edges whose nodes have different labels"""
+        horizontal = (self.words ^ self.right_neighbors()) & \
+            packbits(arange(self.width) < self.width - 1)
+        vertical = self.words[..., 1:, :] ^ self.words[..., :-1, :]
+        return popcount(horizontal) + popcount(vertical)
+
+
+def bitwise_sum(planes):
+    """Sums packed binary planes bit by bit
+
+    Parameters
+    ----------
+    planes: list of arrays of uint8 values
+        Packed bits, not more than 7 planes
+
+    Returns
+    -------
+    list of three arrays of uint8 values
+        Packed bits of sums from the lowest to the highest one
+    """
+    sums = [zeros_like(planes[0]) for _ in range(3)]
+    for carry in planes:
+        for k in range(3):
+            sums[k], carry = sums[k] ^ carry, sums[k] & carry
+    return sums
+
+
+def unpack_sum(sums, width):
+    """Unpacks bitwise sums into an array of uint8 values"""
+    return sum(unpackbits(bits, axis=-1, count=width) << k
+               for k, bits in enumerate(sums))
+
+
+def update_strip(labeling, noised_image, table, top, bottom, parity, rng):
+    """Samples labels of one color of checkerboard in rows from top
+    to bottom of packed labeling
+
+    Neighbor sums are unpacked and uniform numbers are drawn only
+    for these rows, and only for pixels of the color
+
+    Parameters
+    ----------
+    labeling: PackedLabeling
+        Current labeling or a stack of labelings, updated in place
+    noised_image: PackedLabeling
+        Noised image
+    table: array of floats of size (5, 5, 2)
+        Probability of unit label for each number of unit neighbors,
+        number of neighbors and noised color
+    top: unsigned integer
+        The first row of the strip
+    bottom: unsigned integer
+        The row after the last row of the strip
+    parity: 0 or 1
+        Color of checkerboard, pixels with even sum of coordinates
+        are of color 0
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+    """
+    height, width = labeling.shape[-2:]
+    # Rows of the strip and the rows next to it
+    first, last = max(top - 1, 0), min(bottom + 1, height)
+    window = PackedLabeling(labeling.words[..., first:last, :], width)
+    strip = (Ellipsis, slice(top - first, bottom - first), slice(None))
+    units = unpack_sum([bits[strip] for bits in bitwise_sum([
+        window.left_neighbors(), window.top_neighbors(),
+        window.right_neighbors(), window.bottom_neighbors()])], width)
+    rows = arange(top, bottom)[:, None]
+    columns = arange(width)
+    neighbors = 4 - (rows == 0) - (rows == height - 1) - \
+        (columns == 0) - (columns == width - 1)
+    noised = unpackbits(noised_image.words[..., top:bottom, :], axis=-1,
+                        count=width)
+    sample = zeros_like(units)
+    for offset in (0, 1):
+        # Pixels of the color in every other row of the strip
+        start = (parity + top + offset) % 2
+        pixels = (Ellipsis, slice(offset, None, 2), slice(start, None, 2))
+        probability = table[units[pixels], neighbors[pixels],
+                            noised[pixels]]
+        sample[pixels] = rng.uniform(
+            size=probability.shape) < probability  # U[0, 1]
+    color = packbits((rows + columns) % 2 == parity, axis=-1)
+    words = labeling.words[..., top:bottom, :]
+    words &= ~color
+    words |= packbits(sample, axis=-1) & color
+
+
+def packed_checkerboard_iteration(labeling, noised_image, epsilon, beta,
+                                  rng=random, strip_height=64):
+    """One iteration of Gibbs sampler with checkerboard updates
+    of packed labeling
+
+    Numbers of neighbors with unit label are summed on packed bits,
+    then each pixel gets the probability of unit label from a table
+    indexed by the number of its neighbors, the number of its neighbors
+    with unit label and its noised color. Labeling is updated in strips
+    of rows, so temporary arrays are of strip size rather than image size
+
+    Parameters
+    ----------
+    labeling: PackedLabeling
+        Current labeling or a stack of labelings along the first axis
+    noised_image: PackedLabeling
+        Noised image with the same shape
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+    strip_height: unsigned integer
+        Number of rows of a strip
+
+    Returns
+    -------
+    PackedLabeling
+        Updated labeling
+    """
+    height = labeling.shape[-2]
+    # Probability of unit label for each number of unit neighbors,
+    # number of neighbors and noised color
+    zero_weights, unit_weights = node_weights(arange(2), epsilon)
+    table = unit_label_probability(
+        arange(5)[:, None, None], arange(5)[None, :, None],
+        unit_weights - zero_weights, beta)
+    labeling = labeling.copy()
+    for parity in (0, 1):
+        # Pixels of one color depend only on pixels of the other color,
+        # so strips of one color may be updated one after another
+        for top in range(0, height, strip_height):
+            update_strip(labeling, noised_image, table, top,
+                         min(top + strip_height, height), parity, rng)
+    return labeling
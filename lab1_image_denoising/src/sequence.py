@@ -0,0 +1,263 @@
+import argparse
+import configparser
+import os
+from time import perf_counter
+
+from numpy import (
+    load,
+    pad,
+    random,
+    uint8,
+    where,
+)
+from numpy.lib.format import open_memmap
+
+from accumulator import MarginalAccumulator
+from batch import (
+    find_images,
+    load_image,
+    save_image,
+    read_options,
+    solve,
+    METHODS,
+)
+from checkerboard import checkerboard_iteration
+from tiled import expand_tile
+
+
+def open_frames(source):
+    """Opens frames of a sequence without reading them
+
+    Parameters
+    ----------
+    source: string
+        .npy file of size (frames, height, width), which is memory-mapped,
+        or directory, glob pattern or manifest of images
+
+    Returns
+    -------
+    tuple of unsigned integer and iterator of matrices
+        Number of frames and frames, each is read when it is needed
+    """
+    if source.endswith(".npy"):
+        frames = load(source, mmap_mode="r")
+        return len(frames), (uint8(frame != 0) for frame in frames)
+    paths = find_images(source)
+    return len(paths), (load_image(path) for path in paths)
+
+
+def box_sums(mask, radius):
+    """Counts True values in squares around pixels
+
+    Parameters
+    ----------
+    mask: matrix of binary values
+        Mask, pixels out of it repeat the nearest border pixels
+    radius: unsigned integer
+        Half side of the square
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Numbers of True values in the squares
+    """
+    height, width = mask.shape
+    side = 2 * radius + 1
+    sums = pad(mask, radius + 1, mode="edge").cumsum(axis=0).cumsum(axis=1)
+    sums = sums[side:, side:] - sums[:-side, side:] - \
+        sums[side:, :-side] + sums[:-side, :-side]
+    return sums[:height, :width]
+
+
+def changed_region(frame, previous_frame, radius, threshold):
+    """Finds pixels near a change since the previous frame
+
+    Parameters
+    ----------
+    frame: matrix of binary values
+        Noised frame
+    previous_frame: matrix of binary values
+        Previous noised frame
+    radius: unsigned integer
+        Half side of squares where changed pixels are counted,
+        so that noise is not taken for a change
+    threshold: number from [0, 1]
+        Pixels with larger part of changed pixels in their square
+        and pixels in their squares are changed
+
+    Returns
+    -------
+    matrix of binary values
+        True for changed pixels
+    """
+    side = 2 * radius + 1
+    changed = box_sums(frame != previous_frame, radius) > \
+        threshold * side ** 2
+    return box_sums(changed, radius) > 0
+
+
+def warm_gibbs_sampling(frame, labeling, changed, epsilon, beta, halo,
+                        sweeps, burn_in=5, thinning=2, rng=random):
+    """Samples labels of changed pixels of a frame while other pixels keep
+    labels of the previous frame
+
+    Only the bounding box of changed pixels with halo around it is sampled.
+    Changed pixels start from the frame
+
+    Parameters
+    ----------
+    frame: matrix of binary values
+        Noised frame
+    labeling: matrix of binary values
+        Result of the previous frame
+    changed: matrix of binary values
+        Changed pixels from changed_region
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    halo: unsigned integer
+        Width of fixed pixels around changed ones
+    sweeps: unsigned integer
+        Number of iterations
+    burn_in: unsigned integer
+        Number of first iterations whose labelings are not saved
+    thinning: unsigned integer
+        Only labelings of iterations divisible by it are saved
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+
+    Returns
+    -------
+    matrix of binary values
+        The most common colors of saved labelings
+    """
+    rows, columns = changed.nonzero()
+    # Labeling of the previous frame is not overwritten
+    labeling = labeling.astype(uint8)
+    if len(rows) == 0:
+        return labeling
+    height, width = frame.shape
+    box = (slice(rows.min(), rows.max() + 1),
+           slice(columns.min(), columns.max() + 1))
+    window, _ = expand_tile(box, halo, height, width)
+    fixed = ~changed[window]
+    labeling_window = where(fixed, labeling[window], frame[window])
+    accumulator = MarginalAccumulator(labeling_window.shape, burn_in,
+                                      thinning)
+    for _ in range(sweeps):
+        labeling_window = checkerboard_iteration(
+            labeling_window, frame[window], epsilon, beta, rng, fixed)
+        accumulator.update(labeling_window)
+    if accumulator.samples > 0:
+        labeling_window = accumulator.labeling()
+    labeling[window] = labeling_window
+    return labeling
+
+
+def sequence_denoising(frames, method, options, radius=2, threshold=0.5,
+                       halo=4, sweeps=20, refresh=10, seed=None,
+                       verbose=True):
+    """Lazily denoises frames, Gibbs sampler starts each frame
+    from the previous result
+
+    The first frame is denoised as a single image. Labels of unchanged
+    pixels are never sampled again, so errors of warm frames may
+    accumulate, and each refresh-th frame is denoised as a single image
+    again. Maxflow is exact and fast, so it denoises each frame
+    as a single image
+
+    Parameters
+    ----------
+    frames: iterable of matrices of binary values
+        Noised frames
+    method: string
+        "gibbs" for Gibbs sampler, "maxflow" for maxflow
+    options: dictionary
+        Parameters from batch.read_options
+    radius: unsigned integer
+        Half side of squares where changed pixels are counted
+    threshold: number from [0, 1]
+        Part of changed pixels in squares of changed pixels
+    halo: unsigned integer
+        Width of fixed pixels around changed ones
+    sweeps: unsigned integer
+        Number of iterations of Gibbs sampler on each frame after the first
+    refresh: unsigned integer
+        Period of frames denoised as single images, 0 for the first only
+    seed: None or int
+        Seed of random numbers generator
+    verbose: True or False
+        If True, progress of Gibbs sampler on single images is printed
+
+    Returns
+    -------
+    generator of tuples of matrix of binary values and float
+        Resulting labeling and part of changed pixels of each frame
+    """
+    if method not in METHODS:
+        raise ValueError("Unknown method")
+    # Gibbs sampler of the first frame uses the global generator
+    random.seed(seed)
+    previous_frame, labeling = None, None
+    for number, frame in enumerate(frames):
+        if labeling is None or method == "maxflow" or \
+                refresh > 0 and number % refresh == 0:
+            labeling = solve(frame, method, options, verbose)
+            changed_part = 1.0
+        else:
+            changed = changed_region(frame, previous_frame, radius, threshold)
+            labeling = warm_gibbs_sampling(
+                frame, labeling, changed, options["epsilon"],
+                options["beta"], halo, sweeps, options["burn_in"],
+                options["thinning"])
+            changed_part = changed.mean()
+        previous_frame = frame
+        yield labeling, changed_part
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Denoise a sequence of binary frames')
+    parser.add_argument("source",
+                        help=".npy file of size (frames, height, width), "
+                             "directory, glob pattern or manifest of frames")
+    parser.add_argument("output",
+                        help=".npy file or directory for .png frames")
+    parser.add_argument("--method", choices=METHODS, default="gibbs",
+                        help="denoising method")
+    parser.add_argument("--config", default="config.ini",
+                        help="path to config file")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of random numbers generator")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    number, frames = open_frames(args.source)
+    results = sequence_denoising(
+        frames, args.method, read_options(args.config),
+        radius=int(config['SEQUENCE']['radius']),
+        threshold=float(config['SEQUENCE']['threshold']),
+        halo=int(config['SEQUENCE']['halo']),
+        sweeps=int(config['SEQUENCE']['sweeps']),
+        refresh=int(config['SEQUENCE']['refresh']),
+        seed=args.seed, verbose=False)
+    output = None
+    start = perf_counter()
+    for k in range(number):
+        labeling, changed_part = next(results)
+        if args.output.endswith(".npy"):
+            if output is None:
+                output = open_memmap(args.output, mode="w+", dtype=uint8,
+                                     shape=(number,) + labeling.shape)
+            output[k] = labeling
+            output.flush()
+        else:
+            os.makedirs(args.output, exist_ok=True)
+            save_image(labeling, os.path.join(
+                args.output, "frame_{:06d}.png".format(k)))
+        print("Frame", k + 1, "of", number, "in",
+              "{:.3f}s, {:.1%} of pixels changed".format(
+                  perf_counter() - start, changed_part))
+        start = perf_counter()
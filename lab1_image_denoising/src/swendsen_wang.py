@@ -0,0 +1,77 @@
+from numpy import (
+    random,
+    exp,
+    logaddexp,
+    arange,
+    ones,
+    zeros,
+    bincount,
+    broadcast_to,
+    concatenate,
+)
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils import (
+    edge_weight,
+    node_weights,
+)
+
+
+def swendsen_wang_iteration(labeling, noised_image, epsilon, beta,
+                            rng=random):
+    """One iteration of Swendsen-Wang sampler
+
+    Each edge whose nodes have the same label becomes a bond with
+    probability 1 - exp(-beta). Connected components of bonds are clusters,
+    and all pixels of a cluster get the same new label with probability
+    given by the sum of node weights of the cluster.
+    The stationary distribution is the same as for Gibbs sampler.
+
+    Parameters
+    ----------
+    labeling: array of binary values
+        Current labeling or a stack of labelings along the first axis
+    noised_image: array of binary values or None
+        Noised image broadcastable to labeling.
+        If None, only edges weights are used
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    rng: numpy.random.Generator or numpy.random module
+        Source of random numbers
+
+    Returns
+    -------
+    array of binary values
+        Updated labeling
+    """
+    shape = labeling.shape
+    pixels = arange(labeling.size).reshape(shape)
+    bond_probability = 1 - exp(-edge_weight(0, 1, beta))
+    horizontal = (labeling[..., :, 1:] == labeling[..., :, :-1]) & \
+        (rng.uniform(size=pixels[..., :, 1:].shape) < bond_probability)
+    vertical = (labeling[..., 1:, :] == labeling[..., :-1, :]) & \
+        (rng.uniform(size=pixels[..., 1:, :].shape) < bond_probability)
+    sources = concatenate([pixels[..., :, :-1][horizontal],
+                           pixels[..., :-1, :][vertical]])
+    targets = concatenate([pixels[..., :, 1:][horizontal],
+                           pixels[..., 1:, :][vertical]])
+    bonds = coo_matrix((ones(len(sources), dtype=bool), (sources, targets)),
+                       shape=(labeling.size, labeling.size))
+    number_of_clusters, clusters = connected_components(bonds, directed=False)
+
+    if noised_image is None:
+        unary_difference = zeros(labeling.size)
+    else:
+        zero_weights, unit_weights = node_weights(noised_image, epsilon)
+        unary_difference = broadcast_to(
+            unit_weights - zero_weights, shape).ravel()
+    # Difference between node weights of unit and zero labels of clusters
+    clusters_difference = bincount(clusters, weights=unary_difference,
+                                   minlength=number_of_clusters)
+    probability = exp(-logaddexp(0, clusters_difference))
+    clusters_labels = rng.uniform(size=number_of_clusters) < probability
+    labeling[...] = clusters_labels[clusters].reshape(shape)
+    return labeling
@@ -0,0 +1,291 @@
+import argparse
+import configparser
+import os
+from multiprocessing import Pool
+from tempfile import TemporaryDirectory
+
+from numpy import (
+    load,
+    memmap,
+    random,
+    uint8,
+    uint16,
+    zeros,
+)
+from numpy.lib.format import open_memmap
+
+from accumulator import MarginalAccumulator
+from checkerboard import checkerboard_iteration
+
+
+def open_image(path, shape=None, dtype=uint8):
+    """Opens binary image as a read-only memory-mapped array
+
+    Parameters
+    ----------
+    path: string
+        Path to .npy file or to raw file of pixels in row-major order
+    shape: tuple of two unsigned integers or None
+        Image shape, needed only for raw files
+    dtype: numpy type
+        Type of pixels of raw file
+
+    Returns
+    -------
+    memory-mapped matrix
+        Image, nonzero pixels are unit labels
+    """
+    if path.endswith(".npy"):
+        return load(path, mmap_mode="r")
+    if shape is None:
+        raise ValueError("Shape of raw image is needed")
+    return memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def get_tiles(height, width, tile_size):
+    """Splits image into square tiles
+
+    Parameters
+    ----------
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+    tile_size: unsigned integer
+        Tile side, tiles on the bottom and right borders may be smaller
+
+    Returns
+    -------
+    list of tuples of slices
+        Vertical and horizontal slices of each tile
+    """
+    return [(slice(i, min(i + tile_size, height)),
+             slice(j, min(j + tile_size, width)))
+            for i in range(0, height, tile_size)
+            for j in range(0, width, tile_size)]
+
+
+def expand_tile(tile, halo, height, width):
+    """Adds halo around tile
+
+    Parameters
+    ----------
+    tile: tuple of slices
+        Vertical and horizontal slices of tile
+    halo: unsigned integer
+        Halo width, at least 1
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+
+    Returns
+    -------
+    tuple of two tuples of slices
+        Slices of tile with halo in image
+        and slices of tile in tile with halo
+    """
+    rows, columns = tile
+    top = max(rows.start - halo, 0)
+    left = max(columns.start - halo, 0)
+    window = (slice(top, min(rows.stop + halo, height)),
+              slice(left, min(columns.stop + halo, width)))
+    core = (slice(rows.start - top, rows.stop - top),
+            slice(columns.start - left, columns.stop - left))
+    return window, core
+
+
+def denoise_tile(paths, tile, halo, epsilon, beta,
+                 first_iteration, sweeps, burn_in, thinning, seed):
+    """Runs some iterations of Gibbs sampler on tile with halo,
+    labels on the outer border of the halo are held fixed
+
+    Parameters
+    ----------
+    paths: dictionary
+        Paths to .npy files of noised image ("noised"), labeling before
+        ("labeling") and after ("next_labeling") the iterations
+        and counters of unit labels ("counts")
+    tile: tuple of slices
+        Vertical and horizontal slices of tile
+    halo: unsigned integer
+        Halo width, at least 1
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    first_iteration: unsigned integer
+        Number of iterations done before
+    sweeps: unsigned integer
+        Number of iterations
+    burn_in: unsigned integer
+        Number of first iterations whose labelings are not saved
+    thinning: unsigned integer
+        Only labelings of iterations divisible by it are saved
+    seed: numpy.random.SeedSequence
+        Seed of random numbers generator of the tile
+    """
+    noised_image = open_image(paths["noised"])
+    labeling = load(paths["labeling"], mmap_mode="r")
+    next_labeling = load(paths["next_labeling"], mmap_mode="r+")
+    counts = load(paths["counts"], mmap_mode="r+")
+    height, width = labeling.shape
+    window, core = expand_tile(tile, halo, height, width)
+
+    noised_window = uint8(noised_image[window] != 0)
+    labeling_window = labeling[window].copy()
+    # Border of the halo inside the image keeps labels of neighbor tiles
+    fixed = zeros(labeling_window.shape, dtype=bool)
+    fixed[0, :] |= window[0].start > 0
+    fixed[-1, :] |= window[0].stop < height
+    fixed[:, 0] |= window[1].start > 0
+    fixed[:, -1] |= window[1].stop < width
+
+    accumulator = MarginalAccumulator(
+        labeling_window[core].shape, burn_in, thinning, counts.dtype)
+    accumulator.iterations = first_iteration
+    accumulator.sums_of_unit_labels = counts[tile]  # updated in place
+    rng = random.default_rng(seed)
+    for _ in range(sweeps):
+        labeling_window = checkerboard_iteration(
+            labeling_window, noised_window, epsilon, beta, rng, fixed)
+        accumulator.update(labeling_window[core])
+    next_labeling[tile] = labeling_window[core]
+    next_labeling.flush()
+    counts.flush()
+
+
+def tiled_gibbs_sampling(noised_path, output_path, epsilon, beta,
+                         tile_size=1024, halo=8, rounds=50,
+                         sweeps_per_round=2, burn_in=5, thinning=2,
+                         workers=None, shape=None, seed=None):
+    """Gibbs sampling of a large image from disk by tiles in a process pool
+
+    Tiles with halo are sampled in parallel while labels of the outer
+    border of the halo are held fixed. After each round of iterations
+    the tiles exchange the labels of their borders through a labeling
+    on disk, so only a few tiles are in memory at once.
+
+    Parameters
+    ----------
+    noised_path: string
+        Path to .npy file or to raw uint8 file of noised image
+    output_path: string
+        Path to .npy file for the most common colors of saved labelings
+    epsilon: number
+        Noise level
+    beta: number
+        Weight of edge if its labels differ
+    tile_size: unsigned integer
+        Tile side
+    halo: unsigned integer
+        Halo width, at least 1
+    rounds: unsigned integer
+        Number of exchanges of tiles borders
+    sweeps_per_round: unsigned integer
+        Number of iterations between exchanges
+    burn_in: unsigned integer
+        Number of first iterations whose labelings are not saved
+    thinning: unsigned integer
+        Only labelings of iterations divisible by it are saved
+    workers: unsigned integer or None
+        Number of processes. If None, the number of CPUs is used
+    shape: tuple of two unsigned integers or None
+        Image shape, needed only for raw files
+    seed: None or int
+        Seed of random numbers generators
+
+    Returns
+    -------
+    memory-mapped matrix of binary values
+        The most common colors of saved labelings
+    """
+    if halo < 1:
+        raise ValueError("Halo width must be at least 1")
+    noised_image = open_image(noised_path, shape)
+    height, width = noised_image.shape
+    tiles = get_tiles(height, width, tile_size)
+    print("Image denoising with Gibbs sampler on", len(tiles), "tiles...")
+    seed_sequence = random.SeedSequence(seed)
+    iterations = rounds * sweeps_per_round
+    samples = len([k for k in range(burn_in + 1, iterations + 1)
+                   if k % thinning == 0])
+    with TemporaryDirectory(dir=os.path.dirname(output_path) or None) \
+            as work_dir:
+        if not noised_path.endswith(".npy"):
+            # Workers open the noised image without knowing its shape
+            image_path = os.path.join(work_dir, "noised.npy")
+            image = open_memmap(image_path, "w+", uint8, (height, width))
+            for tile in tiles:
+                image[tile] = noised_image[tile]
+            image.flush()
+            del image
+            noised_path = image_path
+        paths = {
+            "noised": noised_path,
+            "labeling": os.path.join(work_dir, "labeling.npy"),
+            "next_labeling": os.path.join(work_dir, "next_labeling.npy"),
+            "counts": os.path.join(work_dir, "counts.npy"),
+        }
+        labeling = open_memmap(paths["labeling"], "w+", uint8,
+                               (height, width))
+        rng = random.default_rng(seed_sequence.spawn(1)[0])
+        for tile in tiles:
+            labeling[tile] = rng.integers(
+                2, size=labeling[tile].shape, dtype=uint8)  # U{0, 1}
+        labeling.flush()
+        del labeling
+        open_memmap(paths["next_labeling"], "w+", uint8, (height, width))
+        open_memmap(paths["counts"], "w+", uint16, (height, width))
+
+        with Pool(workers) as pool:
+            for round_number in range(rounds):
+                seeds = seed_sequence.spawn(len(tiles))
+                pool.starmap(denoise_tile, [
+                    (paths, tile, halo, epsilon, beta,
+                     round_number * sweeps_per_round, sweeps_per_round,
+                     burn_in, thinning, tile_seed)
+                    for tile, tile_seed in zip(tiles, seeds)])
+                paths["labeling"], paths["next_labeling"] = \
+                    paths["next_labeling"], paths["labeling"]
+                print("Iteration # {}".format(
+                    (round_number + 1) * sweeps_per_round))
+
+        counts = load(paths["counts"], mmap_mode="r")
+        result = open_memmap(output_path, "w+", uint8, (height, width))
+        for tile in tiles:
+            # The most common color, ties are resolved in favor of unit label
+            result[tile] = counts[tile] >= (samples + 1) // 2
+        result.flush()
+        del counts
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Denoise large binary image by tiles')
+    parser.add_argument("noised_path",
+                        help="path to .npy or raw uint8 noised image")
+    parser.add_argument("output_path",
+                        help="path to .npy file for the result")
+    parser.add_argument("--shape", type=int, nargs=2, default=None,
+                        help="height and width of raw image")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of random numbers generator")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    tiled_gibbs_sampling(
+        args.noised_path, args.output_path,
+        float(config['NOISE_LEVEL']['epsilon']),
+        float(config['EDGE_WEIGHT']['beta_gibbs']),
+        tile_size=int(config['TILES']['tile_size']),
+        halo=int(config['TILES']['halo']),
+        rounds=int(config['TILES']['rounds']),
+        sweeps_per_round=int(config['TILES']['sweeps_per_round']),
+        burn_in=int(config['ITERATIONS']['burn_in']),
+        thinning=int(config['ITERATIONS']['thinning']),
+        workers=int(config['TILES']['workers']) or None,
+        shape=tuple(args.shape) if args.shape else None,
+        seed=args.seed)
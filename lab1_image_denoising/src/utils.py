@@ -1,4 +1,9 @@
-from numpy import log
+from numpy import (
+    log,
+    where,
+    zeros,
+    int8,
+)
 
 
 def neighbor_exists(image_height, image_width, i, j, neighbor_number):
@@ -99,3 +104,71 @@ def node_weight(label, noised_color, epsilon):
         return -log(1 - epsilon)
     else:
         return -log(epsilon)
+
+
+def node_weights(noised_image, epsilon):
+    """Calculates weights of both labels in all nodes at once
+
+    Parameters
+    ----------
+    noised_image: array of binary values
+        Noised image or a stack of noised images
+    epsilon: number from [0, 1]
+        Noised level
+
+    Returns
+    -------
+    tuple of two arrays of noised_image shape
+        Weights of zero label and weights of unit label in each node
+    """
+    zero_weights = where(noised_image == 0,
+                         node_weight(0, 0, epsilon),
+                         node_weight(0, 1, epsilon))
+    unit_weights = where(noised_image == 1,
+                         node_weight(1, 1, epsilon),
+                         node_weight(1, 0, epsilon))
+    return zero_weights, unit_weights
+
+
+def count_neighbors(image_height, image_width):
+    """Counts existing neighbors of every pixel
+
+    Parameters
+    ----------
+    image_height: unsigned integer
+        Image height
+    image_width: unsigned integer
+        Image width
+
+    Returns
+    -------
+    matrix of integers of size (image_height, image_width)
+        Number of neighbors of each pixel
+    """
+    neighbors = zeros((image_height, image_width), dtype=int8)
+    neighbors[:, 1:] += 1  # left
+    neighbors[1:, :] += 1  # top
+    neighbors[:, :-1] += 1  # right
+    neighbors[:-1, :] += 1  # bottom
+    return neighbors
+
+
+def count_unit_neighbors(labeling):
+    """Counts neighbors with unit label of every pixel
+
+    Parameters
+    ----------
+    labeling: array of binary values
+        Labeling or a stack of labelings along the first axis
+
+    Returns
+    -------
+    array of integers of labeling shape
+        Number of neighbors labeled 1 of each pixel
+    """
+    units = zeros(labeling.shape, dtype=int8)
+    units[..., :, 1:] += labeling[..., :, :-1]  # left
+    units[..., 1:, :] += labeling[..., :-1, :]  # top
+    units[..., :, :-1] += labeling[..., :, 1:]  # right
+    units[..., :-1, :] += labeling[..., 1:, :]  # bottom
+    return units
@@ -0,0 +1,32 @@
+import sys
+sys.path.append('../src')
+
+from src.accumulator import MarginalAccumulator
+
+from numpy import array, uint8
+import pytest
+
+
+def test_burn_in_and_thinning():
+    accumulator = MarginalAccumulator((1, 2), burn_in=2, thinning=2)
+    saved = [accumulator.update(array([[1, 0]])) for _ in range(7)]
+    assert saved == [False, False, False, True, False, True, False]
+    assert accumulator.samples == 2
+    assert (accumulator.sums_of_unit_labels == array([[2, 0]])).all()
+
+
+def test_statistics():
+    accumulator = MarginalAccumulator((1, 3))
+    for labeling in ([[1, 0, 1]], [[1, 0, 0]], [[1, 1, 0]], [[1, 0, 1]]):
+        accumulator.update(array(labeling))
+    assert (accumulator.marginals() == array([[1, 0.25, 0.5]])).all()
+    assert (accumulator.labeling() == array([[1, 0, 1]])).all()
+    assert (accumulator.uncertainty() == array([[0, 0.25, 0.5]])).all()
+
+
+def test_overflow():
+    accumulator = MarginalAccumulator((1, 1), dtype=uint8)
+    for _ in range(255):
+        accumulator.update(array([[1]]))
+    with pytest.raises(OverflowError):
+        accumulator.update(array([[1]]))
@@ -0,0 +1,75 @@
+import sys
+sys.path.append('../src')
+
+from src.annealing import (
+    GeometricSchedule,
+    LinearSchedule,
+    AdaptiveSchedule,
+    make_schedule,
+    simulated_annealing,
+)
+from src.energy import energy_breakdown
+from src.image_generation import (
+    sample_input_image,
+    add_noise,
+)
+
+from numpy import random, isclose
+
+import pytest
+
+
+def test_geometric_schedule():
+    schedule = GeometricSchedule(1, 0.3, 0.5)
+    temperatures = []
+    for _ in range(3):
+        schedule.update(0.5)
+        temperatures.append(schedule.temperature)
+    assert temperatures == [0.5, 0.3, 0.3]
+
+
+def test_linear_schedule():
+    schedule = LinearSchedule(2, 1, 4)
+    for _ in range(4):
+        schedule.update(0.5)
+    assert isclose(schedule.temperature, 1)
+    schedule.update(0.5)
+    assert isclose(schedule.temperature, 1)
+
+
+def test_adaptive_schedule():
+    schedule = AdaptiveSchedule(1, 0.01, 0.25, 0.1)
+    schedule.update(0.5)
+    assert schedule.temperature == 0.25
+    schedule.update(0.05)
+    assert schedule.temperature == 0.125
+
+
+def test_make_schedule():
+    assert isinstance(make_schedule("adaptive", 1, 0.1, 0.9, 10, 0.1),
+                      AdaptiveSchedule)
+    with pytest.raises(ValueError):
+        make_schedule("exponential", 1, 0.1, 0.9, 10, 0.1)
+
+
+@pytest.mark.parametrize("name,cooling_rate,iterations", [
+    ("geometric", 0.9, 100),
+    # Schedule of config.ini
+    ("geometric", 0.95, 1000),
+    ("linear", 0.9, 60),
+    ("adaptive", 0.9, 1000),
+])
+def test_simulated_annealing(name, cooling_rate, iterations):
+    epsilon, beta = 0.1, 0.9
+    image = sample_input_image(40, 40, beta, 20, seed=0)
+    noised_image = add_noise(image, epsilon, seed=1)
+    schedule = make_schedule(name, 2, 0.05, cooling_rate, iterations, 0.01)
+    labeling, energies = simulated_annealing(
+        noised_image, epsilon, beta, schedule, initial_labeling=noised_image,
+        window=10, tolerance=1e-4, rng=random.default_rng(2))
+    energy = energy_breakdown(labeling, noised_image, epsilon, beta)["total"]
+    assert labeling.shape == noised_image.shape
+    # Iterations stop only after cooling, at the lowest energy
+    assert isclose(schedule.temperature, 0.05)
+    assert energy == min(energies)
+    assert energy < energies[0]
@@ -0,0 +1,90 @@
+import sys
+sys.path.append('../src')
+
+import json
+import os
+
+from src.batch import (
+    find_images,
+    load_image,
+    save_image,
+    batch_denoise,
+)
+
+from numpy import array, save, uint8
+
+import pytest
+
+
+def test_find_images(tmp_path):
+    for name in ["b.npy", "a.png", "notes.md"]:
+        (tmp_path / name).write_bytes(b"")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.png\n# comment\n\nb.npy\n")
+    assert find_images(str(tmp_path)) == [
+        str(tmp_path / "a.png"), str(tmp_path / "b.npy")]
+    assert find_images(str(manifest)) == [
+        str(tmp_path / "a.png"), str(tmp_path / "b.npy")]
+    assert find_images(str(tmp_path / "*.npy")) == [str(tmp_path / "b.npy")]
+
+
+def test_save_and_load_image(tmp_path):
+    image = array([[0, 1], [1, 1]], dtype=uint8)
+    for name in ["image.png", "image.npy"]:
+        save_image(image, str(tmp_path / name))
+        assert (load_image(str(tmp_path / name)) == image).all()
+
+
+def test_batch_denoise(tmp_path):
+    image = array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0]], dtype=uint8)
+    save(str(tmp_path / "image.npy"), image)
+    options = {"epsilon": 0.1, "beta": 2.0}
+    records = batch_denoise([str(tmp_path / "image.npy")],
+                            str(tmp_path / "out"), "maxflow", options,
+                            workers=1, output_format="npy")
+    assert (load_image(records[0]["output"]) == 0).all()
+    with open(str(tmp_path / "out" / "records.jsonl")) as records_file:
+        assert [json.loads(line) for line in records_file] == records
+    assert records[0]["height"] == 3 and records[0]["width"] == 4
+
+
+def test_batch_denoise_gibbs(tmp_path, capsys):
+    image = array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0]], dtype=uint8)
+    save(str(tmp_path / "image.npy"), image)
+    options = {"epsilon": 0.1, "beta": 2.0, "changes_threshold": 5,
+               "sweep": "checkerboard", "burn_in": 2, "thinning": 1}
+    records = batch_denoise([str(tmp_path / "image.npy")],
+                            str(tmp_path / "out"), "gibbs", options,
+                            workers=1, seed=0)
+    assert records[0]["method"] == "gibbs"
+    # Only the record of each image is printed
+    assert capsys.readouterr().out.startswith("Denoised")
+
+
+@pytest.mark.parametrize("method", ["gibbs", "maxflow"])
+def test_batch_denoise_cache(tmp_path, method):
+    image = array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0]], dtype=uint8)
+    save(str(tmp_path / "image.npy"), image)
+    options = {"epsilon": 0.1, "beta": 2.0, "changes_threshold": 5,
+               "sweep": "checkerboard", "burn_in": 2, "thinning": 1}
+    records = [batch_denoise([str(tmp_path / "image.npy")],
+                             str(tmp_path / "out{}".format(k)), method,
+                             options, workers=1, output_format="npy",
+                             noise=True, seed=0,
+                             cache_dir=str(tmp_path / "cache"))[0]
+               for k in range(2)]
+    assert [record["cached"] for record in records] == [False, True]
+    assert records[0]["energy"] == records[1]["energy"]
+    assert (load_image(records[0]["output"]) ==
+            load_image(records[1]["output"])).all()
+
+
+def test_batch_denoise_cache_without_seed(tmp_path):
+    save(str(tmp_path / "image.npy"), array([[0, 1], [1, 1]], dtype=uint8))
+    options = {"epsilon": 0.1, "beta": 2.0}
+    for _ in range(2):
+        record = batch_denoise([str(tmp_path / "image.npy")],
+                               str(tmp_path / "out"), "maxflow", options,
+                               workers=1, cache_dir=str(tmp_path / "cache"))[0]
+        assert not record["cached"]
+    assert not os.path.exists(str(tmp_path / "cache"))
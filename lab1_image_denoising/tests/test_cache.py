@@ -0,0 +1,45 @@
+import sys
+sys.path.append('../src')
+
+import os
+
+from src.cache import (
+    ResultCache,
+    result_key,
+)
+
+from numpy import array, uint8
+
+
+def test_result_key():
+    image = array([[0, 1], [0, 0]], dtype=uint8)
+    key = result_key(image, "gibbs", {"beta": 0.9, "seed": 1})
+    assert key == result_key(image.copy(), "gibbs", {"seed": 1, "beta": 0.9})
+    assert key != result_key(image.T, "gibbs", {"beta": 0.9, "seed": 1})
+    assert key != result_key(image, "maxflow", {"beta": 0.9, "seed": 1})
+    assert key != result_key(image, "gibbs", {"beta": 0.9, "seed": 2})
+    assert key != result_key(image.astype(int), "gibbs",
+                             {"beta": 0.9, "seed": 1})
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    labeling = array([[0, 1], [1, 1]], dtype=uint8)
+    assert cache.get("a") is None
+    cache.put("a", labeling, {"energy": 1.5})
+    cached_labeling, metadata = cache.get("a")
+    assert (cached_labeling == labeling).all()
+    assert metadata == {"energy": 1.5}
+
+
+def test_result_cache_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    labeling = array([[0, 1], [1, 1]], dtype=uint8)
+    for time, key in enumerate("abc"):
+        cache.put(key, labeling, {})
+        os.utime(cache.path(key), (time, time))
+    cache.get("a")
+    cache.max_bytes = 2 * os.path.getsize(cache.path("a"))
+    cache.evict()
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
@@ -0,0 +1,60 @@
+import sys
+sys.path.append('../src')
+
+from src.checkerboard import (
+    CHECKERBOARD,
+    checkerboard_iteration,
+)
+from src.utils import (
+    node_weight,
+    edge_weight,
+)
+
+from numpy import array, exp, random, zeros, int_
+
+
+def test_checkerboard():
+    colors = zeros((3, 5), dtype=int)
+    for color, sublattices in enumerate(CHECKERBOARD):
+        for i, j in sublattices:
+            colors[i, j] += color + 1
+    assert (colors == array([[1, 2, 1, 2, 1],
+                             [2, 1, 2, 1, 2],
+                             [1, 2, 1, 2, 1]])).all()
+
+
+def test_checkerboard_iteration_marginals():
+    noised_image = array([[0, 1], [1, 1]])
+    epsilon, beta = 0.2, 0.8
+    # Exact marginals of unit label by enumeration of all 16 labelings
+    marginals = zeros((2, 2))
+    normalization = 0
+    for state in range(16):
+        labeling = array([(state >> b) & 1 for b in range(4)]).reshape(2, 2)
+        energy = sum(node_weight(labeling[i, j], noised_image[i, j], epsilon)
+                     for i in range(2) for j in range(2))
+        energy += sum(edge_weight(labeling[i, 0], labeling[i, 1], beta)
+                      for i in range(2))
+        energy += sum(edge_weight(labeling[0, j], labeling[1, j], beta)
+                      for j in range(2))
+        marginals += exp(-energy) * labeling
+        normalization += exp(-energy)
+    marginals /= normalization
+
+    rng = random.default_rng(0)
+    chains = int_(rng.uniform(size=(20000, 2, 2)) < 0.5)
+    for _ in range(20):
+        chains = checkerboard_iteration(
+            chains, noised_image, epsilon, beta, rng)
+    assert abs(chains.mean(axis=0) - marginals).max() < 0.02
+
+
+def test_checkerboard_iteration_fixed():
+    rng = random.default_rng(1)
+    labeling = zeros((4, 4), dtype=int)
+    fixed = zeros((4, 4), dtype=bool)
+    fixed[0, :] = True
+    for _ in range(10):
+        labeling = checkerboard_iteration(labeling, None, None, 0.1, rng, fixed)
+    assert (labeling[0, :] == 0).all()
+    assert labeling[1:, :].any()
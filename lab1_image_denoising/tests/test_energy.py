@@ -0,0 +1,48 @@
+import sys
+sys.path.append('../src')
+
+from src.energy import (
+    count_mismatches,
+    energy_breakdown,
+)
+from src.utils import (
+    node_weight,
+    edge_weight,
+    neighbor_exists,
+    get_neighbor_coordinate,
+)
+
+from numpy import array, random
+
+
+def loop_energy(labeling, noised_image, epsilon, beta):
+    height, width = labeling.shape
+    unary, pairwise = 0, 0
+    for i in range(height):
+        for j in range(width):
+            unary += node_weight(labeling[i, j], noised_image[i, j], epsilon)
+            for n in (2, 3):  # right and bottom neighbors
+                if neighbor_exists(height, width, i, j, n):
+                    i_n, j_n = get_neighbor_coordinate(i, j, n)
+                    pairwise += edge_weight(
+                        labeling[i, j], labeling[i_n, j_n], beta)
+    return unary, pairwise
+
+
+def test_energy_breakdown():
+    rng = random.default_rng(0)
+    noised_image = rng.integers(2, size=(4, 5))
+    labelings = rng.integers(2, size=(3, 4, 5))
+    energy = energy_breakdown(labelings, noised_image, 0.2, 0.7)
+    for k, labeling in enumerate(labelings):
+        unary, pairwise = loop_energy(labeling, noised_image, 0.2, 0.7)
+        assert abs(energy["unary"][k] - unary) < 1e-9
+        assert abs(energy["pairwise"][k] - pairwise) < 1e-9
+        assert abs(energy["total"][k] - unary - pairwise) < 1e-9
+
+
+def test_count_mismatches():
+    labeling1 = array([[1, 0], [0, 0]])
+    labeling2 = array([[[1, 0], [1, 0]], [[0, 1], [1, 1]]])
+    assert count_mismatches(labeling1, labeling1) == 0
+    assert (count_mismatches(labeling1, labeling2) == array([1, 4])).all()
@@ -4,9 +4,11 @@ sys.path.append('../src')
 from src.gibbs_sampling import (
     get_labeling,
     almost_equal_labelings,
+    maxflow_image_restoration,
 )
+from src.utils import node_weights
 
-from numpy import ndarray, array
+from numpy import ndarray, array, arange, random
 
 
 def test_get_labeling():
@@ -24,3 +26,31 @@ def test_almost_equal_labelings():
     labeling2 = ndarray(shape=(2, 2), buffer=array([1, 0, 1, 0]), dtype=int)
     assert almost_equal_labelings(labeling1, labeling2, 25)
     assert not almost_equal_labelings(labeling1, labeling2, 5)
+
+
+def minimal_energy_labeling(noised_image, epsilon, beta):
+    """Labeling with minimal energy by enumeration of all labelings
+    of a small image"""
+    height, width = noised_image.shape
+    states = arange(2 ** (height * width))
+    labelings = (states[:, None] >> arange(height * width)) & 1
+    labelings = labelings.reshape(-1, height, width)
+    zero_weights, unit_weights = node_weights(noised_image, epsilon)
+    energies = (zero_weights * (1 - labelings) +
+                unit_weights * labelings).sum(axis=(1, 2))
+    energies += beta * (
+        (labelings[:, :, 1:] != labelings[:, :, :-1]).sum(axis=(1, 2)) +
+        (labelings[:, 1:] != labelings[:, :-1]).sum(axis=(1, 2)))
+    return labelings[energies.argmin()]
+
+
+def test_maxflow_image_restoration():
+    rng = random.default_rng(0)
+    for epsilon, beta in [(0.1, 0.9), (0.2, 0.5), (0.3, 1.5)]:
+        noised_image = rng.integers(2, size=(3, 3))
+        labeling, timings = maxflow_image_restoration(
+            noised_image, beta, epsilon)
+        assert (labeling == minimal_energy_labeling(
+            noised_image, epsilon, beta)).all()
+        assert sorted(timings) == ["build", "extract", "solve"]
+        assert all(seconds >= 0 for seconds in timings.values())
@@ -0,0 +1,28 @@
+import sys
+sys.path.append('../src')
+
+from src.image_generation import (
+    sample_input_images,
+    sample_input_image,
+    add_noise,
+)
+
+from numpy import zeros, uint8
+
+
+def test_sample_input_images():
+    images = sample_input_images(3, 6, 7, 0.9, 5, seed=0)
+    assert images.shape == (3, 6, 7)
+    assert ((images == 0) | (images == 1)).all()
+    assert (sample_input_images(3, 6, 7, 0.9, 5, seed=0) == images).all()
+    assert (sample_input_images(3, 6, 7, 0.9, 5, seed=1) != images).any()
+    assert sample_input_image(6, 7, 0.9, 5, seed=0).shape == (6, 7)
+
+
+def test_add_noise():
+    images = zeros((4, 50, 50), dtype=uint8)
+    noised_images = add_noise(images, 0.2, seed=0)
+    assert noised_images.shape == (4, 50, 50)
+    assert (add_noise(images, 0.2, seed=0) == noised_images).all()
+    assert abs(noised_images.mean() - 0.2) < 0.01
+    assert (add_noise(noised_images, 0.2, seed=0) == images).all()
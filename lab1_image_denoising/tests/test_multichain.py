@@ -0,0 +1,73 @@
+import sys
+sys.path.append('../src')
+
+from src.multichain import (
+    potential_scale_reduction,
+    effective_sample_size,
+    multichain_gibbs_sampling,
+)
+from src.gibbs_sampling import (
+    gibbs_sampling,
+    maxflow_image_restoration,
+)
+from src.image_generation import (
+    sample_input_image,
+    add_noise,
+)
+
+from numpy import array, inf, sqrt
+
+
+def test_potential_scale_reduction():
+    # Pixels: agreeing chains, constant different chains, constant chains
+    sums_of_unit_labels = array([[[5, 0, 10]], [[5, 10, 10]]])
+    rhat = potential_scale_reduction(sums_of_unit_labels, 10)
+    assert abs(rhat[0, 0] - sqrt(0.9)) < 1e-12
+    assert rhat[0, 1] == inf
+    assert rhat[0, 2] == 1
+
+
+def test_effective_sample_size():
+    sums_of_unit_labels = array([[[5, 2, 10]], [[5, 8, 10]]])
+    ess = effective_sample_size(sums_of_unit_labels, 10)
+    assert ess[0, 0] == 20
+    assert 0 < ess[0, 1] < 20
+    assert ess[0, 2] == 20
+
+
+def test_multichain_gibbs_sampling():
+    epsilon, beta = 0.1, 0.9
+    image = sample_input_image(12, 12, beta, 20, seed=0)
+    noised_image = add_noise(image, epsilon, seed=1)
+    labelings, sums_of_unit_labels, samples = multichain_gibbs_sampling(
+        noised_image, epsilon, beta, 3, workers=2, burn_in=20,
+        sweeps_per_check=10, max_rhat=1.1, min_ess=50, max_sweeps=2000,
+        seed=2)
+    assert labelings.shape == (3, 12, 12)
+    assert sums_of_unit_labels.shape == (3, 12, 12)
+    assert samples % 10 == 0 and 0 < samples < 2000
+    assert (sums_of_unit_labels <= samples).all()
+    # Sampling stops at the first check that shows convergence
+    rhat = potential_scale_reduction(sums_of_unit_labels, samples)
+    ess = effective_sample_size(sums_of_unit_labels, samples)
+    assert rhat.max() < 1.1 and ess.min() >= 50
+    # Without convergence sampling stops after max_sweeps
+    _, _, samples = multichain_gibbs_sampling(
+        noised_image, epsilon, beta, 2, workers=2, burn_in=0,
+        sweeps_per_check=5, max_rhat=1.0, max_sweeps=10, seed=2)
+    assert samples == 10
+
+
+def test_gibbs_sampling_with_chains():
+    epsilon, beta = 0.1, 0.9
+    image = sample_input_image(4, 4, beta, 20, seed=0)
+    noised_image = add_noise(image, epsilon, seed=1)
+    labeling = gibbs_sampling(noised_image, noised_image, epsilon, beta, 5,
+                              chains=3, workers=2, burn_in=20,
+                              sweeps_per_check=10, max_rhat=1.1,
+                              min_ess=50, seed=2)
+    maxflow_labeling, _ = maxflow_image_restoration(
+        noised_image, beta, epsilon)
+    # The most common colors of a small image with strong edges
+    # are the labeling with minimal energy
+    assert (labeling == maxflow_labeling).all()
@@ -0,0 +1,58 @@
+import sys
+sys.path.append('../src')
+
+from src.packed import (
+    PackedLabeling,
+    packed_checkerboard_iteration,
+)
+from src.checkerboard import checkerboard_iteration
+
+from numpy import array, random
+
+
+def test_packed_labeling():
+    rng = random.default_rng(0)
+    labelings = rng.integers(2, size=(3, 4, 11))
+    others = rng.integers(2, size=(3, 4, 11))
+    packed = PackedLabeling.from_array(labelings)
+    assert packed.shape == (3, 4, 11)
+    assert packed.words.shape == (3, 4, 2)
+    assert (packed.to_array() == labelings).all()
+    mismatches = (labelings != others).sum(axis=(1, 2))
+    assert (packed.count_mismatches(PackedLabeling.from_array(others)) ==
+            mismatches).all()
+    discontinuities = (labelings[:, :, 1:] != labelings[:, :, :-1]).sum(
+        axis=(1, 2)) + (labelings[:, 1:] != labelings[:, :-1]).sum(axis=(1, 2))
+    assert (packed.count_discontinuities() == discontinuities).all()
+
+
+def test_packed_checkerboard_iteration():
+    noised_image = array([[0, 1, 1], [1, 1, 0]])
+    rng = random.default_rng(1)
+    chains = rng.integers(2, size=(20000, 2, 3))
+    packed_chains = PackedLabeling.from_array(chains)
+    packed_noised_image = PackedLabeling.from_array(noised_image)
+    for _ in range(20):
+        chains = checkerboard_iteration(
+            chains, noised_image, 0.2, 0.8, rng)
+        packed_chains = packed_checkerboard_iteration(
+            packed_chains, packed_noised_image, 0.2, 0.8, rng)
+    assert abs(chains.mean(axis=0) -
+               packed_chains.to_array().mean(axis=0)).max() < 0.03
+
+
+def test_packed_checkerboard_iteration_in_strips():
+    rng = random.default_rng(2)
+    noised_image = rng.integers(2, size=(5, 9))
+    chains = rng.integers(2, size=(5000, 5, 9))
+    packed_chains = PackedLabeling.from_array(chains)
+    packed_noised_image = PackedLabeling.from_array(noised_image)
+    for _ in range(20):
+        chains = checkerboard_iteration(
+            chains, noised_image, 0.2, 0.8, rng)
+        packed_chains = packed_checkerboard_iteration(
+            packed_chains, packed_noised_image, 0.2, 0.8, rng,
+            strip_height=2)
+    assert packed_chains.words.shape == (5000, 5, 2)
+    assert abs(chains.mean(axis=0) -
+               packed_chains.to_array().mean(axis=0)).max() < 0.05
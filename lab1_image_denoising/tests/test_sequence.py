@@ -0,0 +1,83 @@
+import sys
+sys.path.append('../src')
+
+from src.energy import count_mismatches
+from src.sequence import (
+    box_sums,
+    changed_region,
+    warm_gibbs_sampling,
+    sequence_denoising,
+)
+
+from numpy import zeros, ones, random, uint8
+
+GIBBS_OPTIONS = {"epsilon": 0.1, "beta": 1.5, "changes_threshold": 1,
+                 "sweep": "checkerboard", "burn_in": 5, "thinning": 1}
+
+
+def moving_square(number, size):
+    """Clean and noised frames of a square moving to the right"""
+    frames = zeros((number, size, size), dtype=uint8)
+    for k in range(number):
+        frames[k, 8:20, 4 + 2 * k:16 + 2 * k] = 1
+    rng = random.default_rng(0)
+    noise = rng.uniform(size=frames.shape) < GIBBS_OPTIONS["epsilon"]
+    return frames, frames ^ noise
+
+
+def test_box_sums():
+    mask = zeros((4, 5), dtype=bool)
+    mask[0, 0] = True
+    sums = box_sums(mask, 1)
+    # Pixels out of the mask repeat the nearest border pixels
+    assert sums[0, 0] == 4 and sums[1, 1] == 1 and sums[2, 2] == 0
+
+
+def test_changed_region():
+    previous_frame = zeros((10, 10), dtype=uint8)
+    frame = previous_frame.copy()
+    frame[4:7, 4:7] = 1
+    frame[0, 9] = 1
+    changed = changed_region(frame, previous_frame, 1, 0.5)
+    assert changed[5, 5] and changed[4, 4] and changed[3, 5]
+    assert not changed[0, 9] and not changed[0, 0]
+
+
+def test_warm_gibbs_sampling():
+    frame = zeros((12, 12), dtype=uint8)
+    frame[4:8, 4:8] = 1
+    labeling = ones((12, 12), dtype=uint8)
+    changed = zeros((12, 12), dtype=bool)
+    changed[3:9, 3:9] = True
+    result = warm_gibbs_sampling(frame, labeling, changed, 0.01, 0.9, 2, 20,
+                                 rng=random.default_rng(0))
+    assert (result[~changed] == 1).all()
+    assert (result[4:8, 4:8] == 1).all()
+
+
+def test_sequence_denoising():
+    frames = zeros((3, 8, 8), dtype=uint8)
+    frames[:, 2:5, 2:5] = 1
+    options = {"epsilon": 0.1, "beta": 0.5}
+    results = list(sequence_denoising(frames, "maxflow", options))
+    assert len(results) == 3
+    assert all((labeling == frames[0]).all() for labeling, _ in results)
+
+
+def test_sequence_denoising_gibbs(capsys):
+    frames, noised_frames = moving_square(6, 32)
+    results = list(sequence_denoising(noised_frames, "gibbs", GIBBS_OPTIONS,
+                                      refresh=0, seed=0, verbose=False))
+    assert capsys.readouterr().out == ""
+    # Only the first frame is denoised as a single image
+    assert [part == 1.0 for _, part in results] == [True] + [False] * 5
+    for frame, (labeling, _) in zip(frames, results):
+        assert count_mismatches(frame, labeling) < 0.05 * frame.size
+
+
+def test_sequence_denoising_refresh():
+    _, noised_frames = moving_square(5, 32)
+    results = sequence_denoising(noised_frames, "gibbs", GIBBS_OPTIONS,
+                                 refresh=2, seed=0, verbose=False)
+    assert [part == 1.0 for _, part in results] == \
+        [True, False, True, False, True]
@@ -0,0 +1,44 @@
+import sys
+sys.path.append('../src')
+
+from src.swendsen_wang import swendsen_wang_iteration
+from src.utils import (
+    node_weight,
+    edge_weight,
+)
+
+from numpy import array, exp, random, zeros
+
+
+def exact_marginals(noised_image, epsilon, beta):
+    """Exact marginals of unit label by enumeration of all labelings
+    of a small image"""
+    height, width = noised_image.shape
+    size = height * width
+    marginals = zeros((height, width))
+    normalization = 0
+    for state in range(2 ** size):
+        labeling = array([(state >> b) & 1
+                          for b in range(size)]).reshape(height, width)
+        energy = sum(node_weight(labeling[i, j], noised_image[i, j], epsilon)
+                     for i in range(height) for j in range(width))
+        energy += sum(edge_weight(labeling[i, j], labeling[i, j + 1], beta)
+                      for i in range(height) for j in range(width - 1))
+        energy += sum(edge_weight(labeling[i, j], labeling[i + 1, j], beta)
+                      for i in range(height - 1) for j in range(width))
+        marginals += exp(-energy) * labeling
+        normalization += exp(-energy)
+    return marginals / normalization
+
+
+def test_swendsen_wang_iteration_marginals():
+    noised_image = array([[1, 0], [1, 1]])
+    epsilon, beta = 0.3, 1.5
+    marginals = exact_marginals(noised_image, epsilon, beta)
+
+    rng = random.default_rng(0)
+    chains = rng.integers(2, size=(20000, 2, 2))
+    for _ in range(10):
+        chains = swendsen_wang_iteration(
+            chains, noised_image, epsilon, beta, rng)
+    assert abs(chains.mean(axis=0) - marginals).max() < 0.02
@@ -0,0 +1,47 @@
+import sys
+sys.path.append('../src')
+
+from src.tiled import (
+    get_tiles,
+    expand_tile,
+    tiled_gibbs_sampling,
+)
+from src.gibbs_sampling import maxflow_image_restoration
+from src.image_generation import (
+    sample_input_image,
+    add_noise,
+)
+
+from numpy import load, save
+
+
+def test_get_tiles():
+    tiles = get_tiles(5, 3, 2)
+    assert tiles == [(slice(0, 2), slice(0, 2)), (slice(0, 2), slice(2, 3)),
+                     (slice(2, 4), slice(0, 2)), (slice(2, 4), slice(2, 3)),
+                     (slice(4, 5), slice(0, 2)), (slice(4, 5), slice(2, 3))]
+
+
+def test_expand_tile():
+    window, core = expand_tile((slice(2, 4), slice(0, 2)), 1, 5, 3)
+    assert window == (slice(1, 5), slice(0, 3))
+    assert core == (slice(1, 3), slice(0, 2))
+
+
+def test_tiled_gibbs_sampling(tmp_path):
+    epsilon, beta = 0.1, 0.9
+    image = sample_input_image(20, 20, beta, 20, seed=0)
+    noised_image = add_noise(image, epsilon, seed=1)
+    noised_path = str(tmp_path / "noised.npy")
+    save(noised_path, noised_image)
+    results = [tiled_gibbs_sampling(
+        noised_path, str(tmp_path / "result_{}.npy".format(k)), epsilon,
+        beta, tile_size=8, halo=2, rounds=20, sweeps_per_round=2,
+        burn_in=4, thinning=2, workers=2, seed=2) for k in range(2)]
+    assert results[0].shape == (20, 20)
+    assert (load(str(tmp_path / "result_0.npy")) == results[0]).all()
+    # Tiles are sampled in parallel, and the same seed gives the same result
+    assert (results[0] == results[1]).all()
+    maxflow_labeling, _ = maxflow_image_restoration(
+        noised_image, beta, epsilon)
+    assert (results[0] != maxflow_labeling).mean() < 0.05
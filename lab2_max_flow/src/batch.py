@@ -0,0 +1,314 @@
+import argparse
+import glob
+import json
+import os
+from multiprocessing import Pool
+from random import seed as set_seed
+from time import perf_counter
+
+from numpy import (
+    abs as absolute,
+    asarray,
+    load,
+    save,
+    uint8,
+)
+from PIL import Image
+
+from cache import (
+    ResultCache,
+    result_key,
+)
+from graph import MaxFlowGraph
+from main import (
+    read_options,
+    add_configured_noise,
+    uses_pool,
+    denoise,
+)
+
+# Extensions of files taken from a directory
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".npy")
+
+
+def find_images(source):
+    """Lists paths to images of a batch
+
+    Parameters
+    ----------
+    source: string
+        Directory with images, glob pattern, or text file (manifest)
+        with a path in each line, relative to the manifest directory
+
+    Returns
+    -------
+    list of strings
+        Paths to images
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name)
+                      for name in os.listdir(source)
+                      if name.lower().endswith(IMAGE_EXTENSIONS))
+    if source.endswith(".txt"):
+        directory = os.path.dirname(source)
+        with open(source) as manifest:
+            return [os.path.join(directory, line.strip())
+                    for line in manifest
+                    if line.strip() and not line.startswith("#")]
+    return sorted(glob.glob(source))
+
+
+def load_image(path):
+    """Loads grayscale image from .npy file or image file
+
+    Parameters
+    ----------
+    path: string
+        Path to image
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Intensities from 0 to 255
+    """
+    if path.endswith(".npy"):
+        return load(path).astype(uint8)
+    return asarray(Image.open(path).convert("L"))
+
+
+def save_image(image, path):
+    """Saves grayscale image to .npy file or image file
+
+    Parameters
+    ----------
+    image: matrix of unsigned integers
+        Intensities from 0 to 255
+    path: string
+        Path to image, its extension gives the format
+    """
+    if path.endswith(".npy"):
+        save(path, image.astype(uint8))
+    else:
+        Image.fromarray(image.astype(uint8)).save(path)
+
+
+def save_preview(path, images, titles):
+    """Saves images side by side, matplotlib is imported only here
+
+    Parameters
+    ----------
+    path: string
+        Path to .png file
+    images: list of matrices
+        Images
+    titles: list of strings
+        Titles of the images
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(1, len(images), squeeze=False)
+    for ax, image, title in zip(axes[0], images, titles):
+        ax.set_title(title)
+        ax.imshow(image, cmap=plt.get_cmap('gray'), vmin=0, vmax=255)
+        ax.set_axis_off()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def denoise_image(path, output_dir, options, output_format="png",
+                  noise=False, preview=False, seed=None, cache_dir=None,
+                  cache_size=2 ** 30):
+    """Denoises one image and saves the result
+
+    Parameters
+    ----------
+    path: string
+        Path to image
+    output_dir: string
+        Directory for results
+    options: dictionary
+        Parameters from main.read_options
+    output_format: string
+        "png" or "npy"
+    noise: True or False
+        If True, the image is clean and noise from options is added to it
+        before denoising, and errors of the result are counted
+    preview: True or False
+        If True, the images are also saved side by side to a .png file
+    seed: None or int
+        Seed of noise and of the order of labels
+    cache_dir: string or None
+        Directory of cache of results. If given with a seed, the result
+        is taken from the cache if the same image was denoised with
+        the same parameters and seed, and is saved to the cache otherwise.
+        Without a seed results are random and are not cached
+    cache_size: unsigned integer
+        Maximum size of the cache in bytes
+
+    Returns
+    -------
+    dictionary
+        Record with paths, size, time in seconds and energy of the result
+        and whether it was taken from the cache
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    output_path = os.path.join(output_dir, name + "." + output_format)
+    image = load_image(path)
+    noised_image = image
+    if noise:
+        noised_image = add_configured_noise(image, options, seed, uint8)
+    start = perf_counter()
+    cached = None
+    use_cache = cache_dir is not None and seed is not None
+    if use_cache:
+        cache = ResultCache(cache_dir, cache_size)
+        key = result_key(noised_image, "maxflow",
+                         {"options": options, "noise": noise, "seed": seed})
+        cached = cache.get(key)
+    if cached is None:
+        set_seed(seed)
+        labeling = denoise(noised_image, options, seed, verbose=False)
+        seconds = perf_counter() - start
+        energy = float(MaxFlowGraph(
+            options["L"], options["S"], noised_image, labeling,
+            options["potential"]).total_energy)
+        if use_cache:
+            cache.put(key, labeling, {"energy": energy})
+    else:
+        labeling, metadata = cached
+        energy = metadata["energy"]
+        seconds = perf_counter() - start
+    save_image(labeling, output_path)
+    record = {
+        "image": path,
+        "output": output_path,
+        "move": options["move"],
+        "height": labeling.shape[0],
+        "width": labeling.shape[1],
+        "seconds": seconds,
+        "energy": energy,
+        "cached": cached is not None,
+    }
+    if noise:
+        record["mean_error"] = float(
+            absolute(labeling.astype(int) - image).mean())
+    if preview:
+        images = [noised_image, labeling]
+        titles = ['Noised image', 'Result']
+        if noise:
+            images, titles = [image] + images, ['Original image'] + titles
+        save_preview(os.path.join(output_dir, name + "_preview.png"),
+                     images, titles)
+    return record
+
+
+def _denoise_task(task):
+    """Unpacks arguments of denoise_image for Pool.imap"""
+    return denoise_image(*task)
+
+
+def batch_denoise(paths, output_dir, options, workers=None,
+                  records_path=None, output_format="png", noise=False,
+                  preview=False, seed=None, cache_dir=None,
+                  cache_size=2 ** 30):
+    """Denoises images in a process pool and writes a record of each image
+
+    Parameters
+    ----------
+    paths: list of strings
+        Paths to images
+    output_dir: string
+        Directory for results, created if it does not exist
+    options: dictionary
+        Parameters from main.read_options
+    workers: unsigned integer or None
+        Number of processes. If None, the number of CPUs is used.
+        If 1, images are denoised in this process, which is required
+        for tiled minimization and fusion moves with their own pools
+    records_path: string or None
+        Path to JSON Lines file of records,
+        records.jsonl in output_dir if None
+    output_format: string
+        "png" or "npy"
+    noise: True or False
+        If True, images are clean and noise from options is added to them
+    preview: True or False
+        If True, previews are saved next to the results
+    seed: None or int
+        Seed of the first image, the next images get the next seeds
+    cache_dir: string or None
+        Directory of cache of results shared by the processes
+    cache_size: unsigned integer
+        Maximum size of the cache in bytes
+
+    Returns
+    -------
+    list of dictionaries
+        Records in the order of paths
+    """
+    if output_format not in ("png", "npy"):
+        raise ValueError("Unknown format")
+    if workers != 1 and uses_pool(options):
+        raise ValueError("Tiled and fusion minimization need workers = 1")
+    os.makedirs(output_dir, exist_ok=True)
+    if records_path is None:
+        records_path = os.path.join(output_dir, "records.jsonl")
+    tasks = [(path, output_dir, options, output_format, noise, preview,
+              None if seed is None else seed + k, cache_dir, cache_size)
+             for k, path in enumerate(paths)]
+    records = []
+    pool = None if workers == 1 else Pool(workers)
+    try:
+        results = map(_denoise_task, tasks) if pool is None \
+            else pool.imap(_denoise_task, tasks)
+        with open(records_path, "w") as records_file:
+            for record in results:
+                records_file.write(json.dumps(record) + "\n")
+                records_file.flush()
+                records.append(record)
+                print("Denoised", record["image"], "in",
+                      "{:.3f}s, energy {}".format(record["seconds"],
+                                                  record["energy"]))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Denoise a batch of grayscale images')
+    parser.add_argument("source",
+                        help="directory, glob pattern or manifest .txt file "
+                             "with a path to image in each line")
+    parser.add_argument("output_dir",
+                        help="directory for results")
+    parser.add_argument("--config", default="config.ini",
+                        help="path to config file")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes, 0 for all CPUs")
+    parser.add_argument("--records", default=None,
+                        help="path to JSON Lines file of records")
+    parser.add_argument("--format", choices=["png", "npy"], default="png",
+                        help="format of results")
+    parser.add_argument("--noise", action="store_true",
+                        help="add noise from config to clean images")
+    parser.add_argument("--preview", action="store_true",
+                        help="save previews of results")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of random numbers generator")
+    parser.add_argument("--cache", default=None,
+                        help="directory of cache of results, used with --seed")
+    parser.add_argument("--cache-size", type=float, default=1024,
+                        help="maximum size of the cache in megabytes")
+    args = parser.parse_args()
+
+    paths = find_images(args.source)
+    if not paths:
+        raise ValueError("No images found")
+    batch_denoise(paths, args.output_dir, read_options(args.config),
+                  args.workers or None, args.records, args.format,
+                  args.noise, args.preview, args.seed, args.cache,
+                  int(args.cache_size * 2 ** 20))
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from numpy import (
+    array,
+    ascontiguousarray,
+    load,
+    savez_compressed,
+)
+
+
+@lru_cache()
+def code_version():
+    """Hashes source files of this directory, so that results cached
+    by another version of the code are not used
+
+    Returns
+    -------
+    string
+        Hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as source:
+                digest.update(name.encode() + source.read())
+    return digest.hexdigest()
+
+
+def result_key(image, solver, parameters):
+    """Hashes everything a result depends on
+
+    Parameters
+    ----------
+    image: array
+        Input of the solver
+    solver: string
+        Name of the solver
+    parameters: dictionary
+        Parameters of the solver, noise and seeds, serializable to JSON
+
+    Returns
+    -------
+    string
+        Hexadecimal digest
+    """
+    image = ascontiguousarray(image)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([image.dtype.str, image.shape, solver,
+                              parameters, code_version()],
+                             sort_keys=True).encode())
+    digest.update(image.data)
+    return digest.hexdigest()
+
+
+class ResultCache():
+    """Compressed labelings and their metadata in .npz files of a directory
+
+    Files are named by keys of results. The least recently used files
+    are removed when the directory grows larger than max_bytes.
+    Several processes may share the directory
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        """
+        Parameters
+        ----------
+        directory: string
+            Directory of the cache, created if it does not exist
+        max_bytes: unsigned integer
+            Maximum total size of the files
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        """Path to the file of a result"""
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """Reads a result and marks it as used
+
+        Parameters
+        ----------
+        key: string
+            Key from result_key
+
+        Returns
+        -------
+        tuple of array and dictionary or None
+            Labeling and metadata, None if there is no such result
+        """
+        path = self.path(key)
+        try:
+            with load(path) as data:
+                labeling = data["labeling"]
+                metadata = json.loads(str(data["metadata"]))
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            # Missing, removed by another process or partially written
+            return None
+        return labeling, metadata
+
+    def put(self, key, labeling, metadata):
+        """Writes a result and removes the least recently used ones
+        if the cache is too large
+
+        Parameters
+        ----------
+        key: string
+            Key from result_key
+        labeling: array
+            Result
+        metadata: dictionary
+            Energy and other values serializable to JSON
+        """
+        path = self.path(key)
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary_path, "wb") as result_file:
+            savez_compressed(result_file, labeling=labeling,
+                             metadata=array(json.dumps(metadata)))
+        # Readers see either no file or the whole file
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used results until total size
+        is at most max_bytes"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,186 @@
+from multiprocessing import (
+    Pool,
+    RawArray,
+)
+from random import (
+    seed as set_seed,
+    shuffle,
+)
+
+from numpy import (
+    frombuffer,
+    pad,
+    rint,
+    uint8,
+)
+
+from graph import MaxFlowGraph
+from tiled import get_tiles
+
+# Noised image, current labeling and model parameters shared by workers
+_model = {}
+
+
+def _init_model(image_buffer, labeling_buffer, shape, L, S, potential):
+    """Initializes process pool worker with shared arrays and parameters"""
+    _model["image"] = frombuffer(image_buffer, dtype=uint8).reshape(shape)
+    _model["labeling"] = frombuffer(
+        labeling_buffer, dtype=uint8).reshape(shape)
+    _model["L"] = L
+    _model["S"] = S
+    _model["potential"] = potential
+
+
+def box_filter(image, radius):
+    """Averages image in squares around pixels
+
+    Parameters
+    ----------
+    image: matrix of unsigned integers
+        Image, pixels out of it repeat the nearest border pixels
+    radius: unsigned integer
+        Half side of the square
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Rounded means of the squares
+    """
+    height, width = image.shape
+    side = 2 * radius + 1
+    padded = pad(image.astype(float), radius + 1, mode="edge")
+    sums = padded.cumsum(axis=0).cumsum(axis=1)
+    sums = sums[side:, side:] - sums[:-side, side:] - \
+        sums[side:, :-side] + sums[:-side, :-side]
+    return rint(sums[:height, :width] / side ** 2).astype(image.dtype)
+
+
+def generate_proposal(kind, parameter, task_seed):
+    """Generates proposal labeling for fusion with current labeling
+
+    Parameters
+    ----------
+    kind: string
+        "noised" for noised image, "smoothed" for averaged noised image,
+        "expansion" for current labeling after expansions of some labels,
+        "tile" for labels of a tile after its separate energy minimization
+    parameter:
+        Radius of squares for "smoothed", list of labels for "expansion",
+        tuple of slices of the tile for "tile"
+    task_seed: None or int
+        Seed of the order of labels
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Proposal labeling, of tile size for "tile"
+    """
+    image, labeling = _model["image"], _model["labeling"]
+    if kind == "noised":
+        return image.copy()
+    elif kind == "smoothed":
+        return box_filter(image, parameter)
+    elif kind == "expansion":
+        set_seed(task_seed)
+        graph = MaxFlowGraph(_model["L"], _model["S"], image, labeling,
+                             _model["potential"])
+        labels = list(parameter)
+        shuffle(labels)
+        for alpha in labels:
+            graph.alpha = alpha
+            graph.alpha_expansion_step()
+        return graph.labeling
+    elif kind == "tile":
+        set_seed(task_seed)
+        graph = MaxFlowGraph(_model["L"], _model["S"], image[parameter],
+                             labeling[parameter], _model["potential"])
+        graph.alpha_expansion_iteration(verbose=False)
+        return graph.labeling
+    else:
+        raise ValueError("Unknown proposal")
+
+
+def fusion_minimize_energy(L, S, image, number_of_iterations, subsets=4,
+                           smoothing=(1, 2), tile_size=64, workers=None,
+                           prune_labels=True, early_stopping=True,
+                           seed=None, potential="lorentzian", verbose=True):
+    """Minimize energy with fusion moves of proposals generated in parallel
+
+    During each iteration proposals are generated in a process pool:
+    the noised image, averaged noised images, current labeling after
+    expansions of disjoint subsets of labels and current labeling
+    with tiles solved separately. Then current labeling is fused
+    with each proposal.
+
+    Parameters
+    ----------
+    L: float
+        Parameter of edge weight
+    S: float
+        Parameter of edge weight
+    image: matrix of unsigned integers
+        Noised image
+    number_of_iterations: unsigned integer
+        Maximum number of iterations
+    subsets: unsigned integer
+        Number of subsets of labels for expansion proposals
+    smoothing: list of unsigned integers
+        Radii of squares for averaged noised images
+    tile_size: unsigned integer
+        Tile side for tile proposal
+    workers: unsigned integer or None
+        Number of processes. If None, the number of CPUs is used
+    prune_labels: True or False
+        If True, labels out of range of image intensities are not used
+    early_stopping: True or False
+        If True, iterations stop when an iteration does not lower energy
+    seed: None or int
+        Seed of the order of labels
+    potential: string
+        Name of edge weight function in POTENTIALS
+    verbose: True or False
+        If True, progress of iterations and fusions is printed
+
+    Returns
+    -------
+    MaxFlowGraph
+        Graph with the resulting labeling
+    """
+    graph = MaxFlowGraph(L, S, image, potential=potential)
+    height, width = image.shape
+    buffers = [RawArray('B', height * width) for _ in range(2)]
+    shared_image, labeling = [
+        frombuffer(buffer, dtype=uint8).reshape(height, width)
+        for buffer in buffers]
+    shared_image[...] = image
+    tiles = get_tiles(height, width, tile_size)
+    graph.energies = [graph.total_energy]
+    with Pool(workers, _init_model,
+              buffers + [(height, width), L, S, potential]) as pool:
+        for i in range(number_of_iterations):
+            if verbose:
+                print("Iteration", i + 1, "of", number_of_iterations)
+            labeling[...] = graph.labeling
+            labels = graph.get_labels(prune_labels)
+            tasks = [("noised", None)] + \
+                [("smoothed", radius) for radius in smoothing] + \
+                [("expansion", labels[k::subsets]) for k in range(subsets)] + \
+                [("tile", tile) for tile in tiles]
+            proposals = pool.starmap(generate_proposal, [
+                (kind, parameter,
+                 None if seed is None else seed + i * len(tasks) + k)
+                for k, (kind, parameter) in enumerate(tasks)])
+            tiles_proposal = labeling.copy()
+            for tile, tile_labeling in zip(tiles, proposals[-len(tiles):]):
+                tiles_proposal[tile] = tile_labeling
+            proposals = proposals[:-len(tiles)] + [tiles_proposal]
+            for proposal in proposals:
+                changed = graph.fusion_step(proposal)
+                if verbose:
+                    print("Fused proposal,", changed, "pixels changed")
+            graph.energies.append(graph.total_energy)
+            if verbose:
+                print("Energy", graph.energies[-1])
+            if early_stopping and graph.energies[-1] >= graph.energies[-2]:
+                break
+    return graph
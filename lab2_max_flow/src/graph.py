@@ -3,35 +3,157 @@ from numpy import (
     full,
     inf,
     zeros,
-    log,
     mgrid,
     array,
-    int_,
     logical_not,
+    where,
+    bincount,
+    arange,
+    maximum,
+    concatenate,
+    argsort,
+    cumsum,
+    split,
+    union1d,
+    float32,
 )
-from random import choice
+from random import (
+    choice,
+    shuffle,
+)
+from array import array as compact_array
 
 from utils import (
-    neighbor_exists,
-    lookup_table,
-    get_neighbor_coordinate,
+    squared_differences,
+    edge_weights_table,
+    POTENTIALS,
+    get_existing_neighbors,
+    NEIGHBOR_SLICES,
+)
+
+# Structures of grid edges to neighbors 0 (left), 1 (top), 2 (right)
+# and 3 (bottom) of each node
+GRID_STRUCTURES = (
+    array([[0, 0, 0], [1, 0, 0], [0, 0, 0]]),
+    array([[0, 1, 0], [0, 0, 0], [0, 0, 0]]),
+    array([[0, 0, 0], [0, 0, 1], [0, 0, 0]]),
+    array([[0, 0, 0], [0, 0, 0], [0, 1, 0]]),
 )
 
-import matplotlib.pyplot as plt
+# Weight of a label that is out of the band of allowed labels of a pixel
+FORBIDDEN_WEIGHT = 1e9
 
 
 class MaxFlowGraph():
-    def __init__(self, L, S, image):
+    def __init__(self, L, S, image, initial_labeling=None,
+                 potential="lorentzian"):
         self.L = L
         self.S = S
+        self.potential = potential
+        # Tables of node and edge weights of all pairs of labels
+        self.node_weights = squared_differences()
+        self.edge_weights = edge_weights_table(L, S, potential)
+        # Alpha-expansion is valid only for metric edge weights
+        # and alpha-beta swap only for semimetric ones
+        self.metric = POTENTIALS[potential].metric
+        self.semimetric = POTENTIALS[potential].semimetric
         self.image = image
-        self.labeling = image
         self.height = image.shape[0]
         self.width = image.shape[1]
-        self.nodes = zeros((image.shape[0], image.shape[1], 2))
-        self.edges = zeros((image.shape[0], image.shape[1], 4, 2, 2))
+        if initial_labeling is None:
+            self.labeling = image.copy()
+        else:
+            self.labeling = initial_labeling.copy()
+        # Weights of keeping the label and of alpha of each pixel
+        self.nodes = zeros((2, self.height, self.width), dtype=float32)
+        # Capacities of edges from each pixel to its left (0) and top (1)
+        # neighbors, pixels of the first column or row have no such edge
+        self.edges = zeros((2, self.height, self.width), dtype=float32)
         self.alpha = -1
         self.list_of_labels = [k for k in range(256)]
+        # Only each label_step label is used
+        self.label_step = 1
+        # The lowest and the highest allowed labels of each pixel
+        self.lowest_labels = None
+        self.highest_labels = None
+        # Number of pixels changed by the last expansion of each label
+        self.changed_pixels = zeros(256, dtype=int)
+        # Number of expansions that changed labeling
+        self.modifications = 0
+        # Number of modifications when expansion of each label changed nothing
+        self.unchanged_at = full(256, -1)
+        # The same for swaps of pairs of labels
+        self.unchanged_pairs_at = full((256, 256), -1)
+        # Number of pixels with each label
+        self.label_counts = bincount(self.labeling.ravel(), minlength=256)
+        # Flat indices of pixels with each label, so that swaps do not
+        # search the whole labeling for pixels of their labels
+        self.label_pixels = split(
+            argsort(self.labeling.ravel(), kind="stable"),
+            cumsum(self.label_counts)[:-1])
+        # Node of each pixel in the graph of a swap, -1 out of the graph,
+        # and pixels changed by the swap. Only entries of the pixels
+        # of the swap are set and cleared
+        self.node_of_pixel = full((self.height, self.width), -1)
+        self.swapped = zeros((self.height, self.width), dtype=bool)
+        # Number of pixels with each label whose labels may change
+        self.movable_counts = self.label_counts.copy()
+        # Energy after each iteration
+        self.energies = []
+        # Energy of current labeling, updated after each expansion
+        self.total_energy = self.energy()
+        # Alpha labels of moves (-1 for fusion moves) and energies after them
+        self.alpha_history = compact_array('h')
+        self.energy_history = compact_array('d')
+        # Fusion moves connect each pair of neighbors by two edges
+        self.graph = maxflow.Graph[float](
+            self.height * self.width,
+            2 * (self.height * (self.width - 1)
+                 + (self.height - 1) * self.width))
+
+    def restrict_labels(self, reference, radius):
+        """Allow only labels in a band around reference labeling
+
+        Parameters
+        ----------
+        reference: matrix of unsigned integers of image size
+            Labels in the middle of the bands
+        radius: unsigned integer or matrix of unsigned integers
+            Half width of the band of each pixel
+        """
+        self.lowest_labels = reference.astype(int) - radius
+        self.highest_labels = reference.astype(int) + radius
+        movable = self.highest_labels > self.lowest_labels
+        self.movable_counts = bincount(self.labeling[movable], minlength=256)
+
+    def allow_all_labels(self):
+        """Remove bands of labels set by restrict_labels
+
+        Moves that changed nothing within the bands may change labeling
+        without them, so none of them is skipped any more
+        """
+        self.lowest_labels = None
+        self.highest_labels = None
+        self.movable_counts = self.label_counts.copy()
+        self.unchanged_at[:] = -1
+        self.unchanged_pairs_at[:, :] = -1
+
+    def forbidden_weights(self, label):
+        """Get additional weights of a label that prevent pixels
+        from getting the label out of their bands
+
+        Parameters
+        ----------
+        label: unsigned integer
+            Label
+
+        Returns
+        -------
+        matrix of floats of image size
+            FORBIDDEN_WEIGHT out of the band and zero in it
+        """
+        return where((label < self.lowest_labels)
+                     | (label > self.highest_labels), FORBIDDEN_WEIGHT, 0)
 
     def get_random_alpha(self):
         """Gets random label for alpha-expansion iteration
@@ -42,138 +164,621 @@ class MaxFlowGraph():
 
     def calculate_weights_of_two_label_graph(self):
         """Calculate weights of nodes and edges for two-label graph
+
+        Label 0 of two-label graph keeps the current label of a pixel,
+        label 1 is alpha. Weight of edge between pixel p and its right
+        or bottom neighbor q is
+        a + (c - a) x_p + (d - c) x_q + w (1 - x_p) x_q, w = b + c - a - d,
+        where x is 1 for alpha and a, b, c, d are weights of labels
+        00, 01, 10 and 11. Terms with one x are added to node weights
+        of alpha, constant a does not change the cut, and w is
+        the capacity of the edge from q to p. It is not negative
+        if edge weights are a metric, otherwise it is truncated to zero
+        and the expansion is only approximate.
+
+        Weights are written in place, so no arrays of image size
+        are allocated for each alpha
         """
-        self.nodes = zeros((self.height, self.width, 2))
-        self.edges = zeros((self.height, self.width, 4, 2, 2))
-        for i in range(self.height):
-            for j in range(self.width):
-                k = self.labeling[i, j]
-                self.nodes[i, j, 0] = self.node_weight(self.image[i, j], k)
-                self.nodes[i, j, 1] = self.node_weight(self.image[i, j], self.alpha)
-                for n in range(4):
-                    if neighbor_exists(i, j, n, self.height, self.width):
-                        i_n, j_n = get_neighbor_coordinate(i, j, n)
-                        k_n = self.labeling[i_n, j_n]
-                        self.edges[i_n, j_n, n, 0, 1] = self.edge_weight(k, self.alpha)
-                        self.edges[i_n, j_n, n, 1, 0] = self.edge_weight(self.alpha, k_n)
-                        self.edges[i_n, j_n, n, 0, 0] = self.edge_weight(k, k_n)
-                        self.edges[i_n, j_n, n, 1, 1] = self.edge_weight(self.alpha, self.alpha)
-
-    def update_weights_of_two_label_graph(self):
-        """Update weights of nodes and edges so that parallel edges have zero costs
-        """
-        for i in range(self.height):
-            for j in range(self.width):
-                k = self.labeling[i, j]
-                for n in range(4):
-                    if neighbor_exists(i, j, n, self.height, self.width):
-                        i_n, j_n = get_neighbor_coordinate(i, j, n)
-                        k_n = self.labeling[i_n, j_n]
-                        a = self.edge_weight(k, k_n)
-                        b = self.edge_weight(self.alpha, k_n)
-                        c = self.edge_weight(k, self.alpha)
-                        d = self.edge_weight(self.alpha, self.alpha)
-                        self.nodes[i, j, 1] = d - c
-                        self.nodes[i_n, j_n, 0] = a
-                        self.nodes[i_n, j_n, 1] = c
-                        self.edges[i, j, n, 0, 0] = 0
-                        self.edges[i, j, n, 0, 1] = 0
-                        self.edges[i, j, n, 1, 1] = 0
-                        self.edges[i, j, n, 1, 0] = b + c - a - d
+        k = self.labeling
+        self.nodes[0] = self.node_weight(self.image, k)
+        self.nodes[1] = self.node_weight(self.image, self.alpha)
+        d = self.edge_weight(self.alpha, self.alpha)
+        for n in (0, 1):
+            # Neighbors are to the left or to the top of the pixels
+            pixels, neighbors = NEIGHBOR_SLICES[n]
+            k_p, k_q = k[neighbors], k[pixels]
+            a = self.edge_weight(k_p, k_q)
+            b = self.edge_weight(k_p, self.alpha)
+            c = self.edge_weight(self.alpha, k_q)
+            self.nodes[1][neighbors] += c - a
+            self.nodes[1][pixels] += d - c
+            self.edges[n][pixels] = maximum(b + c - a - d, 0)
 
     def update_labeling(self, segments):
-        """Update image after maxflow
+        """Update image after maxflow and energy of the labeling
 
         Parameters
         ----------
         matrix of binary values of image size
             Values correspond to sink or source segment of maxflow graph
+
+        Returns
+        -------
+        unsigned integer
+            Number of pixels whose labels changed
         """
-        for i in range(self.height):
-            for j in range(self.width):
-                if int_(logical_not(segments[i, j])) == 1:
-                    self.labeling[i, j] = self.alpha
+        changed = logical_not(segments) & (self.labeling != self.alpha)
+        rows, columns = changed.nonzero()
+        self.change_labels(rows, columns, self.alpha, changed)
+        return len(rows)
+
+    def change_labels(self, rows, columns, labels, changed):
+        """Set new labels of pixels and update energy of the labeling
+        only from these pixels and their neighbors
+
+        Parameters
+        ----------
+        rows: array of unsigned integers
+            Vertical coordinates of changed pixels
+        columns: array of unsigned integers
+            Horizontal coordinates of changed pixels
+        labels: unsigned integer or array of unsigned integers
+            New labels of the pixels
+        changed: matrix of binary values of image size
+            True for changed pixels
+        """
+        if len(rows) > 0:
+            self.total_energy -= self.local_energy(rows, columns, changed)
+            old_labels = self.labeling[rows, columns]
+            self.labeling[rows, columns] = labels
+            self.update_label_pixels(rows, columns, old_labels, changed)
+            self.total_energy += self.local_energy(rows, columns, changed)
+        self.alpha_history.append(self.alpha)
+        self.energy_history.append(self.total_energy)
+
+    def update_label_pixels(self, rows, columns, old_labels, changed):
+        """Update numbers and lists of pixels of each label after
+        labels of given pixels changed
+
+        Parameters
+        ----------
+        rows: array of unsigned integers
+            Vertical coordinates of changed pixels
+        columns: array of unsigned integers
+            Horizontal coordinates of changed pixels
+        old_labels: array of unsigned integers
+            Labels of the pixels before the change
+        changed: matrix of binary values of image size
+            True for changed pixels
+        """
+        new_labels = self.labeling[rows, columns]
+        old_counts = bincount(old_labels, minlength=256)
+        counts = bincount(new_labels, minlength=256)
+        self.label_counts += counts - old_counts
+        # Changed pixels are always movable
+        self.movable_counts += counts - old_counts
+        # Changed pixels are removed from lists of their old labels
+        # and added to lists of the new ones
+        changed_pixels = changed.ravel()
+        pixels = rows * self.width + columns
+        pixels = pixels[argsort(new_labels, kind="stable")]
+        ends = cumsum(counts)
+        for label in union1d(old_labels, new_labels):
+            label_pixels = self.label_pixels[label]
+            self.label_pixels[label] = concatenate(
+                [label_pixels[~changed_pixels[label_pixels]],
+                 pixels[ends[label] - counts[label]:ends[label]]])
+
+    def local_energy(self, rows, columns, changed):
+        """Calculate energy of given pixels and edges from them
+
+        Parameters
+        ----------
+        rows: array of unsigned integers
+            Vertical coordinates of changed pixels
+        columns: array of unsigned integers
+            Horizontal coordinates of changed pixels
+        changed: matrix of binary values of image size
+            True for changed pixels
+
+        Returns
+        -------
+        float
+            Sum of node weights of the pixels and edge weights of their
+            edges, edge between two changed pixels is counted once
+        """
+        k = self.labeling[rows, columns]
+        energy = self.node_weight(self.image[rows, columns], k).sum()
+        for n in range(4):
+            exists, rows_n, columns_n = get_existing_neighbors(
+                rows, columns, n, self.height, self.width)
+            weights = self.edge_weight(k[exists],
+                                       self.labeling[rows_n, columns_n])
+            if n < 2:
+                # Edge between changed pixels is counted from the left
+                # or top one of them
+                weights = weights[logical_not(changed[rows_n, columns_n])]
+            energy += weights.sum()
+        return energy
+
+    def build_two_label_graph(self):
+        """Set nodes and edges of the grid graph for chosen alpha
+
+        Topology of the grid does not depend on alpha, so the graph
+        is reset and filled with whole arrays of capacities
+        instead of being created again
+
+        Returns
+        -------
+        matrix of unsigned integers
+            Identifiers of the nodes in the grid
+        """
+        self.graph.reset()
+        nodeids = self.graph.add_grid_nodes((self.height, self.width))
+        for n in (0, 1):
+            self.graph.add_grid_edges(
+                nodeids, self.edges[n], GRID_STRUCTURES[n], symmetric=False)
+        self.graph.add_grid_tedges(nodeids, self.nodes[0], self.nodes[1])
+        return nodeids
 
     def alpha_expansion_step(self):
         """Solve maxflow problem for 2-labeled graph with chosen alpha
         """
-        self.calculate_weights_of_two_label_graph()
-        self.update_weights_of_two_label_graph()
-        # Create the graph
-        g = maxflow.Graph[float]()
-        # Add the nodes. nodeids has the identifiers of the nodes in the grid
-        nodeids = g.add_grid_nodes((self.height, self.width))
-        for i in range(self.height):
-            for j in range(self.width):
-                for n in range(4):
-                    if neighbor_exists(i, j, n, self.height, self.width):
-                        i_n, j_n = get_neighbor_coordinate(i, j, n)
-                        # Add non-terminal edges
-                        g.add_edge(
-                            nodeids[i, j], nodeids[i_n, j_n],
-                            self.edges[i, j, n, 0, 1], self.edges[i, j, n, 1, 0]
-                        )
-                # Add terminal edges
-                g.add_tedge(nodeids[i, j],
-                            self.nodes[i, j, 0],
-                            self.nodes[i, j, 1])
-        # Find the maximum flow
-        g.maxflow()
-        segments = g.get_grid_segments(nodeids)
-        self.update_labeling(segments)
-
-    def alpha_expansion_iteration(self):
+        if self.lowest_labels is not None:
+            self.changed_pixels[self.alpha] = self.band_expansion_step()
+        else:
+            self.calculate_weights_of_two_label_graph()
+            nodeids = self.build_two_label_graph()
+            # Find the maximum flow
+            self.graph.maxflow()
+            segments = self.graph.get_grid_segments(nodeids)
+            self.changed_pixels[self.alpha] = self.update_labeling(segments)
+        if self.changed_pixels[self.alpha] > 0:
+            self.modifications += 1
+        else:
+            self.unchanged_at[self.alpha] = self.modifications
+
+    def band_expansion_step(self):
+        """Solve maxflow problem of alpha-expansion only for pixels
+        whose bands contain alpha
+
+        Other pixels keep their labels, so their edges to the pixels
+        of the graph are added to node weights as in alpha-beta swap.
+        Edges inside the graph are reparametrised as in the grid graph
+
+        Returns
+        -------
+        unsigned integer
+            Number of pixels whose labels changed
+        """
+        support = (self.lowest_labels <= self.alpha) & \
+            (self.highest_labels >= self.alpha) & \
+            (self.labeling != self.alpha)
+        rows, columns = support.nonzero()
+        if len(rows) == 0:
+            # Nothing changes, but the expansion is still recorded
+            self.change_labels(rows, columns, self.alpha, support)
+            return 0
+        self.graph.reset()
+        # Nodes of the reset graph are numbered from zero, so node
+        # identifiers also index weights of the pixels
+        nodeids = self.graph.add_nodes(len(rows))
+        self.node_of_pixel[rows, columns] = nodeids
+        k = self.labeling[rows, columns]
+        intensities = self.image[rows, columns]
+        # Weights of current and alpha labels of the pixels
+        keep_weights = self.node_weight(intensities, k)
+        alpha_weights = self.node_weight(intensities, self.alpha)
+        d = self.edge_weight(self.alpha, self.alpha)
+        for n in range(4):
+            exists, rows_n, columns_n = get_existing_neighbors(
+                rows, columns, n, self.height, self.width)
+            k_p = k[exists]
+            k_n = self.labeling[rows_n, columns_n]
+            nodes_n = self.node_of_pixel[rows_n, columns_n]
+            inside = nodes_n >= 0
+            outside = logical_not(inside)
+            pixels = exists.nonzero()[0]
+            keep_weights[pixels[outside]] += self.edge_weight(
+                k_p[outside], k_n[outside])
+            alpha_weights[pixels[outside]] += self.edge_weight(
+                self.alpha, k_n[outside])
+            if n >= 2:
+                # Each edge inside the graph is added once
+                a = self.edge_weight(k_p[inside], k_n[inside])
+                b = self.edge_weight(k_p[inside], self.alpha)
+                c = self.edge_weight(self.alpha, k_n[inside])
+                alpha_weights[pixels[inside]] += c - a
+                alpha_weights[nodes_n[inside]] += d - c
+                self.graph.add_edges(
+                    nodeids[pixels[inside]], nodes_n[inside],
+                    zeros(inside.sum()), maximum(b + c - a - d, 0))
+        # Pixels of the source segment get alpha label
+        self.graph.add_grid_tedges(nodeids, keep_weights, alpha_weights)
+        self.graph.maxflow()
+        segments = self.graph.get_grid_segments(nodeids)
+        self.node_of_pixel[rows, columns] = -1
+        expanded = logical_not(segments)
+        self.swapped[rows[expanded], columns[expanded]] = True
+        self.change_labels(rows[expanded], columns[expanded], self.alpha,
+                           self.swapped)
+        self.swapped[rows[expanded], columns[expanded]] = False
+        return expanded.sum()
+
+    def get_labels(self, prune_labels=True):
+        """Get labels to expand during an iteration
+
+        Parameters
+        ----------
+        prune_labels: True or False
+            If True, only labels between the lowest and the highest
+            intensities of the image are used. Expansion of a label out of
+            this range gives higher energy than expansion of the nearest
+            intensity in the range, as long as labeling is in the range
+
+        Returns
+        -------
+        list of unsigned integers
+            Labels, only each label_step label and only labels
+            in the band of some pixel if labels are restricted
+        """
+        lowest, highest = 0, 255
+        if prune_labels:
+            lowest, highest = int(self.image.min()), int(self.image.max())
+        if self.lowest_labels is not None:
+            lowest = max(lowest, int(self.lowest_labels.min()))
+            highest = min(highest, int(self.highest_labels.max()))
+        return [k for k in range(lowest, highest + 1, self.label_step)]
+
+    def can_expand(self, label):
+        """Check whether expansion of a label may change some pixel
+
+        A pixel takes the label only if its node weight grows by less
+        than the largest decrease of weights of its edges,
+        which is small for truncated edge weights
+
+        Parameters
+        ----------
+        label: unsigned integer
+            Label
+
+        Returns
+        -------
+        True or False
+            False if no pixel can take the label
+        """
+        growth = self.node_weight(self.image, label) - \
+            self.node_weight(self.image, self.labeling)
+        return (growth < 4 * self.edge_weights.max()).any()
+
+    def alpha_expansion_iteration(self, prune_labels=True,
+                                  skip_unchanged=True, verbose=True):
         """Solve maxflow problem for all alphas
+
+        Parameters
+        ----------
+        prune_labels: True or False
+            If True, labels out of range of image intensities
+            and labels that no pixel can take are not expanded
+        skip_unchanged: True or False
+            If True, labels whose last expansion changed nothing
+            are not expanded until another expansion changes labeling
+        verbose: True or False
+            If True, each expansion is printed
         """
-        self.list_of_labels = [k for k in range(256)]
+        self.list_of_labels = self.get_labels(prune_labels)
         while len(self.list_of_labels) > 0:
             self.get_random_alpha()
-            print("Current alpha ", self.alpha, ".", len(self.list_of_labels), "alphas left")
+            if skip_unchanged and \
+                    self.unchanged_at[self.alpha] == self.modifications:
+                continue
+            if prune_labels and not self.can_expand(self.alpha):
+                continue
+            if verbose:
+                print("Current alpha ", self.alpha, ".",
+                      len(self.list_of_labels), "alphas left")
             self.alpha_expansion_step()
 
-    def alpha_expansion(self, number_of_iterations):
-        """Perform iterations of alpha-expansion
+    def alpha_beta_swap_step(self, beta):
+        """Solve maxflow problem for 2-labeled graph of pixels
+        with chosen alpha or given beta labels
+
+        Parameters
+        ----------
+        beta: unsigned integer
+            Label to swap with alpha
+        """
+        # Pixels of the support in raster order
+        pixels = concatenate([self.label_pixels[self.alpha],
+                              self.label_pixels[beta]])
+        if len(pixels) == 0:
+            return
+        pixels.sort()
+        rows, columns = divmod(pixels, self.width)
+        self.graph.reset()
+        nodeids = self.graph.add_nodes(len(rows))
+        self.node_of_pixel[rows, columns] = nodeids
+        intensities = self.image[rows, columns]
+        # Weights of alpha and beta labels of the pixels
+        # with edges to neighbors out of the support
+        alpha_weights = self.node_weight(intensities, self.alpha)
+        beta_weights = self.node_weight(intensities, beta)
+        if self.lowest_labels is not None:
+            alpha_weights += self.forbidden_weights(self.alpha)[rows, columns]
+            beta_weights += self.forbidden_weights(beta)[rows, columns]
+        for n in range(4):
+            exists, rows_n, columns_n = get_existing_neighbors(
+                rows, columns, n, self.height, self.width)
+            k_n = self.labeling[rows_n, columns_n]
+            nodes_n = self.node_of_pixel[rows_n, columns_n]
+            inside = nodes_n >= 0
+            outside = logical_not(inside)
+            pixels = exists.nonzero()[0][outside]
+            alpha_weights[pixels] += self.edge_weight(self.alpha, k_n[outside])
+            beta_weights[pixels] += self.edge_weight(beta, k_n[outside])
+            if n >= 2:
+                # Each edge inside the support is added once
+                weights = full(inside.sum(),
+                               self.edge_weight(self.alpha, beta))
+                self.graph.add_edges(nodeids[exists][inside],
+                                     nodes_n[inside], weights, weights)
+        # Pixels of the source segment get alpha label
+        self.graph.add_grid_tedges(nodeids, beta_weights, alpha_weights)
+        self.graph.maxflow()
+        segments = self.graph.get_grid_segments(nodeids)
+        self.node_of_pixel[rows, columns] = -1
+        labels = where(segments, beta, self.alpha)
+        swapped = labels != self.labeling[rows, columns]
+        self.swapped[rows[swapped], columns[swapped]] = True
+        self.change_labels(rows[swapped], columns[swapped], labels[swapped],
+                           self.swapped)
+        self.swapped[rows[swapped], columns[swapped]] = False
+        if swapped.any():
+            self.modifications += 1
+        else:
+            self.unchanged_pairs_at[self.alpha, beta] = self.modifications
+
+    def fusion_step(self, proposal):
+        """Fuse current labeling with proposal labeling
+
+        Each pixel keeps its label or takes the label of proposal.
+        Edges may be non-submodular, so the binary problem is solved
+        with QPBO on a graph with a node for each pixel and a node for its
+        negation. Pixels whose choice is not determined by the cut keep
+        their labels, so energy does not increase.
+
+        Parameters
+        ----------
+        proposal: matrix of unsigned integers of image size
+            Proposal labeling
+
+        Returns
+        -------
+        unsigned integer
+            Number of pixels whose labels changed
+        """
+        size = self.height * self.width
+        pixel_ids = arange(size).reshape(self.height, self.width)
+        current = self.labeling.ravel()
+        proposed = proposal.ravel()
+        # Weights of keeping the label and of taking the proposed one
+        keep_weights = self.node_weight(self.image, self.labeling).ravel()
+        take_weights = self.node_weight(self.image, proposal).ravel()
+        sources, targets, capacities = [], [], []
+        for pixels, neighbors in NEIGHBOR_SLICES[2:]:
+            p = pixel_ids[pixels].ravel()
+            q = pixel_ids[neighbors].ravel()
+            a = self.edge_weight(current[p], current[q])
+            b = self.edge_weight(current[p], proposed[q])
+            c = self.edge_weight(proposed[p], current[q])
+            d = self.edge_weight(proposed[p], proposed[q])
+            # Edge weight is a + (c - a) x_p + (d - c) x_q + w (1 - x_p) x_q
+            # for x = 1 if the proposed label is taken
+            take_weights[p] += c - a
+            take_weights[q] += d - c
+            w = b + c - a - d
+            submodular = w >= 0
+            # w (1 - x_p) x_q = w (1 - x_p) - w (1 - x_p) (1 - x_q)
+            # for negative w
+            keep_weights[p[~submodular]] += w[~submodular]
+            # Edges p -> q and not q -> not p for submodular terms,
+            # p -> not q and q -> not p for others
+            sources += [p[submodular], q[submodular] + size,
+                        p[~submodular], q[~submodular]]
+            targets += [q[submodular], p[submodular] + size,
+                        q[~submodular] + size, p[~submodular] + size]
+            capacities += [w[submodular] / 2] * 2 + [-w[~submodular] / 2] * 2
+        self.graph.reset()
+        nodeids = self.graph.add_nodes(2 * size)
+        capacities = concatenate(capacities)
+        self.graph.add_edges(concatenate(sources), concatenate(targets),
+                             capacities, zeros(len(capacities)))
+        # Pixel nodes of the sink segment and their negations
+        # of the source segment take the proposed labels
+        self.graph.add_grid_tedges(
+            nodeids, concatenate([take_weights, keep_weights]) / 2,
+            concatenate([keep_weights, take_weights]) / 2)
+        self.graph.maxflow()
+        segments = self.graph.get_grid_segments(nodeids)
+        taken = segments[:size] & ~segments[size:] & (proposed != current)
+        changed = taken.reshape(self.height, self.width)
+        rows, columns = changed.nonzero()
+        self.alpha = -1
+        self.change_labels(rows, columns, proposal[rows, columns], changed)
+        if len(rows) > 0:
+            self.modifications += 1
+        return len(rows)
+
+    def alpha_beta_swap_iteration(self, prune_labels=True,
+                                  skip_unchanged=True, verbose=True):
+        """Solve maxflow problem for all pairs of labels
+
+        Parameters
+        ----------
+        prune_labels: True or False
+            If True, labels out of range of image intensities are not swapped
+        skip_unchanged: True or False
+            If True, pairs whose last swap changed nothing
+            are not swapped until another move changes labeling
+        verbose: True or False
+            If True, each swap is printed
+        """
+        labels = self.get_labels(prune_labels)
+        # Labels of a pixel can be swapped only if both are in its band
+        distance = 255
+        if self.lowest_labels is not None:
+            distance = (self.highest_labels - self.lowest_labels).max()
+        pairs = [(alpha, beta) for alpha in labels for beta in labels
+                 if alpha < beta <= alpha + distance]
+        shuffle(pairs)
+        for number, (self.alpha, beta) in enumerate(pairs):
+            # Only pixels with alpha or beta labels and wider bands than
+            # one label may change
+            if self.movable_counts[self.alpha] + \
+                    self.movable_counts[beta] == 0:
+                continue
+            if skip_unchanged and self.unchanged_pairs_at[
+                    self.alpha, beta] == self.modifications:
+                continue
+            if verbose:
+                print("Current alpha ", self.alpha, ", beta ", beta, ".",
+                      len(pairs) - number - 1, "pairs left")
+            self.alpha_beta_swap_step(beta)
+
+    def minimize_energy(self, number_of_iterations, move="expansion",
+                        prune_labels=True, skip_unchanged=True,
+                        early_stopping=True, verbose=True):
+        """Perform iterations of alpha-expansion or alpha-beta swap
 
         Parameters
         ----------
         number_of_iterations: unsigned integer
-            Number of iterations
+            Maximum number of iterations
+        move: string
+            "expansion" for alpha-expansion, "swap" for alpha-beta swap.
+            Alpha-expansion needs edge weights that are a metric,
+            alpha-beta swap needs a semimetric
+        prune_labels: True or False
+            If True, labels out of range of image intensities are not used
+        skip_unchanged: True or False
+            If True, labels or pairs of labels whose last move
+            changed nothing are not used until another move changes labeling
+        early_stopping: True or False
+            If True, iterations stop when an iteration does not lower energy
+        verbose: True or False
+            If True, progress of iterations and moves is printed
         """
+        if move == "expansion" and not self.metric:
+            raise ValueError("Alpha-expansion needs a metric potential, "
+                             "{} is not a metric".format(self.potential))
+        if move == "swap" and not self.semimetric:
+            raise ValueError("Alpha-beta swap needs a semimetric potential, "
+                             "{} is not a semimetric".format(self.potential))
+        if move == "expansion":
+            iteration = self.alpha_expansion_iteration
+        elif move == "swap":
+            iteration = self.alpha_beta_swap_iteration
+        else:
+            raise ValueError("Unknown move")
+        self.energies = [self.total_energy]
         for i in range(number_of_iterations):
-            print("Iteration", i + 1, "of", number_of_iterations)
-            self.alpha_expansion_iteration()
+            if verbose:
+                print("Iteration", i + 1, "of", number_of_iterations)
+            iteration(prune_labels, skip_unchanged, verbose)
+            self.energies.append(self.total_energy)
+            if verbose:
+                print("Energy", self.energies[-1])
+            if early_stopping and self.energies[-1] >= self.energies[-2]:
+                break
+
+    def alpha_expansion(self, number_of_iterations, prune_labels=True,
+                        skip_unchanged=True, early_stopping=True,
+                        verbose=True):
+        """Perform iterations of alpha-expansion
+
+        Parameters
+        ----------
+        number_of_iterations: unsigned integer
+            Maximum number of iterations
+        prune_labels: True or False
+            If True, labels out of range of image intensities are not expanded
+        skip_unchanged: True or False
+            If True, labels whose last expansion changed nothing
+            are not expanded until another expansion changes labeling
+        early_stopping: True or False
+            If True, iterations stop when an iteration does not lower energy
+        verbose: True or False
+            If True, progress of iterations and moves is printed
+        """
+        self.minimize_energy(number_of_iterations, "expansion", prune_labels,
+                             skip_unchanged, early_stopping, verbose)
+
+    def alpha_beta_swap(self, number_of_iterations, prune_labels=True,
+                        skip_unchanged=True, early_stopping=True,
+                        verbose=True):
+        """Perform iterations of alpha-beta swap
+
+        Parameters
+        ----------
+        number_of_iterations: unsigned integer
+            Maximum number of iterations
+        prune_labels: True or False
+            If True, labels out of range of image intensities are not swapped
+        skip_unchanged: True or False
+            If True, pairs whose last swap changed nothing
+            are not swapped until another move changes labeling
+        early_stopping: True or False
+            If True, iterations stop when an iteration does not lower energy
+        verbose: True or False
+            If True, progress of iterations and moves is printed
+        """
+        self.minimize_energy(number_of_iterations, "swap", prune_labels,
+                             skip_unchanged, early_stopping, verbose)
+
+    def energy(self):
+        """Calculate energy of current labeling
+
+        Returns
+        -------
+        float
+            Sum of node weights and edge weights, each edge is counted once
+        """
+        energy = self.node_weight(self.image, self.labeling).sum()
+        for pixels, neighbors in NEIGHBOR_SLICES[2:]:
+            energy += self.edge_weight(
+                self.labeling[pixels], self.labeling[neighbors]).sum()
+        return energy
 
     def edge_weight(self, label1, label2):
         """Computing of edge weight between two labels for initial problem
 
         Parameters
         ----------
-        label1: int
+        label1: int or array of ints
             Intensity of one object (pixel)
-        label2: int
+        label2: int or array of ints
             Intensity of other object
 
         Returns
         -------
-        float
+        float or array of floats
             Edge weight
         """
-        return self.L * log(
-            1 + lookup_table[label1, label2] / (2 * self.S ** 2))
+        return self.edge_weights[label1, label2]
 
     def node_weight(self, label1, label2):
         """Computing of node weight for the given label in object
 
         Parameters
         ----------
-        label1: int
+        label1: int or array of ints
             Intensity of the pixel in image
-        label2: int
+        label2: int or array of ints
             Intensity that corresponds to some label in graph
 
         Returns
         -------
-        int
+        float or array of floats
             Node weight
         """
-        return lookup_table[label1, label2]
+        return self.node_weights[label1, label2]
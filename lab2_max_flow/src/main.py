@@ -1,69 +1,206 @@
 import os
 import sys
 import configparser
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
-import matplotlib.gridspec as gridspec
-
-from noise import (
-    add_laplacian_noise,
-    add_gaussian_noise,
-    add_salt_and_pepper_noise
-)
-from graph import *
-
-if len(sys.argv) > 1:
-    image_path = sys.argv[1]
-    if os.path.exists(image_path):
-        input_image = mpimg.imread(image_path)
+
+from noise import NOISES
+from pyramid import multiscale_minimize_energy
+from tiled import tiled_minimize_energy
+from fusion import fusion_minimize_energy
+
+
+def read_options(path='config.ini'):
+    """Reads parameters of noise and energy minimization
+
+    Parameters
+    ----------
+    path: string
+        Path to config file
+
+    Returns
+    -------
+    dictionary
+        Parameters by names
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    noise = config['NOISE']['noise']
+    if noise == "L":
+        noise_parameters = (float(config['LAPLACIAN_NOISE']['loc']),
+                            float(config['LAPLACIAN_NOISE']['scale']))
+    elif noise == "G":
+        noise_parameters = (float(config['GAUSSIAN_NOISE']['loc']),
+                            float(config['GAUSSIAN_NOISE']['scale']))
+    elif noise == "SP":
+        noise_parameters = (
+            float(config['SALT_AND_PEPPER_NOISE']['probability']),)
     else:
-        raise Exception('Bad image path')
-else:
-    raise Exception('Usage: python main.py image_path')
-
-config = configparser.ConfigParser()
-config.read('config.ini')
-noise = config['NOISE']['noise']
-loc_laplacian = float(config['LAPLACIAN_NOISE']['loc'])
-scale_laplacian = float(config['LAPLACIAN_NOISE']['scale'])
-loc_gaussian = float(config['GAUSSIAN_NOISE']['loc'])
-scale_gaussian = float(config['GAUSSIAN_NOISE']['scale'])
-prob_salt_and_pepper = float(config['SALT_AND_PEPPER_NOISE']['probability'])
-L = float(config['EDGE_WEIGHT']['L'])
-S = float(config['EDGE_WEIGHT']['S'])
-number_of_iterations = int(config['ALGORITHM']['number_of_iterations'])
-
-fig = plt.figure()
-spec = fig.add_gridspec(ncols=3, nrows=1)
-
-ax_original_image = fig.add_subplot(spec[0, 0])
-ax_original_image.set_title('Original image')
-ax_original_image.imshow(input_image, cmap=plt.get_cmap('gray'))
-
-ax_noised_image = fig.add_subplot(spec[0, 1])
-ax_noised_image.set_title('Noised image')
-
-print(noise)
-if noise == "L":
-    noised_image = add_laplacian_noise(input_image, loc_laplacian, scale_laplacian)
-elif noise == "G":
-    noised_image = add_gaussian_noise(input_image, loc_gaussian, scale_gaussian)
-elif noise == "SP":
-    noised_image = add_salt_and_pepper_noise(input_image, prob_salt_and_pepper)
-else:
-    raise ValueError("Unknown noise")
-
-ax_noised_image.imshow(noised_image, cmap=plt.get_cmap('gray'))
-
-maxflow_graph = MaxFlowGraph(L, S, noised_image)
-maxflow_graph.alpha_expansion(number_of_iterations)
-resulting_image = maxflow_graph.image
-
-ax_result = fig.add_subplot(spec[0, 2])
-ax_result.set_title('Result')
-ax_result.imshow(resulting_image, cmap=plt.get_cmap('gray'))
-
-for ax in [ax_original_image, ax_noised_image, ax_result]:
-    ax.set_axis_off()
-
-plt.show()
+        raise ValueError("Unknown noise")
+    return {
+        "noise": noise,
+        "noise_parameters": noise_parameters,
+        "noise_seed": config['NOISE'].getint('seed', fallback=None),
+        "L": float(config['EDGE_WEIGHT']['L']),
+        "S": float(config['EDGE_WEIGHT']['S']),
+        "potential": config['EDGE_WEIGHT']['potential'],
+        "number_of_iterations": int(
+            config['ALGORITHM']['number_of_iterations']),
+        "move": config['ALGORITHM']['move'],
+        "prune_labels": config['ALGORITHM'].getboolean('prune_labels'),
+        "skip_unchanged": config['ALGORITHM'].getboolean('skip_unchanged'),
+        "early_stopping": config['ALGORITHM'].getboolean('early_stopping'),
+        "levels": int(config['PYRAMID']['levels']),
+        "radius": int(config['PYRAMID']['radius']),
+        "polish_iterations": int(config['PYRAMID']['polish_iterations']),
+        "tiled": config['TILES'].getboolean('tiled'),
+        "tile_size": int(config['TILES']['tile_size']),
+        "halo": int(config['TILES']['halo']),
+        "band": int(config['TILES']['band']),
+        "tiles_workers": int(config['TILES']['workers']) or None,
+        "subsets": int(config['FUSION']['subsets']),
+        "smoothing": [int(radius)
+                      for radius in config['FUSION']['smoothing'].split()],
+        "fusion_tile_size": int(config['FUSION']['tile_size']),
+        "fusion_workers": int(config['FUSION']['workers']) or None,
+        "sequence_radius": int(config['SEQUENCE']['radius']),
+        "sequence_threshold": int(config['SEQUENCE']['threshold']),
+        "sequence_halo": int(config['SEQUENCE']['halo']),
+        "sequence_refresh": int(config['SEQUENCE']['refresh']),
+    }
+
+
+def add_configured_noise(image, options, seed=None, dtype=int):
+    """Adds noise of the type and with parameters from options
+
+    Parameters
+    ----------
+    image: matrix of unsigned integers
+        Input image
+    options: dictionary
+        Parameters from read_options
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    dtype: numpy data type
+        Data type of the result
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Noised image
+    """
+    return NOISES[options["noise"]](
+        image, *options["noise_parameters"], seed=seed, dtype=dtype)
+
+
+def uses_pool(options):
+    """Checks whether minimization with options runs its own process pool
+
+    Parameters
+    ----------
+    options: dictionary
+        Parameters from read_options
+
+    Returns
+    -------
+    True or False
+        True for tiled minimization and fusion moves
+    """
+    return options["tiled"] or options["move"] == "fusion"
+
+
+def denoise(noised_image, options, seed=None, verbose=True):
+    """Minimizes energy of noised image with the method from options
+
+    Tiled minimization is used if "tiled" is set, fusion moves if
+    "move" is "fusion", and coarse-to-fine alpha-expansion
+    or alpha-beta swap otherwise
+
+    Parameters
+    ----------
+    noised_image: matrix of unsigned integers
+        Noised image
+    options: dictionary
+        Parameters from read_options
+    seed: None or int
+        Seed of the order of labels for tiled minimization
+        and fusion moves
+    verbose: True or False
+        If True, progress of minimization is printed
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Resulting labeling
+    """
+    L, S = options["L"], options["S"]
+    if options["tiled"]:
+        return tiled_minimize_energy(
+            L, S, noised_image, options["number_of_iterations"],
+            options["move"], tile_size=options["tile_size"],
+            halo=options["halo"], band=options["band"],
+            workers=options["tiles_workers"],
+            prune_labels=options["prune_labels"],
+            skip_unchanged=options["skip_unchanged"],
+            early_stopping=options["early_stopping"], seed=seed,
+            potential=options["potential"], verbose=verbose)
+    if options["move"] == "fusion":
+        graph = fusion_minimize_energy(
+            L, S, noised_image, options["number_of_iterations"],
+            subsets=options["subsets"], smoothing=options["smoothing"],
+            tile_size=options["fusion_tile_size"],
+            workers=options["fusion_workers"],
+            prune_labels=options["prune_labels"],
+            early_stopping=options["early_stopping"], seed=seed,
+            potential=options["potential"], verbose=verbose)
+        return graph.labeling
+    graph = multiscale_minimize_energy(
+        L, S, noised_image, options["levels"], options["radius"],
+        options["number_of_iterations"], options["move"],
+        options["prune_labels"], options["skip_unchanged"],
+        options["early_stopping"], options["polish_iterations"],
+        options["potential"], verbose)
+    return graph.labeling
+
+
+def show_images(images, titles):
+    """Shows images side by side, matplotlib is imported only here
+
+    Parameters
+    ----------
+    images: list of matrices
+        Images
+    titles: list of strings
+        Titles of the images
+    """
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    spec = fig.add_gridspec(ncols=len(images), nrows=1)
+    for k, (image, title) in enumerate(zip(images, titles)):
+        ax = fig.add_subplot(spec[0, k])
+        ax.set_title(title)
+        ax.imshow(image, cmap=plt.get_cmap('gray'))
+        ax.set_axis_off()
+    plt.show()
+
+
+def main():
+    if len(sys.argv) > 1:
+        image_path = sys.argv[1]
+        if os.path.exists(image_path):
+            import matplotlib.image as mpimg
+            input_image = mpimg.imread(image_path)
+        else:
+            raise Exception('Bad image path')
+    else:
+        raise Exception('Usage: python main.py image_path')
+
+    options = read_options('config.ini')
+    print(options["noise"])
+    noised_image = add_configured_noise(input_image, options,
+                                        options["noise_seed"])
+    resulting_image = denoise(noised_image, options)
+    show_images([input_image, noised_image, resulting_image],
+                ['Original image', 'Noised image', 'Result'])
+
+
+if __name__ == "__main__":
+    main()
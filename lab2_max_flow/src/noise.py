@@ -1,15 +1,12 @@
-from numpy.random import (
-    laplace,
-    normal,
-    random
-)
 from numpy import (
     clip,
-    array,
+    broadcast_to,
+    random,
+    uint8,
 )
 
 
-def add_laplacian_noise(image, loc=0.0, scale=1.0):
+def add_laplacian_noise(image, loc=0.0, scale=1.0, seed=None, dtype=int):
     """Add Laplacian noise to image.
     It has probability density function
     f(x; mu, lambda) = 1 / (2 * lambda) * exp(-|x - mu| / lambda)
@@ -17,63 +14,149 @@ def add_laplacian_noise(image, loc=0.0, scale=1.0):
     Parameters
     ----------
     image : numpy 2D array
-        Input image
+        Input image or a stack of images along the first axis
     loc : float
         The position, mu, of the distribution peak
     scale: float
         lambda, the exponential decay
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    dtype: numpy data type
+        Data type of the result, for example uint8
 
     Returns
     -------
     numpy 2D array
         Image with Laplacian noise
     """
-    noise = laplace(loc, scale, image.shape)
-    return array(clip(image + noise, 0, 255), dtype=int)
+    rng = random.default_rng(seed)
+    noised_image = rng.laplace(loc, scale, image.shape)
+    noised_image += image
+    return clip(noised_image, 0, 255, out=noised_image).astype(dtype)
 
 
-def add_gaussian_noise(image, loc=0.0, scale=1.0):
+def add_gaussian_noise(image, loc=0.0, scale=1.0, seed=None, dtype=int):
     """Add Gaussian noise to image
 
     Parameters
     ----------
     image : numpy 2D array
-        Input image
+        Input image or a stack of images along the first axis
     loc : float
         Mean (center) of the distribution
     scale: float
         Standard deviation (spread or width) of the distribution
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    dtype: numpy data type
+        Data type of the result, for example uint8
 
     Returns
     -------
     numpy 2D array
         Image with Gaussian noise
     """
-    noise = normal(loc, scale, image.shape)
-    return array(clip(image + noise, 0, 255), dtype=int)
+    rng = random.default_rng(seed)
+    noised_image = rng.normal(loc, scale, image.shape)
+    noised_image += image
+    return clip(noised_image, 0, 255, out=noised_image).astype(dtype)
 
 
-def add_salt_and_pepper_noise(image, probability):
+def add_salt_and_pepper_noise(image, probability, seed=None, dtype=int):
     """Add salt and pepper noise to image
 
     Parameters
     ----------
     image : numpy 2D array
-        Input image
+        Input image or a stack of images along the first axis
     probability : float
         Probability of the noise
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    dtype: numpy data type
+        Data type of the result, for example uint8
 
     Returns
     -------
     numpy 2D array
         Image with salt and pepper noise
     """
-    noised_image = image.copy()
-    for i in range(image.shape[0]):
-        for j in range(image.shape[1]):
-            random_uniform = random()
-            if random_uniform < probability:
-                noised_image[i][j] = 0
-            elif random_uniform > 1 - probability:
-                noised_image[i][j] = 255
+    rng = random.default_rng(seed)
+    random_uniform = rng.random(image.shape)
+    noised_image = image.astype(dtype)
+    noised_image[random_uniform < probability] = 0
+    noised_image[random_uniform > 1 - probability] = 255
     return noised_image
+
+
+NOISES = {
+    "L": add_laplacian_noise,
+    "G": add_gaussian_noise,
+    "SP": add_salt_and_pepper_noise,
+}
+
+
+def generate_noised_images(image, number, noise, parameters, seed=None,
+                           dtype=uint8):
+    """Lazily generate noised variants of image one by one
+
+    Parameters
+    ----------
+    image : numpy 2D array
+        Input image
+    number: unsigned integer
+        Number of variants
+    noise: string
+        "L" for Laplacian, "G" for Gaussian, "SP" for salt and pepper noise
+    parameters: tuple of floats
+        Parameters of the noise after image: loc and scale for "L" and "G",
+        probability for "SP"
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator, the same seed gives
+        the same sequence of variants
+    dtype: numpy data type
+        Data type of the variants
+
+    Returns
+    -------
+    generator of numpy 2D arrays
+        Noised images
+    """
+    if noise not in NOISES:
+        raise ValueError("Unknown noise")
+    rng = random.default_rng(seed)
+    return (NOISES[noise](image, *parameters, seed=rng, dtype=dtype)
+            for _ in range(number))
+
+
+def add_noise_batch(image, number, noise, parameters, seed=None,
+                    dtype=uint8):
+    """Generate a batch of noised variants of image
+
+    Parameters
+    ----------
+    image : numpy 2D array
+        Input image
+    number: unsigned integer
+        Number of variants
+    noise: string
+        "L" for Laplacian, "G" for Gaussian, "SP" for salt and pepper noise
+    parameters: tuple of floats
+        Parameters of the noise after image
+    seed: None, int or numpy.random.Generator
+        Seed of random numbers generator
+    dtype: numpy data type
+        Data type of the variants
+
+    Returns
+    -------
+    numpy 3D array of size (number, height, width)
+        Noised images, equal to the ones of generate_noised_images
+        with the same seed
+    """
+    if noise not in NOISES:
+        raise ValueError("Unknown noise")
+    # Noise of the whole batch is drawn with one call of the generator,
+    # which gives the same numbers as drawing it image by image
+    images = broadcast_to(image, (number,) + image.shape)
+    return NOISES[noise](images, *parameters, seed=seed, dtype=dtype)
@@ -0,0 +1,123 @@
+from numpy import (
+    pad,
+    rint,
+    repeat,
+)
+
+from graph import MaxFlowGraph
+
+
+def downsample(image):
+    """Halve image size averaging blocks of 2x2 pixels
+
+    Parameters
+    ----------
+    image: matrix of unsigned integers
+        Image, the last row and column are repeated if its size is odd
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Image of twice smaller size
+    """
+    height, width = image.shape
+    image = pad(image, ((0, height % 2), (0, width % 2)), mode="edge")
+    blocks = image.reshape(image.shape[0] // 2, 2, image.shape[1] // 2, 2)
+    return rint(blocks.mean(axis=(1, 3))).astype(image.dtype)
+
+
+def upsample(labeling, height, width):
+    """Repeat each pixel in a block of 2x2 pixels
+
+    Parameters
+    ----------
+    labeling: matrix of unsigned integers
+        Labeling
+    height: unsigned integer
+        Height of the result, at most twice labeling height
+    width: unsigned integer
+        Width of the result, at most twice labeling width
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Labeling of the given size
+    """
+    return repeat(repeat(labeling, 2, axis=0), 2, axis=1)[:height, :width]
+
+
+def multiscale_minimize_energy(L, S, image, levels, radius,
+                               number_of_iterations, move="expansion",
+                               prune_labels=True, skip_unchanged=True,
+                               early_stopping=True, polish_iterations=1,
+                               potential="lorentzian", verbose=True):
+    """Minimize energy from coarse to fine resolution
+
+    The image is halved levels - 1 times. On level l only each 2^l label
+    is used, and the labeling of each level is the initial labeling
+    of the next finer one, whose labels are restricted to a band
+    around it. Moves on finer levels involve only pixels whose bands
+    contain their labels. At last all labels are allowed again
+    for a few iterations on the full resolution level.
+
+    Parameters
+    ----------
+    L: float
+        Parameter of edge weight
+    S: float
+        Parameter of edge weight
+    image: matrix of unsigned integers
+        Noised image
+    levels: unsigned integer
+        Number of levels, 1 for full resolution only
+    radius: unsigned integer
+        Half width of the band of labels around labeling of coarser level
+    number_of_iterations: unsigned integer
+        Maximum number of iterations on each level
+    move: string
+        "expansion" for alpha-expansion, "swap" for alpha-beta swap
+    prune_labels: True or False
+        If True, labels out of range of image intensities are not used
+    skip_unchanged: True or False
+        If True, labels or pairs of labels whose last move
+        changed nothing are not used until another move changes labeling
+    early_stopping: True or False
+        If True, iterations stop when an iteration does not lower energy
+    polish_iterations: unsigned integer
+        Maximum number of iterations without bands on the full
+        resolution level, used only if levels is more than 1
+    potential: string
+        Name of edge weight function in POTENTIALS
+    verbose: True or False
+        If True, levels and iterations are printed
+
+    Returns
+    -------
+    MaxFlowGraph
+        Graph of the full resolution level with the resulting labeling
+    """
+    images = [image]
+    for _ in range(levels - 1):
+        images.append(downsample(images[-1]))
+    labeling = None
+    for level in reversed(range(levels)):
+        if verbose:
+            print("Level", level + 1, "of", levels, "with size",
+                  images[level].shape)
+        height, width = images[level].shape
+        if labeling is not None:
+            labeling = upsample(labeling, height, width)
+        graph = MaxFlowGraph(L, S, images[level], labeling, potential)
+        graph.label_step = 2 ** level
+        if labeling is not None:
+            graph.restrict_labels(labeling, radius)
+        graph.minimize_energy(number_of_iterations, move, prune_labels,
+                              skip_unchanged, early_stopping, verbose)
+        labeling = graph.labeling
+    if levels > 1 and polish_iterations > 0:
+        if verbose:
+            print("Polishing without bands")
+        graph.allow_all_labels()
+        graph.minimize_energy(polish_iterations, move, prune_labels,
+                              skip_unchanged, early_stopping, verbose)
+    return graph
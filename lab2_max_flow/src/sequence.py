@@ -0,0 +1,216 @@
+import argparse
+import os
+from random import seed as set_seed
+from time import perf_counter
+
+from numpy import (
+    abs as absolute,
+    load,
+    uint8,
+    where,
+)
+from numpy.lib.format import open_memmap
+
+from batch import (
+    find_images,
+    load_image,
+    save_image,
+)
+from fusion import box_filter
+from graph import MaxFlowGraph
+from main import (
+    read_options,
+    denoise,
+)
+from tiled import expand_tile
+
+
+def open_frames(source):
+    """Opens frames of a sequence without reading them
+
+    Parameters
+    ----------
+    source: string
+        .npy file of size (frames, height, width), which is memory-mapped,
+        or directory, glob pattern or manifest of images
+
+    Returns
+    -------
+    tuple of unsigned integer and iterator of matrices
+        Number of frames and frames, each is read when it is needed
+    """
+    if source.endswith(".npy"):
+        frames = load(source, mmap_mode="r")
+        return len(frames), iter(frames)
+    paths = find_images(source)
+    return len(paths), (load_image(path) for path in paths)
+
+
+def changed_region(frame, previous_frame, radius, threshold):
+    """Finds pixels near a change since the previous frame
+
+    Parameters
+    ----------
+    frame: matrix of unsigned integers
+        Noised frame
+    previous_frame: matrix of unsigned integers
+        Previous noised frame
+    radius: unsigned integer
+        Half side of squares where differences of intensities are averaged,
+        so that noise is not taken for a change
+    threshold: unsigned integer
+        Pixels with larger mean difference and pixels in their squares
+        are changed, so that edges of the change are not left behind
+
+    Returns
+    -------
+    matrix of binary values
+        True for changed pixels
+    """
+    difference = absolute(frame.astype(int) - previous_frame)
+    changed = box_filter(difference, radius) > threshold
+    # Means of squares of changed pixels times the square area are numbers
+    # of changed pixels in the squares
+    side = 2 * radius + 1
+    return box_filter(changed * side ** 2, radius) > 0
+
+
+def warm_minimize_energy(frame, labeling, changed, options, halo,
+                         verbose=True):
+    """Minimizes energy of a frame starting from labeling of the previous one
+
+    Only the bounding box of changed pixels with halo around it is solved.
+    Changed pixels start from intensities of the frame, and labels
+    of other pixels are held fixed
+
+    Parameters
+    ----------
+    frame: matrix of unsigned integers
+        Noised frame
+    labeling: matrix of unsigned integers
+        Result of the previous frame
+    changed: matrix of binary values
+        Changed pixels from changed_region
+    options: dictionary
+        Parameters from main.read_options
+    halo: unsigned integer
+        Width of fixed pixels around changed ones
+    verbose: True or False
+        If True, progress of minimization is printed
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Resulting labeling
+    """
+    rows, columns = changed.nonzero()
+    if len(rows) == 0:
+        return labeling.copy()
+    # Labels of changed pixels are out of date, they start from intensities
+    # of the frame as in a single image
+    labeling = where(changed, frame, labeling).astype(uint8)
+    height, width = frame.shape
+    box = (slice(rows.min(), rows.max() + 1),
+           slice(columns.min(), columns.max() + 1))
+    window, _ = expand_tile(box, halo, height, width)
+    graph = MaxFlowGraph(options["L"], options["S"], frame[window],
+                         labeling[window], options["potential"])
+    graph.restrict_labels(labeling[window], where(changed[window], 255, 0))
+    move = options["move"]
+    if move == "fusion":
+        # Fusion moves fuse whole proposals, pixels of the window
+        # are moved one label at a time instead
+        move = "expansion" if graph.metric else "swap"
+    graph.minimize_energy(
+        options["number_of_iterations"], move, options["prune_labels"],
+        options["skip_unchanged"], options["early_stopping"], verbose)
+    labeling[window] = graph.labeling
+    return labeling
+
+
+def sequence_minimize_energy(frames, options, radius=2, threshold=24,
+                             halo=8, refresh=10, seed=None, verbose=True):
+    """Lazily denoises frames, each starting from the previous result
+
+    The first frame is denoised as a single image. Labels of unchanged
+    pixels are never revisited, so errors of warm frames may accumulate,
+    and each refresh-th frame is denoised as a single image again
+
+    Parameters
+    ----------
+    frames: iterable of matrices of unsigned integers
+        Noised frames
+    options: dictionary
+        Parameters from main.read_options
+    radius: unsigned integer
+        Half side of squares where changes of frames are averaged
+    threshold: unsigned integer
+        Mean change of intensity of changed pixels
+    halo: unsigned integer
+        Width of fixed pixels around changed ones
+    refresh: unsigned integer
+        Period of frames denoised as single images, 0 for the first only
+    seed: None or int
+        Seed of the order of labels
+    verbose: True or False
+        If True, progress of minimization is printed
+
+    Returns
+    -------
+    generator of tuples of matrix of unsigned integers and float
+        Resulting labeling and part of changed pixels of each frame
+    """
+    set_seed(seed)
+    previous_frame, labeling = None, None
+    for number, frame in enumerate(frames):
+        frame = frame.astype(uint8)
+        if labeling is None or refresh > 0 and number % refresh == 0:
+            labeling = denoise(frame, options, seed, verbose)
+            changed_part = 1.0
+        else:
+            changed = changed_region(frame, previous_frame, radius, threshold)
+            labeling = warm_minimize_energy(frame, labeling, changed,
+                                            options, halo, verbose)
+            changed_part = changed.mean()
+        previous_frame = frame
+        yield labeling, changed_part
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Denoise a sequence of grayscale frames')
+    parser.add_argument("source",
+                        help=".npy file of size (frames, height, width), "
+                             "directory, glob pattern or manifest of frames")
+    parser.add_argument("output",
+                        help=".npy file or directory for .png frames")
+    parser.add_argument("--config", default="config.ini",
+                        help="path to config file")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the order of labels")
+    args = parser.parse_args()
+
+    options = read_options(args.config)
+    number, frames = open_frames(args.source)
+    results = sequence_minimize_energy(
+        frames, options, options["sequence_radius"],
+        options["sequence_threshold"], options["sequence_halo"],
+        options["sequence_refresh"], args.seed, verbose=False)
+    output = None
+    start = perf_counter()
+    for k in range(number):
+        labeling, changed_part = next(results)
+        if args.output.endswith(".npy"):
+            if output is None:
+                output = open_memmap(args.output, mode="w+", dtype=uint8,
+                                     shape=(number,) + labeling.shape)
+            output[k] = labeling
+            output.flush()
+        else:
+            os.makedirs(args.output, exist_ok=True)
+            save_image(labeling, os.path.join(
+                args.output, "frame_{:06d}.png".format(k)))
+        print("Frame", k + 1, "of", number, "in",
+              "{:.3f}s, {:.1%} of pixels changed".format(
+                  perf_counter() - start, changed_part))
+        start = perf_counter()
@@ -0,0 +1,242 @@
+from multiprocessing import (
+    Pool,
+    RawArray,
+)
+from random import seed as set_seed
+
+from numpy import (
+    frombuffer,
+    copyto,
+    full,
+    uint8,
+)
+
+from graph import MaxFlowGraph
+
+# Noised image, labeling and model parameters shared by workers of a pool
+_model = {}
+
+
+def _init_model(image_buffer, labeling_buffer, result_buffer, shape,
+                options):
+    """Initializes process pool worker with shared arrays and parameters"""
+    _model["image"] = frombuffer(image_buffer, dtype=uint8).reshape(shape)
+    _model["labeling"] = frombuffer(
+        labeling_buffer, dtype=uint8).reshape(shape)
+    _model["result"] = frombuffer(result_buffer, dtype=uint8).reshape(shape)
+    _model["options"] = options
+
+
+def get_tiles(height, width, tile_size):
+    """Splits image into square tiles
+
+    Parameters
+    ----------
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+    tile_size: unsigned integer
+        Tile side, tiles on the bottom and right borders may be smaller
+
+    Returns
+    -------
+    list of tuples of slices
+        Vertical and horizontal slices of each tile
+    """
+    return [(slice(i, min(i + tile_size, height)),
+             slice(j, min(j + tile_size, width)))
+            for i in range(0, height, tile_size)
+            for j in range(0, width, tile_size)]
+
+
+def get_seams(height, width, tile_size, band):
+    """Splits borders between tiles into bands
+
+    Parameters
+    ----------
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+    tile_size: unsigned integer
+        Tile side
+    band: unsigned integer
+        Half width of the band along the border
+
+    Returns
+    -------
+    tuple of two lists of tuples of slices
+        Vertical and horizontal slices of bands along horizontal borders
+        and of bands along vertical borders, one band for each tile side
+    """
+    horizontal = [(slice(i - band, min(i + band, height)),
+                   slice(j, min(j + tile_size, width)))
+                  for i in range(tile_size, height, tile_size)
+                  for j in range(0, width, tile_size)]
+    vertical = [(slice(i, min(i + tile_size, height)),
+                 slice(j - band, min(j + band, width)))
+                for i in range(0, height, tile_size)
+                for j in range(tile_size, width, tile_size)]
+    return horizontal, vertical
+
+
+def expand_tile(tile, halo, height, width):
+    """Adds halo around tile
+
+    Parameters
+    ----------
+    tile: tuple of slices
+        Vertical and horizontal slices of tile
+    halo: unsigned integer
+        Halo width
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+
+    Returns
+    -------
+    tuple of two tuples of slices
+        Slices of tile with halo in image
+        and slices of tile in tile with halo
+    """
+    rows, columns = tile
+    top = max(rows.start - halo, 0)
+    left = max(columns.start - halo, 0)
+    window = (slice(top, min(rows.stop + halo, height)),
+              slice(left, min(columns.stop + halo, width)))
+    core = (slice(rows.start - top, rows.stop - top),
+            slice(columns.start - left, columns.stop - left))
+    return window, core
+
+
+def minimize_tile_energy(tile, halo, fix_border, task_seed):
+    """Minimizes energy of tile with halo and writes labels of the tile
+
+    Parameters
+    ----------
+    tile: tuple of slices
+        Vertical and horizontal slices of tile
+    halo: unsigned integer
+        Halo width
+    fix_border: True or False
+        If True, labels on the outer border of the halo are held fixed
+    task_seed: None or int
+        Seed of the order of labels
+    """
+    image, labeling = _model["image"], _model["labeling"]
+    options = _model["options"]
+    height, width = image.shape
+    window, core = expand_tile(tile, halo, height, width)
+    set_seed(task_seed)
+    graph = MaxFlowGraph(options["L"], options["S"], image[window],
+                         labeling[window], options["potential"])
+    if fix_border:
+        # Border of the halo inside the image keeps labels of neighbor tiles
+        radius = full(graph.labeling.shape, 255)
+        radius[0, :] *= window[0].start == 0
+        radius[-1, :] *= window[0].stop == height
+        radius[:, 0] *= window[1].start == 0
+        radius[:, -1] *= window[1].stop == width
+        graph.restrict_labels(graph.labeling, radius)
+    graph.minimize_energy(
+        options["number_of_iterations"], options["move"],
+        options["prune_labels"], options["skip_unchanged"],
+        options["early_stopping"], verbose=False)
+    _model["result"][tile] = graph.labeling[core]
+
+
+def tiled_minimize_energy(L, S, image, number_of_iterations,
+                          move="expansion", tile_size=256, halo=16, band=8,
+                          workers=None, prune_labels=True,
+                          skip_unchanged=True, early_stopping=True,
+                          seed=None, potential="lorentzian", verbose=True):
+    """Minimize energy of a large image by tiles in a process pool
+
+    Overlapping tiles are solved in parallel, then bands along borders
+    between tiles are solved again with labels on their outer border
+    held fixed, first along horizontal borders and then along vertical ones.
+    Image and labelings are in shared memory of the pool.
+
+    Parameters
+    ----------
+    L: float
+        Parameter of edge weight
+    S: float
+        Parameter of edge weight
+    image: matrix of unsigned integers
+        Noised image
+    number_of_iterations: unsigned integer
+        Maximum number of iterations in each tile and band
+    move: string
+        "expansion" for alpha-expansion, "swap" for alpha-beta swap
+    tile_size: unsigned integer
+        Tile side
+    halo: unsigned integer
+        Width of overlap of tiles
+    band: unsigned integer
+        Half width of the bands along borders between tiles, at most
+        half of tile_size
+    workers: unsigned integer or None
+        Number of processes. If None, the number of CPUs is used
+    prune_labels: True or False
+        If True, labels out of range of image intensities are not used
+    skip_unchanged: True or False
+        If True, labels or pairs of labels whose last move
+        changed nothing are not used until another move changes labeling
+    early_stopping: True or False
+        If True, iterations stop when an iteration does not lower energy
+    seed: None or int
+        Seed of the order of labels
+    potential: string
+        Name of edge weight function in POTENTIALS
+    verbose: True or False
+        If True, each stage is printed
+
+    Returns
+    -------
+    matrix of unsigned integers
+        Resulting labeling
+    """
+    if 2 * band > tile_size:
+        raise ValueError("Band is wider than tile")
+    height, width = image.shape
+    buffers = [RawArray('B', height * width) for _ in range(3)]
+    shared_image, labeling, result = [
+        frombuffer(buffer, dtype=uint8).reshape(height, width)
+        for buffer in buffers]
+    shared_image[...] = image
+    labeling[...] = image
+    options = {
+        "L": L,
+        "S": S,
+        "number_of_iterations": number_of_iterations,
+        "move": move,
+        "prune_labels": prune_labels,
+        "skip_unchanged": skip_unchanged,
+        "early_stopping": early_stopping,
+        "potential": potential,
+    }
+    tiles = get_tiles(height, width, tile_size)
+    horizontal_seams, vertical_seams = get_seams(
+        height, width, tile_size, band)
+    stages = [("tiles", tiles, halo, False),
+              ("horizontal seams", horizontal_seams, band, True),
+              ("vertical seams", vertical_seams, band, True)]
+    task = 0
+    with Pool(workers, _init_model,
+              buffers + [(height, width), options]) as pool:
+        for name, parts, part_halo, fix_border in stages:
+            if verbose:
+                print("Energy minimization of", len(parts), name, "...")
+            copyto(result, labeling)
+            seeds = [None if seed is None else seed + task + k
+                     for k in range(len(parts))]
+            task += len(parts)
+            pool.starmap(minimize_tile_energy, [
+                (part, part_halo, fix_border, part_seed)
+                for part, part_seed in zip(parts, seeds)])
+            # Each stage reads labels of the previous one
+            copyto(labeling, result)
+    return labeling.copy()
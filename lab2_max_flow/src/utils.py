@@ -1,16 +1,114 @@
+from collections import namedtuple
+from functools import lru_cache
+
 from numpy import (
+    arange,
+    log,
     dot,
     zeros,
     reshape,
     where,
     array,
     clip,
+    minimum,
 )
 
-lookup_table = zeros((256, 256))
-for i in range(256):
-    for j in range(256):
-        lookup_table[i, j] = (i - j) ** 2
+
+# Edge weight function of absolute difference of labels and parameters L, S,
+# whether it is a metric, which alpha-expansion needs, and whether it is
+# a semimetric (symmetric, zero only for equal labels), which alpha-beta
+# swap needs
+Potential = namedtuple("Potential", ["function", "metric", "semimetric"])
+
+
+def potts(differences, L, S):
+    """L for different labels, 0 for equal ones"""
+    return L * (differences > 0)
+
+
+def truncated_linear(differences, L, S):
+    """L * min(d, S)"""
+    return L * minimum(differences, S)
+
+
+def truncated_quadratic(differences, L, S):
+    """L * min(d, S)^2"""
+    return L * minimum(differences, S) ** 2
+
+
+def lorentzian(differences, L, S):
+    """L * log(1 + d^2 / (2 S^2))"""
+    return L * log(1 + differences ** 2 / (2 * S ** 2))
+
+
+def huber(differences, L, S):
+    """L * d^2 / (2 S) for d not more than S, L * (d - S / 2) otherwise"""
+    return L * where(differences <= S, differences ** 2 / (2 * S),
+                     differences - S / 2)
+
+
+POTENTIALS = {
+    "potts": Potential(potts, True, True),
+    "truncated_linear": Potential(truncated_linear, True, True),
+    "truncated_quadratic": Potential(truncated_quadratic, False, True),
+    "lorentzian": Potential(lorentzian, False, True),
+    "huber": Potential(huber, False, True),
+}
+
+
+@lru_cache(maxsize=None)
+def squared_differences():
+    """Builds table of squared differences of all pairs of labels
+
+    Returns
+    -------
+    read-only matrix of floats of size (256, 256)
+        Squared differences of labels, also node weights
+    """
+    labels = arange(256, dtype=float)
+    table = (labels[:, None] - labels[None, :]) ** 2
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=16)
+def edge_weights_table(L, S, model="lorentzian"):
+    """Builds table of edge weights of all pairs of labels
+
+    Tables are built on first use and the most recently used ones
+    are kept for each combination of parameters
+
+    Parameters
+    ----------
+    L: float
+        Parameter of edge weight
+    S: float
+        Parameter of edge weight
+    model: string
+        Name of edge weight function in POTENTIALS
+
+    Returns
+    -------
+    read-only matrix of floats of size (256, 256)
+        Edge weights, can be indexed with arrays of labels
+    """
+    if model not in POTENTIALS:
+        raise ValueError("Unknown model")
+    labels = arange(256, dtype=float)
+    differences = abs(labels[:, None] - labels[None, :])
+    table = POTENTIALS[model].function(differences, L, S)
+    table.flags.writeable = False
+    return table
+
+
+# Slices of pixels that have a given neighbor and slices of these neighbors
+# for neighbor indices 0 (left), 1 (top), 2 (right) and 3 (bottom)
+NEIGHBOR_SLICES = (
+    ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+    ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+    ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+    ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+)
 
 
 def neighbor_exists(i, j, neighbor_index, height, width):
@@ -73,3 +171,31 @@ def get_neighbor_coordinate(i, j, neighbor_number):
         return i + 1, j
     else:
         return None, None
+
+
+def get_existing_neighbors(rows, columns, neighbor_number, height, width):
+    """Calculate coordinates of a given neighbor for pixels that have it
+
+    Parameters
+    ----------
+    rows: array of unsigned integers
+        Vertical coordinates of pixels
+    columns: array of unsigned integers
+        Horizontal coordinates of pixels
+    neighbor_number: number from {0, 1, 2, 3}
+        Neighbor index
+    height: unsigned integer
+        Image height
+    width: unsigned integer
+        Image width
+
+    Returns
+    -------
+    tuple of three arrays
+        True for pixels that have the neighbor,
+        vertical and horizontal coordinates of their neighbors
+    """
+    rows_n, columns_n = get_neighbor_coordinate(rows, columns, neighbor_number)
+    exists = (rows_n >= 0) & (rows_n < height) & \
+        (columns_n >= 0) & (columns_n < width)
+    return exists, rows_n[exists], columns_n[exists]
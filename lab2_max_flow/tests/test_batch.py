@@ -0,0 +1,118 @@
+import sys
+sys.path.append('../src')
+
+import json
+import os
+
+from src.batch import (
+    find_images,
+    load_image,
+    save_image,
+    batch_denoise,
+)
+
+from numpy import array, full, save, uint8
+
+import pytest
+
+OPTIONS = {
+    "noise": "G",
+    "noise_parameters": (0.0, 10.0),
+    "L": 5.0,
+    "S": 10.0,
+    "potential": "truncated_linear",
+    "number_of_iterations": 3,
+    "move": "expansion",
+    "prune_labels": True,
+    "skip_unchanged": True,
+    "early_stopping": True,
+    "levels": 1,
+    "radius": 8,
+    "polish_iterations": 1,
+    "tiled": False,
+}
+
+
+def test_find_images(tmp_path):
+    for name in ["b.npy", "a.png", "notes.md"]:
+        (tmp_path / name).write_bytes(b"")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.png\n# comment\n\nb.npy\n")
+    assert find_images(str(tmp_path)) == [
+        str(tmp_path / "a.png"), str(tmp_path / "b.npy")]
+    assert find_images(str(manifest)) == [
+        str(tmp_path / "a.png"), str(tmp_path / "b.npy")]
+    assert find_images(str(tmp_path / "*.npy")) == [str(tmp_path / "b.npy")]
+
+
+def test_save_and_load_image(tmp_path):
+    image = array([[0, 100], [200, 255]], dtype=uint8)
+    for name in ["image.png", "image.npy"]:
+        save_image(image, str(tmp_path / name))
+        assert (load_image(str(tmp_path / name)) == image).all()
+
+
+def test_batch_denoise(tmp_path, capsys):
+    image = full((3, 4), 100, dtype=uint8)
+    image[1, 1] = 110
+    save(str(tmp_path / "image.npy"), image)
+    records = batch_denoise([str(tmp_path / "image.npy")],
+                            str(tmp_path / "out"), OPTIONS, workers=1,
+                            output_format="npy")
+    labeling = load_image(records[0]["output"])
+    # The spike is removed
+    assert (labeling == labeling[0, 0]).all()
+    with open(str(tmp_path / "out" / "records.jsonl")) as records_file:
+        assert [json.loads(line) for line in records_file] == records
+    assert records[0]["height"] == 3 and records[0]["width"] == 4
+    # Only the record of each image is printed
+    assert capsys.readouterr().out.startswith("Denoised")
+
+
+def test_batch_denoise_noise(tmp_path):
+    image = full((6, 6), 100, dtype=uint8)
+    save(str(tmp_path / "image.npy"), image)
+    records = [batch_denoise([str(tmp_path / "image.npy")],
+                             str(tmp_path / "out"), OPTIONS, workers=1,
+                             noise=True, seed=3)[0] for _ in range(2)]
+    assert records[0]["mean_error"] == records[1]["mean_error"]
+    assert records[0]["energy"] == records[1]["energy"]
+
+
+@pytest.mark.parametrize("changes", [{"tiled": True}, {"move": "fusion"}])
+def test_batch_denoise_pool_options(tmp_path, changes):
+    options = dict(OPTIONS, **changes)
+    with pytest.raises(ValueError, match="workers = 1"):
+        batch_denoise([], str(tmp_path), options, workers=2)
+    with pytest.raises(ValueError, match="workers = 1"):
+        batch_denoise([], str(tmp_path), options)
+
+
+def test_batch_denoise_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown format"):
+        batch_denoise([], str(tmp_path), OPTIONS, workers=1,
+                      output_format="jpg")
+
+
+def test_batch_denoise_cache(tmp_path):
+    image = full((6, 6), 100, dtype=uint8)
+    save(str(tmp_path / "image.npy"), image)
+    records = [batch_denoise([str(tmp_path / "image.npy")],
+                             str(tmp_path / "out{}".format(k)), OPTIONS,
+                             workers=1, output_format="npy", noise=True,
+                             seed=0, cache_dir=str(tmp_path / "cache"))[0]
+               for k in range(2)]
+    assert [record["cached"] for record in records] == [False, True]
+    assert records[0]["energy"] == records[1]["energy"]
+    assert (load_image(records[0]["output"]) ==
+            load_image(records[1]["output"])).all()
+
+
+def test_batch_denoise_cache_without_seed(tmp_path):
+    save(str(tmp_path / "image.npy"), full((3, 4), 100, dtype=uint8))
+    for _ in range(2):
+        record = batch_denoise([str(tmp_path / "image.npy")],
+                               str(tmp_path / "out"), OPTIONS, workers=1,
+                               cache_dir=str(tmp_path / "cache"))[0]
+        assert not record["cached"]
+    assert not os.path.exists(str(tmp_path / "cache"))
@@ -0,0 +1,45 @@
+import sys
+sys.path.append('../src')
+
+import os
+
+from src.cache import (
+    ResultCache,
+    result_key,
+)
+
+from numpy import array, uint8
+
+
+def test_result_key():
+    image = array([[0, 100], [200, 255]], dtype=uint8)
+    key = result_key(image, "maxflow", {"L": 2.0, "seed": 1})
+    assert key == result_key(image.copy(), "maxflow", {"seed": 1, "L": 2.0})
+    assert key != result_key(image.T, "maxflow", {"L": 2.0, "seed": 1})
+    assert key != result_key(image, "fusion", {"L": 2.0, "seed": 1})
+    assert key != result_key(image, "maxflow", {"L": 2.0, "seed": 2})
+    assert key != result_key(image.astype(int), "maxflow",
+                             {"L": 2.0, "seed": 1})
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    labeling = array([[0, 100], [200, 255]], dtype=uint8)
+    assert cache.get("a") is None
+    cache.put("a", labeling, {"energy": 1.5})
+    cached_labeling, metadata = cache.get("a")
+    assert (cached_labeling == labeling).all()
+    assert metadata == {"energy": 1.5}
+
+
+def test_result_cache_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    labeling = array([[0, 100], [200, 255]], dtype=uint8)
+    for time, key in enumerate("abc"):
+        cache.put(key, labeling, {})
+        os.utime(cache.path(key), (time, time))
+    cache.get("a")
+    cache.max_bytes = 2 * os.path.getsize(cache.path("a"))
+    cache.evict()
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
@@ -0,0 +1,217 @@
+import sys
+sys.path.append('../src')
+
+from src.graph import MaxFlowGraph
+from src.utils import (
+    POTENTIALS,
+    neighbor_exists,
+    get_neighbor_coordinate,
+    NEIGHBOR_SLICES,
+)
+
+from itertools import product
+from random import seed as set_seed
+
+from numpy import (
+    array,
+    random,
+    where,
+    maximum,
+    isclose,
+    allclose,
+    zeros,
+    ones,
+    flatnonzero,
+    bincount,
+    uint8,
+)
+
+import pytest
+
+L, S = 5.0, 4.0
+
+
+def random_problem(seed, shape=(2, 3)):
+    """Noised image and labeling with close intensities, so that
+    edge weights are comparable with node weights"""
+    rng = random.default_rng(seed)
+    image = rng.integers(100, 116, shape).astype(uint8)
+    labeling = rng.integers(100, 116, shape).astype(uint8)
+    return rng, image, labeling
+
+
+def energy(image, labeling, potential):
+    return MaxFlowGraph(L, S, image, labeling, potential).energy()
+
+
+def assert_consistent(graph):
+    """Checks values kept up to date after each move"""
+    assert isclose(graph.total_energy, graph.energy())
+    assert isclose(graph.energy_history[-1], graph.total_energy)
+    assert (graph.label_counts ==
+            bincount(graph.labeling.ravel(), minlength=256)).all()
+    for label in range(256):
+        assert (sorted(graph.label_pixels[label]) ==
+                flatnonzero(graph.labeling == label)).all()
+
+
+def loop_weights(graph):
+    """Weights of two-label graph computed pixel by pixel"""
+    height, width = graph.height, graph.width
+    nodes = zeros((2, height, width))
+    edges = zeros((2, height, width))
+    alpha = graph.alpha
+    for i, j in product(range(height), range(width)):
+        k = graph.labeling[i, j]
+        nodes[0, i, j] = graph.node_weight(graph.image[i, j], k)
+        nodes[1, i, j] += graph.node_weight(graph.image[i, j], alpha)
+        # Reparametrisation of edges to the right and bottom neighbors,
+        # stored in these neighbors as edges to their left and top ones
+        for n in (2, 3):
+            if neighbor_exists(i, j, n, height, width):
+                i_n, j_n = get_neighbor_coordinate(i, j, n)
+                k_n = graph.labeling[i_n, j_n]
+                a = graph.edge_weight(k, k_n)
+                b = graph.edge_weight(k, alpha)
+                c = graph.edge_weight(alpha, k_n)
+                d = graph.edge_weight(alpha, alpha)
+                nodes[1, i, j] += c - a
+                nodes[1, i_n, j_n] += d - c
+                edges[n - 2, i_n, j_n] = max(b + c - a - d, 0)
+    return nodes, edges
+
+
+def masks(shape):
+    """All binary matrices of a given shape"""
+    for values in product((False, True), repeat=shape[0] * shape[1]):
+        yield array(values).reshape(shape)
+
+
+def bound(graph, labeling, mask, band=None):
+    """Energy of expanding alpha to masked pixels, where the energy
+    of each non-metric edge between pixels of the band is raised
+    by its truncated capacity, as in the two-label graph"""
+    if band is None:
+        band = ones(labeling.shape, dtype=bool)
+    new_labeling = where(mask, graph.alpha, labeling)
+    value = graph.node_weight(graph.image, new_labeling).sum()
+    for pixels, neighbors in NEIGHBOR_SLICES[2:]:
+        k, k_n = labeling[pixels], labeling[neighbors]
+        a = graph.edge_weight(k, k_n)
+        b = graph.edge_weight(k, graph.alpha)
+        c = graph.edge_weight(graph.alpha, k_n)
+        d = graph.edge_weight(graph.alpha, graph.alpha)
+        value += graph.edge_weight(
+            new_labeling[pixels], new_labeling[neighbors]).sum()
+        truncated = maximum(a + d - b - c, 0)
+        value += (truncated * (band[pixels] & ~mask[pixels])
+                  * mask[neighbors]).sum()
+    return value
+
+
+@pytest.mark.parametrize("shape", [(4, 5), (1, 6), (6, 1), (1, 1)])
+def test_two_label_weights(shape):
+    _, image, labeling = random_problem(0, shape)
+    graph = MaxFlowGraph(L, S, image, labeling)
+    graph.alpha = 107
+    graph.calculate_weights_of_two_label_graph()
+    nodes, edges = loop_weights(graph)
+    assert allclose(graph.nodes, nodes)
+    assert allclose(graph.edges, edges)
+
+
+@pytest.mark.parametrize("potential", list(POTENTIALS))
+def test_alpha_expansion_step(potential):
+    for problem in range(10):
+        rng, image, labeling = random_problem(problem)
+        graph = MaxFlowGraph(L, S, image, labeling, potential)
+        graph.alpha = int(rng.integers(100, 116))
+        initial_energy = graph.total_energy
+        optimum = min(bound(graph, labeling, mask)
+                      for mask in masks(image.shape))
+        graph.alpha_expansion_step()
+        expanded = (graph.labeling != labeling) | (labeling == graph.alpha)
+        assert isclose(bound(graph, labeling, expanded), optimum)
+        assert graph.total_energy <= initial_energy + 1e-9
+        assert_consistent(graph)
+
+
+@pytest.mark.parametrize("potential", list(POTENTIALS))
+def test_alpha_beta_swap_step(potential):
+    for problem in range(10):
+        rng, image, _ = random_problem(problem)
+        labeling = rng.choice([105, 110], image.shape).astype(uint8)
+        # A pixel with another label keeps it
+        labeling[0, 0] = 107
+        optimum = min(energy(image, where(
+            labeling == 107, 107, where(mask, 105, 110)).astype(uint8),
+            potential) for mask in masks(image.shape))
+        graph = MaxFlowGraph(L, S, image, labeling, potential)
+        graph.alpha = 105
+        graph.alpha_beta_swap_step(110)
+        assert graph.labeling[0, 0] == 107
+        assert isclose(graph.total_energy, optimum)
+        assert_consistent(graph)
+
+
+@pytest.mark.parametrize("potential", list(POTENTIALS))
+def test_fusion_step(potential):
+    for problem in range(10):
+        rng, image, labeling = random_problem(problem)
+        proposal = rng.integers(100, 116, image.shape).astype(uint8)
+        optimum = min(energy(image, where(mask, proposal, labeling),
+                             potential)
+                      for mask in masks(image.shape))
+        graph = MaxFlowGraph(L, S, image, labeling, potential)
+        initial_energy = graph.total_energy
+        graph.fusion_step(proposal)
+        assert graph.total_energy <= initial_energy
+        assert isclose(graph.total_energy, optimum)
+        assert_consistent(graph)
+
+
+@pytest.mark.parametrize("move,potential", [("expansion", "truncated_linear"),
+                                            ("swap", "lorentzian")])
+def test_incremental_energy(move, potential):
+    set_seed(0)
+    _, image, _ = random_problem(1, (6, 7))
+    graph = MaxFlowGraph(L, S, image, potential=potential)
+    graph.minimize_energy(2, move, early_stopping=False)
+    assert len(graph.energy_history) > 0
+    assert_consistent(graph)
+    assert graph.energies[-1] <= graph.energies[0]
+
+
+def test_expansion_needs_metric():
+    _, image, _ = random_problem(0)
+    graph = MaxFlowGraph(L, S, image, potential="lorentzian")
+    with pytest.raises(ValueError):
+        graph.minimize_energy(1, "expansion")
+
+
+def test_incremental_energy_of_fusion():
+    rng, image, labeling = random_problem(2, (6, 7))
+    graph = MaxFlowGraph(L, S, image, labeling, "huber")
+    for _ in range(5):
+        graph.fusion_step(rng.integers(100, 116, image.shape).astype(uint8))
+        assert_consistent(graph)
+    assert list(graph.alpha_history) == [-1] * 5
+
+
+def test_band_expansion_step():
+    for problem in range(20):
+        rng, _, labeling = random_problem(problem)
+        # Image close to the labeling, so that node weights of labels
+        # in the bands are comparable with edge weights
+        image = (labeling + rng.integers(0, 2, labeling.shape)).astype(uint8)
+        graph = MaxFlowGraph(L, S, image, labeling)
+        graph.restrict_labels(labeling, 4)
+        graph.alpha = int(rng.integers(100, 116))
+        band = abs(labeling.astype(int) - graph.alpha) <= 4
+        optimum = min(bound(graph, labeling, mask & band, band)
+                      for mask in masks(image.shape))
+        graph.alpha_expansion_step()
+        expanded = (graph.labeling != labeling) | (labeling == graph.alpha)
+        assert (band | (graph.labeling == labeling)).all()
+        assert isclose(bound(graph, labeling, expanded & band, band), optimum)
+        assert_consistent(graph)
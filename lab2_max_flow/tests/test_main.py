@@ -0,0 +1,133 @@
+import sys
+sys.path.append('../src')
+
+from src.graph import MaxFlowGraph
+from src.main import (
+    read_options,
+    add_configured_noise,
+    uses_pool,
+    denoise,
+)
+from src.noise import NOISES
+from src.pyramid import multiscale_minimize_energy
+
+import configparser
+import os
+from random import seed as set_seed
+
+from numpy import (
+    random,
+    clip,
+    mgrid,
+    uint8,
+)
+
+import pytest
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config.ini")
+
+
+def write_config(path, **values):
+    """Writes config.ini of the lab with values given as SECTION_key"""
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    for name, value in values.items():
+        section, key = name.rsplit("_", 1)
+        config[section][key] = value
+    with open(str(path), "w") as config_file:
+        config.write(config_file)
+    return str(path)
+
+
+def noised_image(size):
+    """Noised image of a bright square on a gradient"""
+    rows, columns = mgrid[:size, :size]
+    image = 60 + rows * 100 // size
+    image[size // 4:size // 2, size // 4:size // 2] = 200
+    rng = random.default_rng(0)
+    return clip(image + rng.normal(0, 10, image.shape), 0, 255).astype(uint8)
+
+
+def test_read_options():
+    options = read_options(CONFIG_PATH)
+    assert options["noise"] == "G"
+    assert options["noise_parameters"] == (0.0, 10.0)
+    assert options["noise_seed"] == 0
+    assert options["potential"] == "lorentzian"
+    assert options["move"] == "swap"
+    assert options["prune_labels"] is True
+    assert options["smoothing"] == [1, 2]
+    # Zero workers mean all CPUs
+    assert options["tiles_workers"] is None
+    assert options["fusion_workers"] is None
+    assert options["sequence_threshold"] == 24
+    assert options["sequence_refresh"] == 10
+
+
+def test_read_options_noises(tmp_path):
+    path = write_config(tmp_path / "config.ini", NOISE_noise="SP",
+                        SALT_AND_PEPPER_NOISE_probability="0.1")
+    assert read_options(path)["noise_parameters"] == (0.1,)
+    path = write_config(tmp_path / "config.ini", NOISE_noise="X")
+    with pytest.raises(ValueError, match="Unknown noise"):
+        read_options(path)
+
+
+@pytest.mark.parametrize("noise", list(NOISES))
+def test_add_configured_noise(noise):
+    image = noised_image(16)
+    options = {"noise": noise,
+               "noise_parameters": (0.2,) if noise == "SP" else (0.0, 10.0)}
+    noised = add_configured_noise(image, options, 1, uint8)
+    assert noised.dtype == uint8
+    assert (noised == NOISES[noise](image, *options["noise_parameters"],
+                                    seed=1, dtype=uint8)).all()
+    assert (noised == add_configured_noise(image, options, 1, uint8)).all()
+
+
+@pytest.mark.parametrize("tiled, move, expected", [
+    (False, "expansion", False),
+    (False, "swap", False),
+    (False, "fusion", True),
+    (True, "expansion", True),
+])
+def test_uses_pool(tiled, move, expected):
+    assert uses_pool({"tiled": tiled, "move": move}) == expected
+
+
+def test_denoise(capsys):
+    image = noised_image(16)
+    options = read_options(CONFIG_PATH)
+    options.update({"L": 5.0, "S": 10.0, "potential": "truncated_linear",
+                    "move": "expansion", "levels": 2, "radius": 2})
+    # Order of labels is random
+    set_seed(0)
+    labeling = denoise(image, options, verbose=False)
+    assert capsys.readouterr().out == ""
+    set_seed(0)
+    graph = multiscale_minimize_energy(
+        5.0, 10.0, image, 2, 2, options["number_of_iterations"],
+        "expansion", polish_iterations=options["polish_iterations"],
+        potential="truncated_linear", verbose=False)
+    assert (labeling == graph.labeling).all()
+    denoise(image, options)
+    assert "Level 2 of 2" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("changes", [
+    {"tiled": True, "tile_size": 8, "halo": 2, "band": 1,
+     "tiles_workers": 2},
+    {"move": "fusion", "fusion_tile_size": 8, "fusion_workers": 2},
+])
+def test_denoise_with_pool(changes, capsys):
+    image = noised_image(16)
+    options = read_options(CONFIG_PATH)
+    options.update({"L": 5.0, "S": 10.0, "potential": "truncated_linear",
+                    "move": "expansion"})
+    options.update(changes)
+    labeling = denoise(image, options, seed=0, verbose=False)
+    assert capsys.readouterr().out == ""
+    assert labeling.shape == image.shape
+    start = MaxFlowGraph(5.0, 10.0, image, None, "truncated_linear")
+    result = MaxFlowGraph(5.0, 10.0, image, labeling, "truncated_linear")
+    assert result.total_energy < start.total_energy
@@ -0,0 +1,85 @@
+import sys
+sys.path.append('../src')
+
+from src.noise import (
+    NOISES,
+    generate_noised_images,
+    add_noise_batch,
+)
+
+from numpy import (
+    array,
+    random,
+    stack,
+    uint8,
+)
+
+import pytest
+
+PARAMETERS = {
+    "L": (0.0, 10.0),
+    "G": (0.0, 10.0),
+    "SP": (0.05,),
+}
+
+
+def random_image():
+    return random.default_rng(0).integers(0, 256, (20, 30)).astype(uint8)
+
+
+@pytest.mark.parametrize("noise", list(NOISES))
+def test_batch_equals_generated_images(noise):
+    image = random_image()
+    images = add_noise_batch(image, 4, noise, PARAMETERS[noise], seed=3)
+    generated = list(generate_noised_images(image, 4, noise,
+                                            PARAMETERS[noise], seed=3))
+    assert images.shape == (4, 20, 30)
+    assert images.dtype == uint8
+    assert (images == stack(generated)).all()
+    # Variants differ from each other
+    assert (images[0] != images[1]).any()
+
+
+@pytest.mark.parametrize("noise", list(NOISES))
+def test_seed(noise):
+    image = random_image()
+    first = add_noise_batch(image, 2, noise, PARAMETERS[noise], seed=1)
+    second = add_noise_batch(image, 2, noise, PARAMETERS[noise], seed=1)
+    other = add_noise_batch(image, 2, noise, PARAMETERS[noise], seed=2)
+    assert (first == second).all()
+    assert (first != other).any()
+    rng = random.default_rng(1)
+    assert (add_noise_batch(image, 2, noise, PARAMETERS[noise], rng)
+            == first).all()
+
+
+@pytest.mark.parametrize("noise", list(NOISES))
+def test_dtype(noise):
+    image = random_image()
+    images = add_noise_batch(image, 2, noise, PARAMETERS[noise], seed=1,
+                             dtype=int)
+    assert images.dtype == int
+    assert images.min() >= 0 and images.max() <= 255
+    assert (images.astype(uint8) == add_noise_batch(
+        image, 2, noise, PARAMETERS[noise], seed=1)).all()
+    variant = next(generate_noised_images(
+        image, 1, noise, PARAMETERS[noise], seed=1, dtype=float))
+    assert variant.dtype == float
+
+
+def test_noise_statistics():
+    image = array([[128] * 100] * 100, dtype=uint8)
+    images = add_noise_batch(image, 10, "G", (0.0, 10.0), seed=0,
+                             dtype=float)
+    assert abs(images.mean() - 128) < 0.5
+    assert abs(images.std() - 10) < 0.5
+    images = add_noise_batch(image, 10, "SP", (0.05,), seed=0)
+    assert abs((images == 0).mean() - 0.05) < 0.01
+    assert abs((images == 255).mean() - 0.05) < 0.01
+
+
+def test_unknown_noise():
+    with pytest.raises(ValueError):
+        add_noise_batch(random_image(), 2, "P", ())
+    with pytest.raises(ValueError):
+        generate_noised_images(random_image(), 2, "P", ())
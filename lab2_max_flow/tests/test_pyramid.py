@@ -0,0 +1,49 @@
+import sys
+sys.path.append('../src')
+
+from src.pyramid import (
+    downsample,
+    upsample,
+    multiscale_minimize_energy,
+)
+
+from random import seed as set_seed
+
+from numpy import (
+    array,
+    random,
+    clip,
+    mgrid,
+    uint8,
+)
+
+import pytest
+
+
+def noised_image(size):
+    """Noised image of a bright square on a gradient"""
+    rows, columns = mgrid[:size, :size]
+    image = 60 + rows * 100 // size
+    image[size // 4:size // 2, size // 4:size // 2] = 200
+    rng = random.default_rng(0)
+    return clip(image + rng.normal(0, 10, image.shape), 0, 255).astype(uint8)
+
+
+def test_downsample_and_upsample():
+    image = array([[0, 2, 4], [2, 4, 8], [6, 6, 6]], dtype=uint8)
+    assert (downsample(image) == [[2, 6], [6, 6]]).all()
+    assert (upsample(array([[1, 2], [3, 4]]), 3, 3) ==
+            [[1, 1, 2], [1, 1, 2], [3, 3, 4]]).all()
+
+
+def test_multiscale_energy():
+    image = noised_image(32)
+    energies = []
+    for levels in (1, 3):
+        set_seed(0)
+        graph = multiscale_minimize_energy(5.0, 10.0, image, levels, 8, 3,
+                                           potential="truncated_linear")
+        assert graph.labeling.shape == image.shape
+        assert graph.total_energy == pytest.approx(graph.energy())
+        energies.append(graph.total_energy)
+    assert energies[1] == pytest.approx(energies[0], rel=0.02)
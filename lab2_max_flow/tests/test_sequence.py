@@ -0,0 +1,116 @@
+import sys
+sys.path.append('../src')
+
+from src.graph import MaxFlowGraph
+from src.main import denoise
+from src.sequence import (
+    changed_region,
+    warm_minimize_energy,
+    sequence_minimize_energy,
+)
+
+from random import seed as set_seed
+
+from numpy import (
+    random,
+    clip,
+    mgrid,
+    zeros,
+    uint8,
+)
+
+import pytest
+
+L, S = 5.0, 10.0
+POTENTIAL = "truncated_linear"
+OPTIONS = {
+    "L": L,
+    "S": S,
+    "potential": POTENTIAL,
+    "number_of_iterations": 3,
+    "move": "expansion",
+    "prune_labels": True,
+    "skip_unchanged": True,
+    "early_stopping": True,
+    "levels": 1,
+    "radius": 8,
+    "polish_iterations": 1,
+    "tiled": False,
+}
+
+
+def moving_square(number, size, static_noise=False):
+    """Noised frames of a bright square moving to the right on a gradient,
+    with the same noise in all frames if static_noise is set"""
+    rows, columns = mgrid[:size, :size]
+    frames = []
+    rng = random.default_rng(0)
+    noise = rng.normal(0, 10, (size, size))
+    for k in range(number):
+        frame = 60 + rows * 100 // size
+        frame[8:20, 4 + 2 * k:16 + 2 * k] = 200
+        if not static_noise:
+            noise = rng.normal(0, 10, (size, size))
+        frames.append(clip(frame + noise, 0, 255).astype(uint8))
+    return frames
+
+
+def energy(image, labeling):
+    return MaxFlowGraph(L, S, image, labeling, POTENTIAL).total_energy
+
+
+def test_changed_region():
+    frames = moving_square(2, 32)
+    changed = changed_region(frames[1], frames[0], 2, 24)
+    # Leading and trailing edges of the square with their corners
+    assert changed[14, 17] and changed[14, 5]
+    assert changed[19, 4] and changed[19, 17]
+    # Noise of the background and inside of the square
+    assert not changed[28, 28] and not changed[14, 10]
+    assert not changed_region(frames[0], frames[0], 2, 24).any()
+
+
+def test_warm_minimize_energy(capsys):
+    frames = moving_square(2, 32)
+    labeling = frames[0].copy()
+    labeling[:, :] = 100
+    changed = zeros(labeling.shape, dtype=bool)
+    changed[6:22, 14:20] = True
+    result = warm_minimize_energy(frames[1], labeling, changed, OPTIONS, 2,
+                                  verbose=False)
+    assert capsys.readouterr().out == ""
+    # Labels of other pixels are held fixed, and the previous labeling
+    # is not overwritten
+    assert (result[~changed] == 100).all()
+    assert (labeling == 100).all()
+    assert (result[10:18, 16:18] > 150).all()
+    unchanged = warm_minimize_energy(frames[1], labeling,
+                                     zeros(labeling.shape, dtype=bool),
+                                     OPTIONS, 2)
+    assert unchanged is not labeling and (unchanged == labeling).all()
+
+
+@pytest.mark.parametrize("refresh, cold", [
+    (0, [True, False, False, False]),
+    (2, [True, False, True, False]),
+])
+def test_sequence_minimize_energy(refresh, cold, capsys):
+    frames = moving_square(4, 32)
+    results = list(sequence_minimize_energy(
+        frames, OPTIONS, refresh=refresh, seed=0, verbose=False))
+    assert capsys.readouterr().out == ""
+    assert [part == 1.0 for _, part in results] == cold
+    # Each frame has its own labeling
+    assert len({id(labeling) for labeling, _ in results}) == len(frames)
+
+
+def test_warm_energy_close_to_cold():
+    # Labels of fixed pixels fit noise of earlier frames, so only with
+    # the same noise in all frames their energies are comparable
+    frames = moving_square(8, 32, static_noise=True)
+    results = sequence_minimize_energy(frames, OPTIONS, refresh=0, seed=0,
+                                       verbose=False)
+    for frame, (labeling, _) in zip(frames, results):
+        set_seed(0)
+        cold_energy = energy(frame, denoise(frame, OPTIONS, verbose=False))
+        assert energy(frame, labeling) < 1.02 * cold_energy
@@ -0,0 +1,92 @@
+import sys
+sys.path.append('../src')
+
+from src.graph import MaxFlowGraph
+from src.tiled import (
+    _init_model,
+    _model,
+    get_tiles,
+    get_seams,
+    minimize_tile_energy,
+    tiled_minimize_energy,
+)
+
+from multiprocessing import RawArray
+from random import seed as set_seed
+
+from numpy import (
+    random,
+    clip,
+    mgrid,
+    copyto,
+    zeros,
+    uint8,
+)
+
+import pytest
+
+L, S = 5.0, 10.0
+POTENTIAL = "truncated_linear"
+OPTIONS = {
+    "L": L,
+    "S": S,
+    "number_of_iterations": 5,
+    "move": "expansion",
+    "prune_labels": True,
+    "skip_unchanged": True,
+    "early_stopping": True,
+    "potential": POTENTIAL,
+}
+
+
+def noised_image(size):
+    """Noised image of a bright square on a gradient"""
+    rows, columns = mgrid[:size, :size]
+    image = 60 + rows * 100 // size
+    image[size // 4:size // 2, size // 4:size // 2] = 200
+    rng = random.default_rng(0)
+    return clip(image + rng.normal(0, 10, image.shape), 0, 255).astype(uint8)
+
+
+def test_tiled_energy():
+    image = noised_image(32)
+    labeling = tiled_minimize_energy(L, S, image, 5, tile_size=16, halo=4,
+                                     band=4, workers=2, seed=0,
+                                     potential=POTENTIAL, verbose=False)
+    set_seed(0)
+    graph = MaxFlowGraph(L, S, image, potential=POTENTIAL)
+    graph.minimize_energy(5, verbose=False)
+    tiled_energy = MaxFlowGraph(L, S, image, labeling, POTENTIAL).energy()
+    assert tiled_energy == pytest.approx(graph.total_energy, rel=0.02)
+
+
+def test_seams_are_solved_again():
+    image = noised_image(32)
+    result = tiled_minimize_energy(L, S, image, 5, tile_size=16, halo=4,
+                                   band=4, workers=2, seed=0,
+                                   potential=POTENTIAL, verbose=False)
+    # The same stages in this process, one part after another
+    _init_model(*[RawArray('B', image.size) for _ in range(3)],
+                image.shape, OPTIONS)
+    _model["image"][...] = image
+    labeling = _model["labeling"]
+    labeling[...] = image
+    horizontal, vertical = get_seams(32, 32, 16, 4)
+    stages = [(get_tiles(32, 32, 16), False), (horizontal, True),
+              (vertical, True)]
+    task = 0
+    for parts, fix_border in stages:
+        copyto(_model["result"], labeling)
+        for part in parts:
+            minimize_tile_energy(part, 4, fix_border, task)
+            task += 1
+        if not fix_border:
+            tiles_labeling = _model["result"].copy()
+        copyto(labeling, _model["result"])
+    assert (result == labeling).all()
+    # Seams are solved again and the rest keeps labels of the tiles
+    seams = zeros(image.shape, dtype=bool)
+    for part in horizontal + vertical:
+        seams[part] = True
+    assert (result[~seams] == tiles_labeling[~seams]).all()
+    assert (result[seams] != tiles_labeling[seams]).any()
@@ -0,0 +1,66 @@
+import sys
+sys.path.append('../src')
+
+from src.utils import (
+    POTENTIALS,
+    edge_weights_table,
+)
+
+from math import log
+
+from numpy import (
+    arange,
+    allclose,
+    diag,
+)
+
+import pytest
+
+L, S = 3.0, 7.0
+
+# Edge weights of labels with difference d written as in the README
+FORMULAS = {
+    "potts": lambda d: L if d > 0 else 0,
+    "truncated_linear": lambda d: L * min(d, S),
+    "truncated_quadratic": lambda d: L * min(d, S) ** 2,
+    "lorentzian": lambda d: L * log(1 + d ** 2 / (2 * S ** 2)),
+    "huber": lambda d: L * d ** 2 / (2 * S) if d <= S else L * (d - S / 2),
+}
+
+
+def satisfies_triangle_inequality(table):
+    """Checks that table[a, c] <= table[a, b] + table[b, c]
+    for all labels a, b and c"""
+    for b in range(256):
+        if (table > table[:, [b]] + table[[b], :] + 1e-9).any():
+            return False
+    return True
+
+
+def test_potentials_have_formulas():
+    assert set(POTENTIALS) == set(FORMULAS)
+
+
+@pytest.mark.parametrize("name", list(POTENTIALS))
+def test_edge_weights_table(name):
+    table = edge_weights_table(L, S, name)
+    labels = arange(256)
+    expected = [[FORMULAS[name](abs(a - b)) for b in labels] for a in labels]
+    assert table.shape == (256, 256)
+    assert allclose(table, expected)
+    assert not table.flags.writeable
+
+
+@pytest.mark.parametrize("name", list(POTENTIALS))
+def test_metric_flags(name):
+    table = edge_weights_table(L, S, name)
+    semimetric = (table == table.T).all() and (diag(table) == 0).all() and \
+        (table + diag([1.0] * 256) > 0).all()
+    assert POTENTIALS[name].semimetric == semimetric
+    assert POTENTIALS[name].metric == \
+        (semimetric and satisfies_triangle_inequality(table))
+
+
+def test_unknown_potential():
+    with pytest.raises(ValueError):
+        edge_weights_table(L, S, "gaussian")